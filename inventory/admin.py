@@ -1,32 +1,63 @@
 from django.contrib import admin
-from .models import Ingredient, MenuItem, RecipeRequirement, Purchase
+from .models import (
+    Location,
+    Ingredient,
+    MenuItem,
+    RecipeRequirement,
+    Purchase,
+    ArchivedPurchase,
+    DailySales,
+    StockAlert,
+    PurchaseOrder,
+    PurchaseOrderLine,
+    StockMovement,
+    StockSnapshot,
+)
+from .sales import delete_purchases
+
+
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+    ordering = ['name']
+    filter_horizontal = ['members']
 
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = [
         'name',
+        'location',
         'available_quantity',
         'measurement_unit',
         'price_per_unit',
         'date_added',
         'expiry_date',
+        'reorder_threshold',
+    ]
+    list_filter = [
+        'location',
+        'measurement_unit',
+        'date_added',
+        'expiry_date',
     ]
-    list_filter = ['measurement_unit', 'date_added', 'expiry_date']
     search_fields = ['name']
     ordering = ['name']
 
 
 class MenuItemAdmin(admin.ModelAdmin):
-    list_display = ['item_name', 'price']
+    list_display = ['item_name', 'location', 'price']
+    list_filter = ['location']
     search_fields = ['item_name']
     ordering = ['item_name']
 
 
 class RecipeRequirementAdmin(admin.ModelAdmin):
-    list_display = ['menu_item', 'ingredient', 'quantity']
-    list_filter = ['menu_item', 'ingredient']
+    list_display = ['menu_item', 'ingredient', 'quantity', 'location']
+    list_filter = ['location', 'menu_item', 'ingredient']
     search_fields = ['menu_item__item_name', 'ingredient__name']
     ordering = ['menu_item']
+    # Always the menu item's location
+    readonly_fields = ['location']
 
 
 class PurchaseAdmin(admin.ModelAdmin):
@@ -36,14 +67,108 @@ class PurchaseAdmin(admin.ModelAdmin):
         'customer_name',
         'quantity',
         'total_price',
+        'location',
     ]
-    list_filter = ['menu_item', 'purchase_date']
+    list_filter = ['location', 'menu_item', 'purchase_date']
     search_fields = ['menu_item__item_name', 'customer_name']
     ordering = ['-purchase_date', 'menu_item']
-    readonly_fields = ['total_price']
+    readonly_fields = ['total_price', 'location']
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip Purchase.delete(), which updates the rollup
+        delete_purchases(queryset)
+
+
+class ArchivedPurchaseAdmin(admin.ModelAdmin):
+    list_display = [
+        'menu_item',
+        'purchase_date',
+        'customer_name',
+        'quantity',
+        'total_price',
+        'location',
+    ]
+    list_filter = ['location', 'purchase_date']
+    search_fields = ['menu_item__item_name', 'customer_name']
+    ordering = ['-purchase_date']
+    # Archived purchases are history, moved by archive_purchases
+    readonly_fields = [
+        'id',
+        'location',
+        'menu_item',
+        'purchase_date',
+        'customer_name',
+        'quantity',
+        'total_price',
+    ]
+
+
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ['menu_item', 'date', 'quantity', 'revenue']
+    list_filter = ['date']
+    search_fields = ['menu_item__item_name']
+    ordering = ['-date', 'menu_item']
+    readonly_fields = ['menu_item', 'date', 'quantity', 'revenue']
+
+
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = [
+        'ingredient',
+        'kind',
+        'available_quantity',
+        'reorder_threshold',
+        'created_at',
+    ]
+    list_filter = ['kind', 'created_at']
+    search_fields = ['ingredient__name']
+    ordering = ['-id']
+
+
+class PurchaseOrderLineInline(admin.TabularInline):
+    model = PurchaseOrderLine
+    extra = 0
+    raw_id_fields = ['ingredient']
+
+
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'location',
+        'status',
+        'created_at',
+        'coverage_days',
+        'total_cost',
+    ]
+    list_filter = ['location', 'status', 'created_at']
+    ordering = ['-created_at']
+    inlines = [PurchaseOrderLineInline]
+
+
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'kind', 'quantity', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['ingredient__name']
+    ordering = ['-created_at']
+    # The ledger is append-only
+    readonly_fields = ['ingredient', 'kind', 'quantity', 'created_at']
+
+
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'taken_at', 'quantity']
+    list_filter = ['taken_at']
+    search_fields = ['ingredient__name']
+    ordering = ['-taken_at']
+    readonly_fields = ['ingredient', 'taken_at', 'quantity']
 
 
+admin.site.register(Location, LocationAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(MenuItem, MenuItemAdmin)
 admin.site.register(RecipeRequirement, RecipeRequirementAdmin)
 admin.site.register(Purchase, PurchaseAdmin)
+admin.site.register(ArchivedPurchase, ArchivedPurchaseAdmin)
+admin.site.register(DailySales, DailySalesAdmin)
+admin.site.register(StockAlert, StockAlertAdmin)
+admin.site.register(PurchaseOrder, PurchaseOrderAdmin)
+admin.site.register(StockMovement, StockMovementAdmin)
+admin.site.register(StockSnapshot, StockSnapshotAdmin)
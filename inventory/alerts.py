@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DEFAULT_LOCATION_ID, Ingredient, StockAlert
+
+
+def stock_alerts_queued():
+    return getattr(settings, 'STOCK_ALERTS_QUEUE', False)
+
+
+def low_stock_ingredients(location_id=DEFAULT_LOCATION_ID):
+    """
+    Return the ingredients of a location at or below their reorder
+    threshold, lowest stock first.
+
+    The filter matches the condition of ``ingredient_low_stock_idx``, so
+    this reads only the location's range of that partial index, however
+    large the table is.
+    """
+    return Ingredient.objects.filter(
+        location_id=location_id,
+        available_quantity__lte=F('reorder_threshold'),
+    ).order_by('available_quantity', 'pk')
+
+
+def expiring_ingredients(days, location_id=DEFAULT_LOCATION_ID, today=None):
+    """
+    Return the ingredients of a location still in stock that expire within
+    ``days`` days (including those already expired), soonest first, with a
+    range scan of the ``(location, expiry_date)`` index
+    """
+    today = today or timezone.localdate()
+    return Ingredient.objects.filter(
+        location_id=location_id,
+        expiry_date__lte=today + timedelta(days=days),
+        available_quantity__gt=0,
+    ).order_by('expiry_date', 'pk')
+
+
+def queue_low_stock_alerts(ingredient_ids, change):
+    """
+    Queue a ``StockAlert`` for every ingredient in ``ingredient_ids`` that
+    the stock change just applied took to or below its reorder threshold.
+
+    ``change`` is the amount (or a per-row expression of it) by which the
+    available quantity changed, so the previous level is computed in the
+    same query that finds the crossed rows. Does nothing when
+    ``settings.STOCK_ALERTS_QUEUE`` is off.
+    """
+    if not ingredient_ids or not stock_alerts_queued():
+        return []
+    crossed = (
+        Ingredient.objects.filter(
+            pk__in=ingredient_ids,
+            available_quantity__lte=F('reorder_threshold'),
+        )
+        .alias(previous_quantity=F('available_quantity') - change)
+        .filter(previous_quantity__gt=F('reorder_threshold'))
+        .values_list('pk', 'available_quantity', 'reorder_threshold')
+    )
+    return StockAlert.objects.bulk_create(
+        StockAlert(
+            ingredient_id=ingredient_id,
+            available_quantity=available_quantity,
+            reorder_threshold=reorder_threshold,
+        )
+        for ingredient_id, available_quantity, reorder_threshold in crossed
+    )
+
+
+def is_low_stock(available_quantity, reorder_threshold):
+    return (
+        reorder_threshold is not None
+        and available_quantity <= reorder_threshold
+    )
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa: F401
+        from .search import check_search_indexes
+
+        checks.register(check_search_indexes, checks.Tags.database)
@@ -0,0 +1,182 @@
+"""
+Archive of old purchases.
+
+``archive_purchases`` moves the purchases made before a cutoff (a month
+boundary when run by the ``archive_purchases`` command) from the live
+``Purchase`` table into ``ArchivedPurchase``, so the live table only holds
+the retention window however much history accumulates.
+
+The purchase listings read both tables as one: ``purchase_partitions``
+returns the live table, plus the archive when the requested
+``date_from``/``date_to`` range reaches back into it, and
+``combine_partitions`` unions them. Listings of recent purchases only read
+where the archive ends (an index seek), so they cost the same as history
+grows.
+"""
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .filters import filter_purchases
+from .models import ArchivedPurchase, Purchase
+
+# Purchases moved per transaction
+ARCHIVE_BATCH_SIZE = 5000
+
+ARCHIVE_FIELDS = [
+    'id',
+    'location_id',
+    'menu_item_id',
+    'purchase_date',
+    'customer_name',
+    'quantity',
+    'total_price',
+]
+
+
+def archive_cutoff(months, today=None):
+    """
+    Return the start of the month ``months`` months before the current one,
+    in the current time zone: archiving before it keeps the current month
+    and the ``months`` full months before it live
+    """
+    today = today or timezone.localdate()
+    month = today.year * 12 + today.month - 1 - months
+    start = datetime.combine(
+        today.replace(year=month // 12, month=month % 12 + 1, day=1), time()
+    )
+    return timezone.make_aware(start)
+
+
+def archive_purchases(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move the purchases made before ``before`` into the archive and return
+    how many were moved.
+
+    Each batch is copied and deleted in its own transaction, so the live
+    table is never locked for long. The rows are deleted without signals:
+    archived purchases stay in the daily sales rollup.
+    """
+    qn = connection.ops.quote_name
+    table = qn(Purchase._meta.db_table)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Purchase.objects.using(DEFAULT_DB_ALIAS)
+                .filter(purchase_date__lt=before)
+                .order_by('pk')
+                .values_list(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            ArchivedPurchase.objects.bulk_create(
+                ArchivedPurchase(**dict(zip(ARCHIVE_FIELDS, row)))
+                for row in rows
+            )
+            # Exactly the copied rows: a purchase with a lower id committed
+            # since the SELECT is left for the next batch
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {qn("id")} IN '
+                    f'({", ".join(["%s"] * len(rows))})',
+                    [row[0] for row in rows],
+                )
+        moved += len(rows)
+    if moved:
+        # Both tables changed size: refresh the planner's statistics, which
+        # let SQLite start customer searches from the search index
+        with connection.cursor() as cursor:
+            for model in (Purchase, ArchivedPurchase):
+                cursor.execute(f'ANALYZE {qn(model._meta.db_table)}')
+    return moved
+
+
+def archive_end(location_id):
+    """
+    Return the date of the newest archived purchase of ``location_id``, or
+    None when it has none.
+
+    It is read on every request, from the database the listing reads, so
+    every process sees a new archive end once the archiving commits; the
+    ``(location, purchase_date, id)`` index makes it a single seek.
+    """
+    return (
+        ArchivedPurchase.objects.filter(location_id=location_id).aggregate(
+            end=Max('purchase_date')
+        )
+    )['end']
+
+
+async def aarchive_end(location_id):
+    """
+    ``archive_end`` for async views
+    """
+    return (
+        await ArchivedPurchase.objects.filter(
+            location_id=location_id
+        ).aaggregate(end=Max('purchase_date'))
+    )['end']
+
+
+def _starts_after(query_params, end):
+    # Whether the listing's date range (applied only when both bounds are
+    # given) starts after ``end``
+    date_from = query_params.get('date_from')
+    if not (date_from and query_params.get('date_to')):
+        return False
+    try:
+        date_from = Purchase._meta.get_field('purchase_date').to_python(
+            date_from
+        )
+    except ValidationError:
+        return False
+    if timezone.is_naive(date_from):
+        date_from = timezone.make_aware(date_from)
+    return date_from > end
+
+
+def _partitions(location_id, query_params, end, rank):
+    # The live table always takes part: purchases recorded with an old
+    # date after the last archiving are still in it
+    partitions = [Purchase.objects.filter(location_id=location_id)]
+    if end is not None and not _starts_after(query_params, end):
+        partitions.append(
+            ArchivedPurchase.objects.filter(location_id=location_id)
+        )
+    return [
+        filter_purchases(partition, query_params, rank=rank)
+        for partition in partitions
+    ]
+
+
+def purchase_partitions(location_id, query_params, rank=False):
+    """
+    Return the purchases of ``location_id`` matching the listing filters of
+    ``query_params``, as one queryset per table the date range overlaps
+    (see ``filter_purchases`` for ``rank``)
+    """
+    return _partitions(
+        location_id, query_params, archive_end(location_id), rank
+    )
+
+
+async def apurchase_partitions(location_id, query_params, rank=False):
+    """
+    ``purchase_partitions`` for async views
+    """
+    return _partitions(
+        location_id, query_params, await aarchive_end(location_id), rank
+    )
+
+
+def combine_partitions(partitions):
+    """
+    Return ``partitions`` as one queryset of ``Purchase`` rows. A union can
+    only be ordered, sliced and counted: filter the partitions first.
+    """
+    first, *rest = partitions
+    return first.union(*rest, all=True) if rest else first
@@ -0,0 +1,253 @@
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status, permissions
+from rest_framework.filters import OrderingFilter
+from .models import Ingredient, MenuItem
+from .serializers import (
+    IngredientSerializer,
+    MenuItemSerializer,
+    PurchaseSerializer,
+    StockStreamQuerySerializer,
+)
+from .archive import apurchase_partitions, combine_partitions
+from .filters import TrigramSearchFilter
+from .locations import LocationScopedMixin
+from .menu_cache import acached_menu_response
+from .pagination import AsyncPageNumberPagination, PurchaseKeysetPagination
+from .search import SEARCH_ORDERING
+from .stream import stock_events
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` whose handlers are coroutines, served without a thread per
+    request under ASGI.
+
+    Authentication, permissions and throttling are DRF's own sync code and
+    run in a worker thread; the handlers query with the async ORM. Under
+    WSGI the views still work, each request running its own event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # options() is sync
+            if isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+
+class AsyncGetIngredientApiView(LocationScopedMixin, AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = IngredientSerializer
+    pagination_class = AsyncPageNumberPagination
+
+    async def get(self, request):
+        ingredients = Ingredient.objects.filter(
+            location_id=request.location_id
+        )
+
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(ingredients, request)
+        paginated = page is not None
+        if paginated:
+            # The page count tells an empty table without another query
+            count = paginator.page.paginator.count
+        else:
+            page = [ingredient async for ingredient in ingredients]
+            count = len(page)
+
+        if not count:
+            return Response(
+                {'error': 'No ingredients found'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = self.serializer_class(page, many=True)
+        if paginated:
+            return paginator.get_paginated_response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class AsyncGetMenuItemApiView(LocationScopedMixin, AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = MenuItemSerializer
+    pagination_class = AsyncPageNumberPagination
+
+    async def get(self, request):
+        # Served from the versioned menu cache until the menu changes
+        return await acached_menu_response(
+            request, 'async-menu-items-list', lambda: self.list(request)
+        )
+
+    async def list(self, request):
+        menu_items = MenuItem.objects.filter(location_id=request.location_id)
+
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(menu_items, request)
+        paginated = page is not None
+        if paginated:
+            # The page count tells an empty table without another query
+            count = paginator.page.paginator.count
+        else:
+            page = [menu_item async for menu_item in menu_items]
+            count = len(page)
+
+        if not count:
+            return Response(
+                {'error': 'No menu items found'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = self.serializer_class(page, many=True)
+        if paginated:
+            return paginator.get_paginated_response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class AsyncGetMenuItemsApiView(LocationScopedMixin, AsyncAPIView):
+    serializer_class = MenuItemSerializer
+    filter_backends = [TrigramSearchFilter, OrderingFilter]
+    search_fields = ['item_name']
+    ordering_fields = ['price', 'item_name']
+
+    async def get(self, request):
+        # Served from the versioned menu cache until the menu changes; the
+        # search and ordering parameters are part of the cache key
+        return await acached_menu_response(
+            request, 'async-get-menu-items', lambda: self.list(request)
+        )
+
+    async def list(self, request):
+        menu_items = MenuItem.objects.filter(location_id=request.location_id)
+
+        # The filter backends only build the (lazy) queryset
+        for backend in list(self.filter_backends):
+            menu_items = backend().filter_queryset(request, menu_items, self)
+
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(menu_items, request)
+        if page is not None:
+            serializer = self.serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = self.serializer_class(
+            [menu_item async for menu_item in menu_items], many=True
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class AsyncGetPurchasesApiView(LocationScopedMixin, AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = PurchaseSerializer
+
+    ordering_fields = ['purchase_date']
+
+    async def get(self, request):
+        # Keyset pagination (opt-in) always orders by (purchase_date, id)
+        keyset = (
+            request.query_params.get('pagination') == 'keyset'
+            or PurchaseKeysetPagination.cursor_query_param
+            in request.query_params
+        )
+        ordering = request.query_params.get('ordering')
+        # Customer searches list the best matches first unless ordered
+        ranked = (
+            not keyset
+            and ordering not in self.ordering_fields
+            and bool(request.query_params.get('customer_name'))
+        )
+        partitions = await apurchase_partitions(
+            request.location_id, request.query_params, rank=ranked
+        )
+
+        if keyset:
+            paginator = PurchaseKeysetPagination()
+            page = await paginator.apaginate_queryset(partitions, request)
+            serializer = self.serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        purchases = combine_partitions(partitions)
+
+        if ordering in self.ordering_fields:
+            purchases = purchases.order_by(ordering)
+        elif ranked:
+            purchases = purchases.order_by(*SEARCH_ORDERING)
+
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(purchases, request)
+        if page is not None:
+            serializer = self.serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = self.serializer_class(
+            [purchase async for purchase in purchases], many=True
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class EventStreamNegotiation(DefaultContentNegotiation):
+    # EventSource clients only accept text/event-stream, which the stream
+    # answers with a plain response; errors are rendered as JSON
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class StockStreamApiView(LocationScopedMixin, AsyncAPIView):
+    """
+    Server-sent events with the live stock levels (see stream.py); meant
+    to be served under ASGI, where an open stream holds no thread
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = EventStreamNegotiation
+
+    async def get(self, request):
+        query_serializer = StockStreamQuerySerializer(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            stock_events(
+                query_serializer.validated_data['timeout'],
+                request.location_id,
+            ),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies from buffering the events
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db.models import F, Min, Q
+from django.db.models.functions import Floor
+
+from .models import DEFAULT_LOCATION_ID, MenuItem
+from .versions import bump_versions_on_commit, get_version
+
+AVAILABILITY_VERSION_KEY = 'inventory:menu-availability-version:{location_id}'
+AVAILABILITY_CACHE_KEY = 'inventory:menu-availability:{location_id}:{version}'
+# Availability is keyed by version, so stale copies are never read again;
+# the timeout bounds how long they occupy the cache
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+
+def compute_menu_availability(location_id=DEFAULT_LOCATION_ID):
+    """
+    Return how many servings of every menu item of a location can be made
+    from the current stock, computed with a single aggregate query.
+
+    ``max_servings`` is the minimum over the item's recipe of
+    ``floor(available_quantity / required quantity)``, or ``None`` for items
+    without ingredient requirements.
+    """
+    menu_items = (
+        MenuItem.objects.filter(location_id=location_id)
+        .annotate(
+            max_servings=Min(
+                Floor(
+                    F('reciperequirement__ingredient__available_quantity')
+                    / F('reciperequirement__quantity')
+                ),
+                filter=Q(reciperequirement__quantity__gt=0),
+            )
+        )
+        .values('id', 'item_name', 'max_servings')
+        .order_by('id')
+    )
+    return [
+        {
+            'id': menu_item['id'],
+            'name': menu_item['item_name'],
+            'max_servings': (
+                None
+                if menu_item['max_servings'] is None
+                else int(menu_item['max_servings'])
+            ),
+        }
+        for menu_item in menu_items
+    ]
+
+
+def _version_key(location_id):
+    return AVAILABILITY_VERSION_KEY.format(location_id=location_id)
+
+
+def get_menu_availability(location_id=DEFAULT_LOCATION_ID):
+    """
+    Return the menu availability of a location, computing it only when a
+    stock, recipe or menu change there moved it to a new version
+    """
+    key = AVAILABILITY_CACHE_KEY.format(
+        location_id=location_id,
+        version=get_version(_version_key(location_id)),
+    )
+    availability = cache.get(key)
+    if availability is None:
+        availability = compute_menu_availability(location_id)
+        cache.set(key, availability, timeout=AVAILABILITY_CACHE_TIMEOUT)
+    return availability
+
+
+def invalidate_menu_availability(location_ids):
+    """
+    Move the menu availability of ``location_ids`` to a new version
+    """
+    bump_versions_on_commit(
+        _version_key(location_id) for location_id in location_ids
+    )
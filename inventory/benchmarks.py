@@ -0,0 +1,862 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import count
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from sl_backend.database import (
+    DEFAULT_CONN_MAX_AGE,
+    SQLITE_PRODUCTION_PRAGMAS,
+)
+from user_management.authentication import token_cache
+from user_management.urls import urlpatterns as user_urlpatterns
+
+from .models import (
+    DEFAULT_LOCATION_ID,
+    Ingredient,
+    Location,
+    MenuItem,
+    Purchase,
+    RecipeRequirement,
+)
+from .sales import rebuild_daily_sales
+from .urls import urlpatterns as inventory_urlpatterns
+
+# Row counts seeded at scale 1
+VOLUMES = {
+    'ingredients': 10000,
+    'menu_items': 2000,
+    'recipe_requirements': 20000,
+    'purchases': 1000000,
+}
+DEFAULT_SCALE = 0.01
+DEFAULT_ITERATIONS = 20
+SEED_BATCH_SIZE = 5000
+BENCHMARK_PASSWORD = 'benchmark-password'
+# Absolute p95 slack, so sub-millisecond routes do not fail on timer noise
+LATENCY_SLACK_MS = 1.0
+# Listing routes compared by the concurrency benchmark, with their async
+# counterparts
+CONCURRENCY_ROUTES = {
+    'ingredient-list': 'async-ingredient-list',
+    'menu-items-list': 'async-menu-items-list',
+    'get-menu-items': 'async-get-menu-items',
+    'get-purchases': 'async-get-purchases',
+}
+DEFAULT_REQUESTS = 500
+DEFAULT_CONCURRENCY = 50
+DEFAULT_WORKERS = 4
+# Rows in the large bulk purchase batch
+LARGE_BATCH_ROWS = 10000
+# Routes and database connection handling compared by the connection
+# benchmark: the stock settings, which connect for every request, and the
+# production profile
+CONNECTION_ROUTES = ['ingredient-list', 'get-purchases']
+CONNECTION_PROFILES = {
+    'per-request': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'SQLITE_PRAGMAS': {},
+    },
+    'persistent': {
+        'CONN_MAX_AGE': DEFAULT_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'SQLITE_PRAGMAS': SQLITE_PRODUCTION_PRAGMAS,
+    },
+}
+
+
+class BenchmarkError(Exception):
+    """
+    Raised when a benchmarked route does not answer as expected
+    """
+
+
+class BenchmarkData:
+    """
+    Seeded rows the scenarios build their requests from
+    """
+
+    def __init__(self, scale, seed=0):
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.unique = count()
+        self.start = timezone.now() - timedelta(days=365)
+
+    def volume(self, name):
+        return max(1, int(VOLUMES[name] * self.scale))
+
+    def seed(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='benchmark', password=BENCHMARK_PASSWORD
+        )
+        self.token = Token.objects.create(user=self.user)
+        # Requests resolve the location from the user's memberships; a
+        # flushed test database no longer has the default location
+        location, _ = Location.objects.get_or_create(
+            pk=DEFAULT_LOCATION_ID, defaults={'name': 'Default'}
+        )
+        location.members.add(self.user)
+
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f'Ingredient {i}',
+                    available_quantity=1e12,
+                    measurement_unit=Ingredient.GRAMS,
+                    price_per_unit='0.50',
+                )
+                for i in range(self.volume('ingredients'))
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+        MenuItem.objects.bulk_create(
+            (
+                MenuItem(item_name=f'Menu item {i}', price='9.99')
+                for i in range(self.volume('menu_items'))
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('pk', flat=True)
+        )
+        self.menu_item_ids = list(
+            MenuItem.objects.values_list('pk', flat=True)
+        )
+
+        # Every menu item gets an equal share of distinct ingredients
+        per_item = max(
+            1,
+            min(
+                len(self.ingredient_ids),
+                self.volume('recipe_requirements') // len(self.menu_item_ids),
+            ),
+        )
+        RecipeRequirement.objects.bulk_create(
+            (
+                RecipeRequirement(
+                    menu_item_id=menu_item_id,
+                    ingredient_id=ingredient_id,
+                    quantity=1,
+                )
+                for menu_item_id in self.menu_item_ids
+                for ingredient_id in self.random.sample(
+                    self.ingredient_ids, per_item
+                )
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+
+        seconds = 365 * 24 * 60 * 60
+        Purchase.objects.bulk_create(
+            (
+                Purchase(
+                    menu_item_id=self.random.choice(self.menu_item_ids),
+                    purchase_date=self.start
+                    + timedelta(seconds=self.random.randrange(seconds)),
+                    customer_name=f'Customer {self.random.randrange(10000)}',
+                    quantity=1,
+                    total_price='9.99',
+                )
+                for _ in range(self.volume('purchases'))
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+        rebuild_daily_sales()
+
+    def name(self, prefix):
+        return f'{prefix} {next(self.unique)}'
+
+    def menu_item_id(self):
+        return self.random.choice(self.menu_item_ids)
+
+    def ingredient_id(self):
+        return self.random.choice(self.ingredient_ids)
+
+    def day(self):
+        day = self.start + timedelta(days=self.random.randrange(365))
+        return day.date().isoformat()
+
+
+class Scenario:
+    """
+    A request against one route.
+
+    ``build(data)`` returns ``(method, path, payload)``; it runs outside the
+    timed section, so it can also create the rows the request needs.
+    """
+
+    def __init__(self, name, url_name, build, expected_status=200):
+        self.name = name
+        self.url_name = url_name
+        self.build = build
+        self.expected_status = expected_status
+
+
+def _delete_ingredient(data):
+    ingredient = Ingredient.objects.create(
+        name=data.name('Deleted'),
+        available_quantity=1,
+        measurement_unit=Ingredient.GRAMS,
+        price_per_unit='1.00',
+    )
+    return (
+        'delete',
+        reverse('ingredient-delete', args=[ingredient.pk]),
+        None,
+    )
+
+
+def _store_recipe_requirement(data):
+    menu_item = MenuItem.objects.create(
+        item_name=data.name('Recipe item'), price='5.00'
+    )
+    return (
+        'post',
+        reverse('store-reciperequirement'),
+        {
+            'menu_item': menu_item.pk,
+            'ingredient': data.ingredient_id(),
+            'quantity': 1,
+        },
+    )
+
+
+def _store_recipe_requirements(data):
+    menu_items = MenuItem.objects.bulk_create(
+        MenuItem(item_name=data.name('Imported item'), price='5.00')
+        for _ in range(20)
+    )
+    return (
+        'post',
+        reverse('store-reciperequirements-bulk'),
+        [
+            {
+                'menu_item': menu_item.pk,
+                'ingredient': ingredient_id,
+                'quantity': 1,
+            }
+            for menu_item in menu_items
+            for ingredient_id in data.random.sample(
+                data.ingredient_ids, min(15, len(data.ingredient_ids))
+            )
+        ],
+    )
+
+
+def _store_purchases(data):
+    # A full import batch, so validating every row dominates the request
+    return (
+        'post',
+        reverse('store-purchases-bulk'),
+        [
+            {
+                'menu_item': data.menu_item_id(),
+                'purchase_date': f'{data.day()}T12:00:00Z',
+                'customer_name': f'Customer {index}',
+                'quantity': 1,
+            }
+            for index in range(LARGE_BATCH_ROWS)
+        ],
+    )
+
+
+def _date_range(data):
+    day = data.day()
+    return {'date_from': f'{day}T00:00:00Z', 'date_to': f'{day}T23:59:59Z'}
+
+
+SCENARIOS = [
+    Scenario(
+        'ingredient-list',
+        'ingredient-list',
+        lambda data: ('get', reverse('ingredient-list'), None),
+    ),
+    Scenario(
+        'async-ingredient-list',
+        'async-ingredient-list',
+        lambda data: ('get', reverse('async-ingredient-list'), None),
+    ),
+    Scenario(
+        'ingredient-alerts',
+        'ingredient-alerts',
+        lambda data: (
+            'get',
+            reverse('ingredient-alerts'),
+            {'days': 7},
+        ),
+    ),
+    Scenario(
+        'ingredient-forecast',
+        'ingredient-forecast',
+        lambda data: ('get', reverse('ingredient-forecast'), None),
+    ),
+    Scenario(
+        'ingredient-stock',
+        'ingredient-stock',
+        lambda data: (
+            'get',
+            reverse('ingredient-stock'),
+            {'at': f'{data.day()}T12:00:00Z'},
+        ),
+    ),
+    Scenario(
+        'ingredient-movements',
+        'ingredient-movements',
+        lambda data: (
+            'get',
+            reverse('ingredient-movements', args=[data.ingredient_id()]),
+            None,
+        ),
+    ),
+    Scenario(
+        'ingredient-stream',
+        'ingredient-stream',
+        lambda data: ('get', reverse('ingredient-stream'), {'timeout': 0}),
+    ),
+    Scenario(
+        'stock-alerts',
+        'stock-alerts',
+        lambda data: ('get', reverse('stock-alerts'), {'after': 0}),
+    ),
+    Scenario(
+        'ingredient-delete',
+        'ingredient-delete',
+        _delete_ingredient,
+        expected_status=204,
+    ),
+    Scenario(
+        'menu-items-list',
+        'menu-items-list',
+        lambda data: ('get', reverse('menu-items-list'), None),
+    ),
+    Scenario(
+        'async-menu-items-list',
+        'async-menu-items-list',
+        lambda data: ('get', reverse('async-menu-items-list'), None),
+    ),
+    Scenario(
+        'menu-items-availability',
+        'menu-items-availability',
+        lambda data: ('get', reverse('menu-items-availability'), None),
+    ),
+    Scenario(
+        'menu-items-costing',
+        'menu-items-costing',
+        lambda data: ('get', reverse('menu-items-costing'), None),
+    ),
+    Scenario(
+        'store-menu-item',
+        'store-menu-item',
+        lambda data: (
+            'post',
+            reverse('store-menu-item'),
+            {'name': data.name('New item'), 'price': '7.50'},
+        ),
+        expected_status=201,
+    ),
+    Scenario(
+        'store-ingredient',
+        'store-ingredient',
+        lambda data: (
+            'post',
+            reverse('store-ingredient'),
+            {
+                'name': data.name('New ingredient'),
+                'available_quantity': 100,
+                'measurement_unit': Ingredient.GRAMS,
+                'price_per_unit': '1.25',
+            },
+        ),
+        expected_status=201,
+    ),
+    Scenario(
+        'store-reciperequirement',
+        'store-reciperequirement',
+        _store_recipe_requirement,
+        expected_status=201,
+    ),
+    Scenario(
+        'store-reciperequirements-bulk',
+        'store-reciperequirements-bulk',
+        _store_recipe_requirements,
+        expected_status=201,
+    ),
+    Scenario(
+        'store-purchase',
+        'store-purchase',
+        lambda data: (
+            'post',
+            reverse('store-purchase'),
+            {
+                'menu_item': data.menu_item_id(),
+                'customer_name': 'Benchmark',
+                'quantity': 1,
+                'total_price': '9.99',
+            },
+        ),
+        expected_status=201,
+    ),
+    Scenario(
+        'store-purchases-bulk',
+        'store-purchases-bulk',
+        lambda data: (
+            'post',
+            reverse('store-purchases-bulk'),
+            [
+                {'menu_item': data.menu_item_id(), 'quantity': 1}
+                for _ in range(100)
+            ],
+        ),
+        expected_status=201,
+    ),
+    Scenario(
+        'store-purchases-bulk-large',
+        'store-purchases-bulk',
+        _store_purchases,
+        expected_status=201,
+    ),
+    Scenario(
+        'update-ingredient',
+        'update-ingredient',
+        lambda data: (
+            'patch',
+            reverse('update-ingredient', args=[data.ingredient_id()]),
+            {'available_quantity': 1e12},
+        ),
+    ),
+    Scenario(
+        'update-ingredients-bulk',
+        'update-ingredients-bulk',
+        lambda data: (
+            'patch',
+            reverse('update-ingredients-bulk'),
+            [
+                {'id': ingredient_id, 'delta': 10}
+                for ingredient_id in data.random.sample(
+                    data.ingredient_ids, min(100, len(data.ingredient_ids))
+                )
+            ],
+        ),
+    ),
+    Scenario(
+        'get-menu-items',
+        'get-menu-items',
+        lambda data: (
+            'get',
+            reverse('get-menu-items') + '?search=item 1&ordering=price',
+            None,
+        ),
+    ),
+    Scenario(
+        'async-get-menu-items',
+        'async-get-menu-items',
+        lambda data: (
+            'get',
+            reverse('async-get-menu-items') + '?search=item 1&ordering=price',
+            None,
+        ),
+    ),
+    Scenario(
+        'get-purchases',
+        'get-purchases',
+        lambda data: ('get', reverse('get-purchases'), _date_range(data)),
+    ),
+    Scenario(
+        'get-purchases-keyset',
+        'get-purchases',
+        lambda data: (
+            'get',
+            reverse('get-purchases'),
+            {'pagination': 'keyset'},
+        ),
+    ),
+    Scenario(
+        'get-purchases-customer-search',
+        'get-purchases',
+        lambda data: (
+            'get',
+            reverse('get-purchases'),
+            {'customer_name': str(data.random.randrange(1000, 10000))},
+        ),
+    ),
+    Scenario(
+        'async-get-purchases',
+        'async-get-purchases',
+        lambda data: (
+            'get',
+            reverse('async-get-purchases'),
+            _date_range(data),
+        ),
+    ),
+    Scenario(
+        'async-get-purchases-keyset',
+        'async-get-purchases',
+        lambda data: (
+            'get',
+            reverse('async-get-purchases'),
+            {'pagination': 'keyset'},
+        ),
+    ),
+    Scenario(
+        'export-purchases',
+        'export-purchases',
+        lambda data: ('get', reverse('export-purchases'), _date_range(data)),
+    ),
+    Scenario(
+        'sales-rollup',
+        'sales-rollup',
+        lambda data: (
+            'get',
+            reverse('sales-rollup'),
+            {'period': 'month', 'menu_item_id': data.menu_item_id()},
+        ),
+    ),
+    Scenario(
+        'plan-purchase-order',
+        'plan-purchase-order',
+        lambda data: ('post', reverse('plan-purchase-order'), {}),
+        expected_status=201,
+    ),
+    Scenario(
+        'user-login',
+        'user-login',
+        lambda data: (
+            'post',
+            reverse('user-login'),
+            {'username': 'benchmark', 'password': BENCHMARK_PASSWORD},
+        ),
+    ),
+]
+
+
+def unbenchmarked_routes():
+    """
+    Return the names of inventory and user management routes without a
+    benchmark scenario
+    """
+    covered = {scenario.url_name for scenario in SCENARIOS}
+    return sorted(
+        pattern.name
+        for pattern in inventory_urlpatterns + user_urlpatterns
+        if pattern.name not in covered
+    )
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(index)]
+
+
+def _request(client, method, path, payload):
+    if method == 'get':
+        response = client.get(path, payload)
+    else:
+        response = getattr(client, method)(path, payload, format='json')
+    if response.streaming:
+        # streamed bodies are only produced while being consumed
+        if response.is_async:
+            async_to_sync(_consume)(response)
+        else:
+            b''.join(response.streaming_content)
+    return response
+
+
+async def _consume(response):
+    async for _ in response:
+        pass
+
+
+def run_scenario(client, data, scenario, iterations):
+    """
+    Run ``scenario`` once to warm up, then ``iterations`` timed times, and
+    return its query count and latency percentiles
+    """
+    durations = []
+    queries = 0
+    for iteration in range(iterations + 1):
+        method, path, payload = scenario.build(data)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = _request(client, method, path, payload)
+            duration = time.perf_counter() - started
+        if response.status_code != scenario.expected_status:
+            raise BenchmarkError(
+                f'{scenario.name}: expected status '
+                f'{scenario.expected_status}, got {response.status_code}'
+            )
+        if iteration:
+            durations.append(duration * 1000)
+            queries = max(queries, len(captured))
+    return {
+        'queries': queries,
+        'p50_ms': round(_percentile(durations, 50), 3),
+        'p95_ms': round(_percentile(durations, 95), 3),
+    }
+
+
+def run_benchmarks(
+    scale=DEFAULT_SCALE, iterations=DEFAULT_ITERATIONS, scenarios=None
+):
+    """
+    Seed the current database at ``scale`` and benchmark every scenario.
+
+    Returns ``{scenario name: {'queries', 'p50_ms', 'p95_ms'}}``. Meant to
+    run against a throwaway (test) database.
+    """
+    missing = unbenchmarked_routes()
+    if missing:
+        raise BenchmarkError(f'Routes without a scenario: {missing}')
+
+    cache.clear()
+    token_cache.clear()
+    data = BenchmarkData(scale)
+    data.seed()
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Token ' + data.token.key)
+    return {
+        scenario.name: run_scenario(client, data, scenario, iterations)
+        for scenario in scenarios or SCENARIOS
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare ``results`` with a stored ``baseline`` and return a message per
+    regression.
+
+    Any increase in query count is a regression. Latency is compared only
+    when both runs used the same scale; a route regresses when its p95
+    exceeds the baseline p95 times ``tolerance`` (plus
+    ``LATENCY_SLACK_MS``).
+    """
+    regressions = []
+    compare_latency = baseline.get('scale') == results['scale']
+    for name, result in results['routes'].items():
+        expected = baseline.get('routes', {}).get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: {result["queries"]} queries, baseline '
+                f'{expected["queries"]}'
+            )
+        if compare_latency and (
+            result['p95_ms']
+            > expected['p95_ms'] * tolerance + LATENCY_SLACK_MS
+        ):
+            regressions.append(
+                f'{name}: p95 {result["p95_ms"]}ms, baseline '
+                f'{expected["p95_ms"]}ms'
+            )
+    return regressions
+
+
+def _wsgi_request(handler, path, token):
+    environ = RequestFactory().get(path, HTTP_AUTHORIZATION=token).environ
+    statuses = []
+    response = handler(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+async def _asgi_request(handler, path, token):
+    scope = AsyncRequestFactory().get(path, headers={'authorization': token})
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await handler(scope.scope, receive, send)
+    return messages[0]['status']
+
+
+async def _drive(call, requests, concurrency):
+    # ``requests`` calls with at most ``concurrency`` in flight, like that
+    # many clients polling back to back
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+    statuses = set()
+
+    async def client():
+        async with semaphore:
+            started = time.perf_counter()
+            statuses.add(await call())
+            durations.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return statuses, {
+        'requests_per_s': round(requests / elapsed, 1),
+        'p50_ms': round(_percentile(durations, 50), 3),
+        'p95_ms': round(_percentile(durations, 95), 3),
+    }
+
+
+def measure_wsgi(path, token, requests, concurrency, workers):
+    """
+    Serve ``path`` with a ``WSGIHandler`` on ``workers`` threads, as a
+    threaded WSGI server would: requests past the busy workers wait for one
+    to free up
+    """
+    handler = WSGIHandler()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+
+        async def call():
+            return await asyncio.get_running_loop().run_in_executor(
+                pool, _wsgi_request, handler, path, token
+            )
+
+        return asyncio.run(_drive(call, requests, concurrency))
+
+
+def measure_asgi(path, token, requests, concurrency):
+    """
+    Serve ``path`` with an ``ASGIHandler`` on one event loop, as an ASGI
+    server worker would
+    """
+    handler = ASGIHandler()
+    return asyncio.run(
+        _drive(
+            lambda: _asgi_request(handler, path, token), requests, concurrency
+        )
+    )
+
+
+def run_concurrency_benchmarks(
+    scale=DEFAULT_SCALE,
+    requests=DEFAULT_REQUESTS,
+    concurrency=DEFAULT_CONCURRENCY,
+    workers=DEFAULT_WORKERS,
+):
+    """
+    Seed the current database at ``scale`` and compare the throughput of
+    every ``CONCURRENCY_ROUTES`` listing served by WSGI (sync view,
+    ``workers`` threads) and by ASGI (async view, one event loop), with
+    ``concurrency`` requests in flight.
+
+    Returns ``{route: {'wsgi': result, 'asgi': result}}``, each result
+    holding ``requests_per_s``, ``p50_ms`` and ``p95_ms``. Meant to run
+    against a throwaway (test) database.
+    """
+    cache.clear()
+    token_cache.clear()
+    data = BenchmarkData(scale)
+    data.seed()
+    token = f'Token {data.token.key}'
+
+    results = {}
+    for sync_name, async_name in CONCURRENCY_ROUTES.items():
+        results[sync_name] = {}
+        for mode, measure in (
+            (
+                'wsgi',
+                lambda requests: measure_wsgi(
+                    reverse(sync_name), token, requests, concurrency, workers
+                ),
+            ),
+            (
+                'asgi',
+                lambda requests: measure_asgi(
+                    reverse(async_name), token, requests, concurrency
+                ),
+            ),
+        ):
+            # One warm-up request fills the menu and token caches
+            measure(1)
+            statuses, results[sync_name][mode] = measure(requests)
+            if statuses != {200}:
+                raise BenchmarkError(
+                    f'{sync_name} ({mode}): expected status 200, got '
+                    f'{sorted(statuses)}'
+                )
+    return results
+
+
+def run_connection_benchmarks(
+    scale=DEFAULT_SCALE,
+    requests=DEFAULT_REQUESTS,
+    concurrency=DEFAULT_CONCURRENCY,
+    workers=DEFAULT_WORKERS,
+):
+    """
+    Seed the current database at ``scale`` and compare the WSGI throughput
+    of the ``CONNECTION_ROUTES`` under every ``CONNECTION_PROFILES`` entry,
+    with ``concurrency`` requests in flight on ``workers`` threads.
+
+    Returns ``{route: {profile: result}}``, each result holding
+    ``requests_per_s``, ``p50_ms``, ``p95_ms`` and ``connections``, the
+    number of database connections opened while serving the requests.
+    Meant to run against a throwaway (test) database; SQLite databases are
+    left in WAL mode.
+    """
+    cache.clear()
+    token_cache.clear()
+    data = BenchmarkData(scale)
+    data.seed()
+    token = f'Token {data.token.key}'
+
+    opened = []
+
+    def count_connection(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    database = connections.settings[DEFAULT_DB_ALIAS]
+    saved = {
+        name: database[name] for name in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')
+    }
+    results = {name: {} for name in CONNECTION_ROUTES}
+    connection_created.connect(count_connection)
+    try:
+        for profile, options in CONNECTION_PROFILES.items():
+            # The worker threads' connections read the shared settings
+            database['CONN_MAX_AGE'] = options['CONN_MAX_AGE']
+            database['CONN_HEALTH_CHECKS'] = options['CONN_HEALTH_CHECKS']
+            with override_settings(SQLITE_PRAGMAS=options['SQLITE_PRAGMAS']):
+                for name in CONNECTION_ROUTES:
+                    path = reverse(name)
+                    # Each measurement starts on new threads, without
+                    # connections; the warm-up fills the caches
+                    measure_wsgi(path, token, 1, 1, 1)
+                    opened.clear()
+                    statuses, result = measure_wsgi(
+                        path, token, requests, concurrency, workers
+                    )
+                    if statuses != {200}:
+                        raise BenchmarkError(
+                            f'{name} ({profile}): expected status 200, got '
+                            f'{sorted(statuses)}'
+                        )
+                    result['connections'] = len(opened)
+                    results[name][profile] = result
+    finally:
+        connection_created.disconnect(count_connection)
+        database.update(saved)
+    return results
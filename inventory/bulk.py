@@ -0,0 +1,399 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .availability import invalidate_menu_availability
+from .costing import mark_costs_dirty
+from .ledger import record_movements
+from .models import (
+    DEFAULT_LOCATION_ID,
+    Ingredient,
+    MenuItem,
+    Purchase,
+    RecipeRequirement,
+    StockMovement,
+)
+from .sales import record_sales
+from .serializers import (
+    BulkIngredientStockSerializer,
+    BulkPurchaseSerializer,
+    BulkRecipeRequirementSerializer,
+)
+from .stock import adjust_stock, deplete_stock
+
+# Rows written per INSERT statement
+BULK_BATCH_SIZE = 1000
+
+
+def _recipes(menu_item_ids):
+    # {menu_item_id: [(ingredient_id, quantity), ...]} in a single query
+    recipes = defaultdict(list)
+    requirements = RecipeRequirement.objects.filter(
+        menu_item_id__in=menu_item_ids, quantity__gt=0
+    ).values_list('menu_item_id', 'ingredient_id', 'quantity')
+    for menu_item_id, ingredient_id, quantity in requirements:
+        recipes[menu_item_id].append((ingredient_id, quantity))
+    return recipes
+
+
+def _clean_purchase(row, fields, tz):
+    # The data BulkPurchaseSerializer would return for a row whose values
+    # already have their field's type, running the fields' own validators;
+    # None for anything else (strings to coerce, naive dates, invalid rows),
+    # which the serializer then validates and reports
+    if not isinstance(row, dict):
+        return None
+    data = {
+        'menu_item': row.get('menu_item'),
+        'customer_name': row.get('customer_name', ''),
+        'quantity': row.get('quantity'),
+    }
+    if (
+        type(data['menu_item']) is not int
+        or type(data['quantity']) is not int
+        or type(data['customer_name']) is not str
+    ):
+        return None
+    data['customer_name'] = data['customer_name'].strip()
+    if 'purchase_date' in row:
+        try:
+            purchase_date = parse_datetime(row['purchase_date'])
+        except (TypeError, ValueError):
+            return None
+        if purchase_date is None or timezone.is_naive(purchase_date):
+            return None
+        try:
+            data['purchase_date'] = purchase_date.astimezone(tz)
+        except OverflowError:
+            return None
+    try:
+        for name, value in data.items():
+            fields[name].run_validators(value)
+    except ValidationError:
+        return None
+    return data
+
+
+@transaction.atomic
+def ingest_purchases(rows, location_id=DEFAULT_LOCATION_ID):
+    """
+    Validate and store a batch of purchases of a location's menu items,
+    returning one result dict per input row (in input order).
+
+    Menu item prices, recipes and ingredient levels are each read with one
+    query for the whole batch, ``total_price`` is computed in memory and
+    the purchases are written with ``bulk_create``. Rows are accepted in
+    order while there is stock for them; the accepted rows' ingredients are
+    then deducted with a single conditional UPDATE, so the batch raises
+    ``InsufficientStockError`` (and writes nothing) if concurrent orders
+    used the stock in the meantime. The daily sales rollup is updated in
+    the same transaction.
+
+    Rows whose values already have the right types skip the serializer's
+    coercion but run its fields' validators; only the others go through
+    ``BulkPurchaseSerializer``, which coerces them or reports their
+    errors.
+    """
+    results = [None] * len(rows)
+    valid = []
+    # One serializer validates every row, so its fields are built only once
+    serializer = BulkPurchaseSerializer()
+    tz = timezone.get_current_timezone()
+    for index, row in enumerate(rows):
+        data = _clean_purchase(row, serializer.fields, tz)
+        if data is not None:
+            valid.append((index, data))
+            continue
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as e:
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'errors': e.detail,
+            }
+
+    menu_item_ids = {data['menu_item'] for _, data in valid}
+    prices = dict(
+        MenuItem.objects.filter(
+            location_id=location_id, pk__in=menu_item_ids
+        ).values_list('pk', 'price')
+    )
+    recipes = _recipes(prices.keys())
+    levels = dict(
+        Ingredient.objects.filter(
+            pk__in={
+                ingredient_id
+                for recipe in recipes.values()
+                for ingredient_id, _ in recipe
+            }
+        ).values_list('pk', 'available_quantity')
+    )
+
+    now = timezone.now()
+    needs = defaultdict(float)
+    accepted = []
+    purchases = []
+    for index, data in valid:
+        price = prices.get(data['menu_item'])
+        if price is None:
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'errors': {'menu_item': ['MenuItem not found.']},
+            }
+            continue
+
+        quantity = data['quantity']
+        recipe = recipes.get(data['menu_item'], ())
+        if any(
+            levels.get(ingredient_id, 0) - needs[ingredient_id]
+            < required * quantity
+            for ingredient_id, required in recipe
+        ):
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'errors': {'quantity': ['Insufficient stock.']},
+            }
+            continue
+
+        for ingredient_id, required in recipe:
+            needs[ingredient_id] += required * quantity
+        accepted.append(index)
+        purchases.append(
+            Purchase(
+                location_id=location_id,
+                menu_item_id=data['menu_item'],
+                purchase_date=data.get('purchase_date', now),
+                customer_name=data['customer_name'],
+                quantity=quantity,
+                total_price=price * quantity,
+            )
+        )
+
+    deplete_stock(dict(needs), location_id)
+    purchases = Purchase.objects.bulk_create(
+        purchases, batch_size=BULK_BATCH_SIZE
+    )
+    # bulk_create sends no signals, so roll the batch up explicitly
+    record_sales(purchases)
+    for index, purchase in zip(accepted, purchases):
+        results[index] = {
+            'index': index,
+            'status': 'created',
+            'id': purchase.pk,
+            'total_price': str(purchase.total_price),
+        }
+    return results
+
+
+@transaction.atomic
+def upsert_recipe_requirements(rows, location_id=DEFAULT_LOCATION_ID):
+    """
+    Validate and insert or update a batch of recipe rows of a location in
+    one transaction.
+
+    Menu item and ingredient references are checked with one ``IN`` query
+    each, locking the rows so they cannot be deleted before the write, and
+    rows are upserted on ``(menu_item, ingredient)`` with
+    ``bulk_create(update_conflicts=True)``; a later row for the same pair
+    wins. Returns a list of per-row errors; if it is not empty nothing was
+    written.
+    """
+    errors = []
+    valid = []
+    # One serializer validates every row, so its fields are built only once
+    serializer = BulkRecipeRequirementSerializer()
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+
+    menu_item_ids = set(
+        MenuItem.objects.select_for_update()
+        .filter(
+            location_id=location_id,
+            pk__in={data['menu_item'] for _, data in valid},
+        )
+        .values_list('pk', flat=True)
+    )
+    ingredient_ids = set(
+        Ingredient.objects.select_for_update()
+        .filter(
+            location_id=location_id,
+            pk__in={data['ingredient'] for _, data in valid},
+        )
+        .values_list('pk', flat=True)
+    )
+
+    requirements = {}
+    for index, data in valid:
+        row_errors = {}
+        if data['menu_item'] not in menu_item_ids:
+            row_errors['menu_item'] = ['MenuItem not found.']
+        if data['ingredient'] not in ingredient_ids:
+            row_errors['ingredient'] = ['Ingredient not found.']
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+        requirements[(data['menu_item'], data['ingredient'])] = data[
+            'quantity'
+        ]
+
+    if errors:
+        return sorted(errors, key=lambda error: error['index'])
+
+    RecipeRequirement.objects.bulk_create(
+        (
+            RecipeRequirement(
+                location_id=location_id,
+                menu_item_id=menu_item_id,
+                ingredient_id=ingredient_id,
+                quantity=quantity,
+            )
+            for (menu_item_id, ingredient_id), quantity in (
+                requirements.items()
+            )
+        ),
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['menu_item', 'ingredient'],
+        update_fields=['quantity'],
+    )
+    # bulk_create sends no signals
+    invalidate_menu_availability([location_id])
+    mark_costs_dirty(
+        location_id, {menu_item_id for menu_item_id, _ in requirements}
+    )
+    return []
+
+
+def _merge(adjustment, data):
+    # Fold one row into an ingredient's (quantity, delta): an absolute
+    # quantity replaces everything before it, deltas add up
+    if 'available_quantity' in data:
+        return data['available_quantity'], 0.0
+    quantity, delta = adjustment
+    return quantity, delta + data['delta']
+
+
+@transaction.atomic
+def upsert_ingredients(
+    rows, kind=StockMovement.ADJUSTMENT, location_id=DEFAULT_LOCATION_ID
+):
+    """
+    Validate and apply a batch of stock updates to a location's
+    ingredients, keyed by ingredient id or name, returning
+    ``(errors, ingredients)``.
+
+    Every row sets an absolute ``available_quantity`` or adds a relative
+    ``delta``; rows for the same ingredient are applied in order. Ids and
+    names are resolved with a single query, ingredients named for the
+    first time (with a quantity, ``measurement_unit`` and
+    ``price_per_unit``) are created with ``bulk_create`` and the rest are
+    updated by ``adjust_stock``. If ``errors`` is not empty nothing was
+    written; ``InsufficientStockError`` is raised (and nothing written) if
+    a delta would take an ingredient below zero. The changes are recorded
+    in the stock ledger as movements of ``kind``.
+    """
+    errors = []
+    valid = []
+    # One serializer validates every row, so its fields are built only once
+    serializer = BulkIngredientStockSerializer()
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, serializer.run_validation(row)))
+        except ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+
+    names = {}
+    by_name = {}
+    for pk, name in Ingredient.objects.filter(
+        Q(pk__in={data['id'] for _, data in valid if 'id' in data})
+        | Q(name__in={data['name'] for _, data in valid if 'name' in data}),
+        location_id=location_id,
+    ).values_list('pk', 'name'):
+        names[pk] = name
+        by_name[name] = pk
+
+    adjustments = {}
+    new = {}
+    for index, data in valid:
+        pk = data['id'] if 'id' in data else by_name.get(data['name'])
+        if pk in names:
+            adjustments[pk] = _merge(adjustments.get(pk, (None, 0.0)), data)
+        elif data.get('name') in new:
+            new[data['name']][2] = _merge(new[data['name']][2], data)
+        elif (
+            'name' in data
+            and {
+                'available_quantity',
+                'measurement_unit',
+                'price_per_unit',
+            }
+            <= data.keys()
+        ):
+            new[data['name']] = [index, data, _merge((None, 0.0), data)]
+        else:
+            errors.append(
+                {
+                    'index': index,
+                    'errors': {'detail': ['Ingredient not found.']},
+                }
+            )
+
+    for index, _, (quantity, delta) in new.values():
+        if quantity + delta < 0:
+            errors.append(
+                {
+                    'index': index,
+                    'errors': {'delta': ['Insufficient stock.']},
+                }
+            )
+    if errors:
+        return sorted(errors, key=lambda error: error['index']), []
+
+    levels = adjust_stock(adjustments, kind, location_id)
+    created = Ingredient.objects.bulk_create(
+        Ingredient(
+            location_id=location_id,
+            name=name,
+            available_quantity=quantity + delta,
+            measurement_unit=data['measurement_unit'],
+            price_per_unit=data['price_per_unit'],
+            expiry_date=data.get('expiry_date'),
+        )
+        for name, (_, data, (quantity, delta)) in new.items()
+    )
+    # bulk_create sends no signals
+    record_movements(
+        {
+            ingredient.pk: ingredient.available_quantity
+            for ingredient in created
+        },
+        kind,
+    )
+    ingredients = [
+        {
+            'id': pk,
+            'name': names[pk],
+            'available_quantity': levels[pk],
+            'created': False,
+        }
+        for pk in adjustments
+    ] + [
+        {
+            'id': ingredient.pk,
+            'name': ingredient.name,
+            'available_quantity': ingredient.available_quantity,
+            'created': True,
+        }
+        for ingredient in created
+    ]
+    return [], ingredients
@@ -0,0 +1,138 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db.models import ExpressionWrapper, F, FloatField, Sum
+
+from .models import DEFAULT_LOCATION_ID, MenuItem
+from .versions import bump_version, get_version, repeat_on_commit
+
+COSTING_CACHE_KEY = 'inventory:menu-costing:{location_id}'
+# Incremented by every mark; each mark stores its menu item ids under its
+# own number, so concurrent marks never overwrite each other
+COSTING_MARKS_KEY = 'inventory:menu-costing-marks:{location_id}'
+COSTING_MARK_KEY = 'inventory:menu-costing-mark:{location_id}:{number}'
+COSTING_CACHE_TIMEOUT = 60 * 60 * 24
+# A costing more marks behind is recomputed in full
+MAX_PENDING_MARKS = 1000
+CENT = Decimal('0.01')
+
+
+def compute_costs(location_id=DEFAULT_LOCATION_ID, menu_item_ids=None):
+    """
+    Return ``{menu_item_id: costing}`` with the ingredient cost (sum of
+    recipe quantity x ingredient price per unit) and the margin against the
+    menu price, computed for all (or the given) menu items of a location in
+    one aggregate query
+    """
+    menu_items = MenuItem.objects.filter(location_id=location_id)
+    if menu_item_ids is not None:
+        menu_items = menu_items.filter(pk__in=menu_item_ids)
+    menu_items = menu_items.annotate(
+        cost=Sum(
+            ExpressionWrapper(
+                F('reciperequirement__quantity')
+                * F('reciperequirement__ingredient__price_per_unit'),
+                output_field=FloatField(),
+            )
+        )
+    ).values_list('id', 'item_name', 'price', 'cost')
+
+    costs = {}
+    for menu_item_id, name, price, cost in menu_items:
+        cost = Decimal(cost or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+        margin = price - cost
+        costs[menu_item_id] = {
+            'id': menu_item_id,
+            'name': name,
+            'price': price,
+            'cost': cost,
+            'margin': margin,
+            'margin_percent': (
+                float(round(margin / price * 100, 2)) if price else None
+            ),
+        }
+    return costs
+
+
+def _marks_key(location_id):
+    return COSTING_MARKS_KEY.format(location_id=location_id)
+
+
+def _mark_key(location_id, number):
+    return COSTING_MARK_KEY.format(location_id=location_id, number=number)
+
+
+def _pending(location_id, costing, marks):
+    # The menu item ids marked since ``costing`` was stored, or None when
+    # some mark is unknown (evicted, or not recorded)
+    behind = marks - costing['marks']
+    if not 0 < behind <= MAX_PENDING_MARKS:
+        return None
+    keys = [
+        _mark_key(location_id, number)
+        for number in range(costing['marks'] + 1, marks + 1)
+    ]
+    pending = cache.get_many(keys)
+    if len(pending) != len(keys):
+        return None
+    return set().union(*pending.values())
+
+
+def get_menu_costing(location_id=DEFAULT_LOCATION_ID):
+    """
+    Return the costing of every menu item of a location ordered by id.
+
+    The costing is materialised in the cache per location, together with
+    the number of the last mark it includes; after changes only the menu
+    items of the later marks (see ``mark_costs_dirty``) are recomputed.
+    """
+    key = COSTING_CACHE_KEY.format(location_id=location_id)
+    # Read before the costs: marks made from here on stay pending
+    marks = get_version(_marks_key(location_id))
+    costing = cache.get(key)
+    if costing is not None and costing['marks'] == marks:
+        return sorted(costing['costs'].values(), key=_by_id)
+
+    dirty = None if costing is None else _pending(location_id, costing, marks)
+    if dirty is None:
+        costs = compute_costs(location_id)
+    else:
+        costs = costing['costs']
+        fresh = compute_costs(location_id, dirty)
+        for menu_item_id in dirty:
+            # deleted menu items are dropped
+            costs.pop(menu_item_id, None)
+        costs.update(fresh)
+
+    cache.set(
+        key, {'costs': costs, 'marks': marks}, timeout=COSTING_CACHE_TIMEOUT
+    )
+    return sorted(costs.values(), key=_by_id)
+
+
+def _by_id(costing):
+    return costing['id']
+
+
+def _mark(location_id, menu_item_ids):
+    number = bump_version(_marks_key(location_id))
+    if cache.get(COSTING_CACHE_KEY.format(location_id=location_id)) is None:
+        # nothing materialised yet; an unrecorded mark makes the next read
+        # compute everything
+        return
+    cache.set(
+        _mark_key(location_id, number),
+        set(menu_item_ids),
+        timeout=COSTING_CACHE_TIMEOUT,
+    )
+
+
+def mark_costs_dirty(location_id, menu_item_ids):
+    """
+    Mark the costing of ``menu_item_ids`` (menu items of a location) for
+    recomputation on the next read. The ids may be a lazy queryset; it is
+    only evaluated while a costing is materialised.
+
+    Like a version bump, the mark is made now and again on commit.
+    """
+    repeat_on_commit(_mark, location_id, menu_item_ids)
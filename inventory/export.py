@@ -0,0 +1,73 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Columns written for every exported purchase
+EXPORT_FIELDS = [
+    'id',
+    'menu_item',
+    'purchase_date',
+    'customer_name',
+    'quantity',
+    'total_price',
+]
+
+# Rows fetched from the database cursor per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    # File-like object handing written CSV lines straight back to the caller
+    def write(self, value):
+        return value
+
+
+def _rows(purchases, chunk_size):
+    # Plain tuples streamed from the database cursor, never cached by the
+    # queryset, so memory stays flat however many rows are exported
+    return (
+        purchases.order_by()
+        .values_list(
+            'id',
+            'menu_item_id',
+            'purchase_date',
+            'customer_name',
+            'quantity',
+            'total_price',
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _chunked(lines, chunk_size):
+    # Join lines into larger blocks so the response is not written row by row
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) == chunk_size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def ndjson_stream(purchases, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield ``purchases`` as newline-delimited JSON
+    """
+    encoder = DjangoJSONEncoder()
+    lines = (
+        encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n'
+        for row in _rows(purchases, chunk_size)
+    )
+    return _chunked(lines, chunk_size)
+
+
+def csv_stream(purchases, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield ``purchases`` as CSV, starting with a header row
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    lines = (writer.writerow(row) for row in _rows(purchases, chunk_size))
+    yield from _chunked(lines, chunk_size)
@@ -0,0 +1,45 @@
+from rest_framework.filters import SearchFilter
+
+from .search import SEARCH_FIELDS, SEARCH_ORDERING, search
+
+
+def filter_purchases(purchases, query_params, rank=False):
+    """
+    Apply the purchase listing filters (``menu_item_id``, ``customer_name``
+    and the ``date_from``/``date_to`` range) from ``query_params``. With
+    ``rank``, customer name matches are annotated to be ordered by
+    ``SEARCH_ORDERING``.
+    """
+    # Filter by menu_item_id if provided
+    menu_item_id = query_params.get('menu_item_id')
+    if menu_item_id:
+        purchases = purchases.filter(menu_item_id=menu_item_id)
+
+    # Filter by customer_name if provided, through the search index
+    customer_name = query_params.get('customer_name')
+    if customer_name:
+        purchases = search(purchases, [customer_name], rank=rank)
+
+    # Filter by date range if both date_from and date_to are provided
+    date_from = query_params.get('date_from', None)
+    date_to = query_params.get('date_to', None)
+    if date_from and date_to:
+        purchases = purchases.filter(purchase_date__range=[date_from, date_to])
+
+    return purchases
+
+
+class TrigramSearchFilter(SearchFilter):
+    """
+    ``SearchFilter`` served by the search index for indexed models: every
+    term must appear in the searched name, best matches first. Ordering
+    parameters, applied afterwards, take precedence over the rank.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if queryset.model not in SEARCH_FIELDS:
+            return super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search(queryset, terms, rank=True).order_by(*SEARCH_ORDERING)
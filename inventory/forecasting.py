@@ -0,0 +1,174 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db import connections
+from django.utils import timezone
+
+from .models import (
+    DEFAULT_LOCATION_ID,
+    DailySales,
+    Ingredient,
+    RecipeRequirement,
+)
+
+FORECAST_METHODS = ('moving_average', 'exponential')
+DEFAULT_HORIZON = 7
+DEFAULT_HISTORY = 730
+DEFAULT_WINDOW = 28
+DEFAULT_ALPHA = 0.3
+# Recipe rows exploded into daily consumption at a time
+EXPLODE_CHUNK_SIZE = 2000
+
+
+def fetch_columns(queryset, dtypes):
+    """
+    Read ``queryset`` (a ``values_list``) with a plain cursor, skipping the
+    ORM's per-row value conversion, and return one array per column.
+    The query runs on the database the router picks for ``queryset``.
+    """
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    columns = zip(*rows) if rows else [()] * len(dtypes)
+    return [
+        np.array(column, dtype=dtype) for column, dtype in zip(columns, dtypes)
+    ]
+
+
+def consumption_matrix(start, end, location_id=DEFAULT_LOCATION_ID):
+    """
+    Return ``(ingredient_ids, names, matrix)``: the daily consumption of
+    every ingredient of a location from ``start`` to ``end`` (inclusive), as
+    an ``(ingredients, days)`` array.
+
+    Consumption is the daily sales rollup exploded through the recipes
+    (``servings sold x recipe quantity``). Rather than aggregating one SQL
+    row per ingredient and day, the much narrower sales series (menu items
+    x days) and the recipes are read once each and exploded with array
+    arithmetic, recipe rows grouped by ingredient.
+    """
+    ingredients = list(
+        Ingredient.objects.filter(location_id=location_id)
+        .order_by('pk')
+        .values_list('pk', 'name')
+    )
+    ingredient_ids = np.array([pk for pk, _ in ingredients], dtype=np.int64)
+    names = [name for _, name in ingredients]
+    matrix = np.zeros((len(ingredient_ids), (end - start).days + 1))
+
+    sold_items, days, sold = fetch_columns(
+        DailySales.objects.filter(
+            menu_item__location_id=location_id,
+            date__gte=start,
+            date__lte=end,
+        )
+        .values_list('menu_item_id', 'date', 'quantity')
+        .order_by(),
+        [np.int64, 'datetime64[D]', float],
+    )
+    menu_item_ids = np.unique(sold_items)
+    sales = np.zeros((len(menu_item_ids), matrix.shape[1]))
+    sales[
+        np.searchsorted(menu_item_ids, sold_items),
+        (days - np.datetime64(start, 'D')).astype(np.int64),
+    ] = sold
+
+    recipe_items, recipe_ingredients, quantities = fetch_columns(
+        RecipeRequirement.objects.filter(
+            menu_item_id__in=menu_item_ids.tolist(), quantity__gt=0
+        )
+        .values_list('menu_item_id', 'ingredient_id', 'quantity')
+        .order_by('ingredient_id'),
+        [np.int64, np.int64, float],
+    )
+    # Ingredients created after the first query are left out
+    known = np.isin(recipe_ingredients, ingredient_ids)
+    recipe_items = np.searchsorted(menu_item_ids, recipe_items[known])
+    recipe_ingredients = np.searchsorted(
+        ingredient_ids, recipe_ingredients[known]
+    )
+    quantities = quantities[known]
+
+    # Chunks bound the (recipe rows x days) intermediate array
+    for chunk in range(0, len(quantities), EXPLODE_CHUNK_SIZE):
+        rows = slice(chunk, chunk + EXPLODE_CHUNK_SIZE)
+        rows_ingredients = recipe_ingredients[rows]
+        consumed = quantities[rows, None] * sales[recipe_items[rows]]
+        # Rows are sorted by ingredient: sum each ingredient's run of rows
+        firsts = np.flatnonzero(
+            np.r_[True, rows_ingredients[1:] != rows_ingredients[:-1]]
+        )
+        matrix[rows_ingredients[firsts]] += np.add.reduceat(
+            consumed, firsts, axis=0
+        )
+    return ingredient_ids, names, matrix
+
+
+def moving_average(matrix, window):
+    """
+    Mean daily consumption of every row over its last ``window`` days
+    """
+    return matrix[:, -window:].mean(axis=1)
+
+
+def exponential_smoothing(matrix, alpha):
+    """
+    Simple exponential smoothing level of every row at its last day.
+
+    The recursion ``level = alpha * x + (1 - alpha) * level`` started at the
+    first day unrolls into fixed weights per day, so all rows are smoothed
+    with one matrix-vector product.
+    """
+    days = matrix.shape[1]
+    if not days:
+        return np.zeros(matrix.shape[0])
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return matrix @ weights
+
+
+def forecast_consumption(
+    horizon=DEFAULT_HORIZON,
+    history=DEFAULT_HISTORY,
+    window=DEFAULT_WINDOW,
+    alpha=DEFAULT_ALPHA,
+    method='exponential',
+    today=None,
+    location_id=DEFAULT_LOCATION_ID,
+):
+    """
+    Forecast the consumption of every ingredient of a location over the
+    next ``horizon`` days from the last ``history`` days (ending ``today``).
+
+    Returns ``(ingredient_ids, names, daily, forecast)``, where ``daily`` is
+    the expected daily consumption per ``method`` and ``forecast`` is
+    ``daily * horizon``.
+    """
+    end = today or timezone.localdate()
+    start = end - timedelta(days=history - 1)
+    ingredient_ids, names, matrix = consumption_matrix(start, end, location_id)
+    if method == 'moving_average':
+        daily = moving_average(matrix, window)
+    else:
+        daily = exponential_smoothing(matrix, alpha)
+    return ingredient_ids, names, daily, daily * horizon
+
+
+def consumption_forecast(**kwargs):
+    """
+    Return the forecast of ``forecast_consumption`` as one dict per
+    ingredient
+    """
+    ingredient_ids, names, daily, forecast = forecast_consumption(**kwargs)
+    return [
+        {
+            'ingredient': ingredient_id,
+            'name': name,
+            'daily_consumption': round(rate, 4),
+            'forecast': round(total, 4),
+        }
+        for ingredient_id, name, rate, total in zip(
+            ingredient_ids.tolist(), names, daily.tolist(), forecast.tolist()
+        )
+    ]
@@ -0,0 +1,131 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import (
+    DateTimeField,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from .models import Ingredient, StockMovement, StockSnapshot
+
+# Movements are summed from here for ingredients without a snapshot
+LEDGER_START = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Differences below this are float noise, not drift
+DRIFT_TOLERANCE = 1e-6
+
+
+def record_movements(changes, kind, created_at=None):
+    """
+    Append a ``StockMovement`` of ``kind`` for every non-zero change in
+    ``changes`` (``{ingredient_id: signed quantity}``) with one INSERT
+    """
+    created_at = created_at or timezone.now()
+    return StockMovement.objects.bulk_create(
+        (
+            StockMovement(
+                ingredient_id=ingredient_id,
+                kind=kind,
+                quantity=quantity,
+                created_at=created_at,
+            )
+            for ingredient_id, quantity in changes.items()
+            if quantity
+        ),
+        batch_size=1000,
+    )
+
+
+def stock_at(moment=None):
+    """
+    Return the ingredients annotated with ``quantity_at``, their stock at
+    ``moment`` (default: now) reconstructed from the ledger.
+
+    The stock is the latest snapshot taken at or before ``moment`` plus the
+    movements recorded after it, read with correlated subqueries that are
+    range scans of the ``(ingredient, taken_at)`` and ``(ingredient,
+    created_at, quantity)`` indexes, so the cost per ingredient depends on
+    the movements since its last snapshot, not on its whole history.
+    """
+    moment = moment or timezone.now()
+    snapshots = StockSnapshot.objects.filter(
+        ingredient=OuterRef('pk'), taken_at__lte=moment
+    ).order_by('-taken_at')
+    movements = (
+        StockMovement.objects.filter(
+            ingredient=OuterRef('pk'),
+            created_at__gt=Coalesce(
+                OuterRef('snapshot_at'),
+                Value(LEDGER_START),
+                output_field=DateTimeField(),
+            ),
+            created_at__lte=moment,
+        )
+        .order_by()
+        .values('ingredient')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return Ingredient.objects.annotate(
+        snapshot_at=Subquery(snapshots.values('taken_at')[:1]),
+        quantity_at=Coalesce(
+            Subquery(snapshots.values('quantity')[:1]),
+            Value(0.0),
+            output_field=FloatField(),
+        )
+        + Coalesce(
+            Subquery(movements, output_field=FloatField()),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+@transaction.atomic
+def take_snapshots(taken_at=None):
+    """
+    Store the ledger stock of every ingredient at ``taken_at`` (default:
+    now) as a snapshot, so later stock queries only sum the movements made
+    after it. Returns the number of snapshots written.
+
+    The levels are copied with a single ``INSERT ... SELECT ... ON CONFLICT
+    DO NOTHING``, so ingredients that already have a snapshot at
+    ``taken_at`` are skipped and not counted.
+    """
+    taken_at = taken_at or timezone.now()
+    levels, params = (
+        stock_at(taken_at).values('pk', 'quantity_at').query.sql_with_params()
+    )
+    qn = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {qn(StockSnapshot._meta.db_table)} '
+        f'({qn("ingredient_id")}, {qn("taken_at")}, {qn("quantity")}) '
+        f'SELECT {qn("id")}, %s, {qn("quantity_at")} FROM ({levels}) '
+        # The WHERE clause keeps SQLite from parsing ON CONFLICT as a join
+        'AS levels WHERE true ON CONFLICT DO NOTHING'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            [connection.ops.adapt_datetimefield_value(taken_at), *params],
+        )
+        return cursor.rowcount
+
+
+def ledger_drift():
+    """
+    Return the ingredients whose stored ``available_quantity`` differs from
+    their ledger stock, e.g. after changes made with ``update()`` outside
+    the stock functions
+    """
+    return (
+        stock_at()
+        .annotate(drift=Abs(F('available_quantity') - F('quantity_at')))
+        .filter(drift__gt=DRIFT_TOLERANCE)
+    )
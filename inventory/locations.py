@@ -0,0 +1,135 @@
+"""
+Per-request location of the inventory views.
+
+Every ingredient, menu item, recipe and purchase belongs to a ``Location``;
+the views only read and write the rows of the location resolved for the
+request by ``LocationScopedMixin``: the one named by the ``X-Location``
+header, else the user's first location. Users of no location are refused,
+except superusers and, while the default location is the only one, every
+user, so single-site deployments work without setting up locations.
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import ParseError, PermissionDenied
+
+from .models import DEFAULT_LOCATION_ID, Location
+from .versions import bump_versions_on_commit, get_version
+
+LOCATION_HEADER = 'X-Location'
+
+MEMBERSHIP_VERSION_KEY = 'inventory:user-locations-version:{user_id}'
+MEMBERSHIP_CACHE_KEY = 'inventory:user-locations:{user_id}:{version}'
+# Membership changes move a user's memberships to a new version in the
+# shared cache every process reads (sl_backend.E001), so revocations apply
+# right away; the timeout only clears out entries of old versions
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+SITES_VERSION_KEY = 'inventory:locations-version'
+SINGLE_SITE_CACHE_KEY = 'inventory:single-site:{version}'
+
+
+def _version_key(user_id):
+    return MEMBERSHIP_VERSION_KEY.format(user_id=user_id)
+
+
+def user_location_ids(user):
+    """
+    Return the ids of the locations ``user`` is a member of, lowest first,
+    read from the cache so a warm request runs no membership query
+    """
+    key = MEMBERSHIP_CACHE_KEY.format(
+        user_id=user.pk, version=get_version(_version_key(user.pk))
+    )
+    location_ids = cache.get(key)
+    if location_ids is None:
+        # Never from a lagging replica: the result outlives the request
+        location_ids = list(
+            Location.members.through.objects.using(DEFAULT_DB_ALIAS)
+            .filter(user=user)
+            .order_by('location_id')
+            .values_list('location_id', flat=True)
+        )
+        cache.set(key, location_ids, timeout=MEMBERSHIP_CACHE_TIMEOUT)
+    return location_ids
+
+
+def forget_memberships(user_ids):
+    """
+    Move the cached memberships of ``user_ids`` to a new version
+    """
+    bump_versions_on_commit(_version_key(user_id) for user_id in user_ids)
+
+
+def is_single_site():
+    """
+    Return whether the default location is the only location, read from
+    the cache
+    """
+    key = SINGLE_SITE_CACHE_KEY.format(version=get_version(SITES_VERSION_KEY))
+    single_site = cache.get(key)
+    if single_site is None:
+        single_site = not (
+            Location.objects.using(DEFAULT_DB_ALIAS)
+            .exclude(pk=DEFAULT_LOCATION_ID)
+            .exists()
+        )
+        cache.set(key, single_site, timeout=MEMBERSHIP_CACHE_TIMEOUT)
+    return single_site
+
+
+def forget_locations():
+    """
+    Move the cached ``is_single_site`` to a new version
+    """
+    bump_versions_on_commit([SITES_VERSION_KEY])
+
+
+def resolve_location(request):
+    """
+    Return the id of the location ``request`` works on.
+
+    A location named in the ``X-Location`` header must be one of the
+    user's, or any existing one for superusers; anonymous requests (the
+    public menu) may name any location. Users of no location work on the
+    default location only while it is the only one.
+    """
+    requested = request.headers.get(LOCATION_HEADER)
+    if requested is not None:
+        try:
+            requested = int(requested)
+        except ValueError:
+            raise ParseError(f'Invalid {LOCATION_HEADER} header.')
+
+    user = request.user
+    if not user.is_authenticated:
+        return DEFAULT_LOCATION_ID if requested is None else requested
+
+    location_ids = user_location_ids(user)
+    if requested is None:
+        if location_ids:
+            return location_ids[0]
+        if user.is_superuser:
+            return DEFAULT_LOCATION_ID
+        requested = DEFAULT_LOCATION_ID
+    if requested in location_ids:
+        return requested
+    if user.is_superuser:
+        if Location.objects.filter(pk=requested).exists():
+            return requested
+    elif (
+        not location_ids
+        and requested == DEFAULT_LOCATION_ID
+        and is_single_site()
+    ):
+        return requested
+    raise PermissionDenied('You do not have access to this location.')
+
+
+class LocationScopedMixin:
+    """
+    Sets ``request.location_id`` once the request is authenticated
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        request.location_id = resolve_location(request)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.archive import (
+    ARCHIVE_BATCH_SIZE,
+    archive_cutoff,
+    archive_purchases,
+)
+
+# Full months of purchases kept in the live table by default
+DEFAULT_RETENTION_MONTHS = 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the purchases older than the retention window into the '
+        'archive table; run monthly to roll the window forward'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=DEFAULT_RETENTION_MONTHS,
+            help='Full months kept live before the current one',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help='Purchases moved per transaction',
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 0:
+            raise CommandError('--months must not be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        before = archive_cutoff(options['months'])
+        moved = archive_purchases(before, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Archived {moved} purchases made before '
+                f'{before.date().isoformat()}.'
+            )
+        )
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from inventory.benchmarks import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_REQUESTS,
+    DEFAULT_SCALE,
+    DEFAULT_WORKERS,
+    BenchmarkError,
+    run_concurrency_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the concurrent-request throughput of the listing routes '
+        'served by WSGI (sync views on a pool of worker threads) and by ASGI '
+        '(async views on one event loop) against a seeded test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=DEFAULT_SCALE,
+            help='Fraction of the full volumes (10k ingredients, 2k menu '
+            'items, 20k recipe rows, 1M purchases) to seed',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=DEFAULT_REQUESTS,
+            help='Timed requests per route and deployment',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help='Requests in flight at once',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='WSGI worker threads',
+        )
+
+    def handle(self, *args, **options):
+        for option in ('requests', 'concurrency', 'workers'):
+            if options[option] < 1:
+                raise CommandError(f'--{option} must be at least 1.')
+
+        # Never seed into the configured database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            routes = run_concurrency_benchmarks(
+                scale=options['scale'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                workers=options['workers'],
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f'{options["concurrency"]} requests in flight, '
+            f'{options["workers"]} WSGI worker threads'
+        )
+        self.stdout.write(
+            f'{"route":<20}{"server":<8}{"req/s":>10}'
+            f'{"p50 ms":>10}{"p95 ms":>10}'
+        )
+        for name, modes in routes.items():
+            for mode, result in modes.items():
+                self.stdout.write(
+                    f'{name:<20}{mode:<8}{result["requests_per_s"]:>10.1f}'
+                    f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                )
@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from inventory.benchmarks import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_REQUESTS,
+    DEFAULT_SCALE,
+    DEFAULT_WORKERS,
+    BenchmarkError,
+    run_connection_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of WSGI requests that open a database '
+        'connection each against persistent connections (with the '
+        'production SQLite pragmas) on a seeded test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=DEFAULT_SCALE,
+            help='Fraction of the full volumes (10k ingredients, 2k menu '
+            'items, 20k recipe rows, 1M purchases) to seed',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=DEFAULT_REQUESTS,
+            help='Timed requests per route and profile',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=DEFAULT_CONCURRENCY,
+            help='Requests in flight at once',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='WSGI worker threads',
+        )
+
+    def handle(self, *args, **options):
+        for option in ('requests', 'concurrency', 'workers'):
+            if options[option] < 1:
+                raise CommandError(f'--{option} must be at least 1.')
+
+        # Never seed into the configured database. An in-memory SQLite
+        # test database is never closed, so it would hide the connection
+        # setup being measured: use a file instead.
+        setup_test_environment()
+        directory = None
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings.get('NAME')
+        if connection.vendor == 'sqlite':
+            directory = tempfile.mkdtemp()
+            test_settings['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            routes = run_connection_benchmarks(
+                scale=options['scale'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                workers=options['workers'],
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f'{options["requests"]} requests per route, '
+            f'{options["concurrency"]} in flight, '
+            f'{options["workers"]} WSGI worker threads'
+        )
+        self.stdout.write(
+            f'{"route":<20}{"connections":<13}{"req/s":>10}'
+            f'{"p50 ms":>10}{"p95 ms":>10}{"opened":>8}'
+        )
+        for name, profiles in routes.items():
+            for profile, result in profiles.items():
+                self.stdout.write(
+                    f'{name:<20}{profile:<13}'
+                    f'{result["requests_per_s"]:>10.1f}'
+                    f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                    f'{result["connections"]:>8}'
+                )
@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from inventory.benchmarks import (
+    DEFAULT_ITERATIONS,
+    DEFAULT_SCALE,
+    BenchmarkError,
+    find_regressions,
+    run_benchmarks,
+)
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark query counts and latency of every inventory and user '
+        'management route against a seeded test database, failing on '
+        'regressions past the stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=DEFAULT_SCALE,
+            help='Fraction of the full volumes (10k ingredients, 2k menu '
+            'items, 20k recipe rows, 1M purchases) to seed',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=DEFAULT_ITERATIONS,
+            help='Timed requests per route',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=DEFAULT_BASELINE,
+            type=Path,
+            help='Baseline file to compare with',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=2.0,
+            help='Allowed p95 latency factor over the baseline',
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Store the results as the new baseline',
+        )
+
+    def handle(self, *args, **options):
+        # Never seed into the configured database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            routes = run_benchmarks(
+                scale=options['scale'], iterations=options['iterations']
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results = {'scale': options['scale'], 'routes': routes}
+        self.stdout.write(
+            f'{"route":<28}{"queries":>8}{"p50 ms":>10}{"p95 ms":>10}'
+        )
+        for name, result in routes.items():
+            self.stdout.write(
+                f'{name:<28}{result["queries"]:>8}'
+                f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+            )
+
+        baseline_path = options['baseline']
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(
+                self.style.SUCCESS(f'Baseline written to {baseline_path}.')
+            )
+            return
+
+        if not baseline_path.exists():
+            raise CommandError(
+                f'No baseline at {baseline_path}; run with '
+                '--update-baseline to create it.'
+            )
+        regressions = find_regressions(
+            results,
+            json.loads(baseline_path.read_text()),
+            options['tolerance'],
+        )
+        if regressions:
+            raise CommandError(
+                'Regressions past the baseline:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,80 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.forecasting import (
+    DEFAULT_ALPHA,
+    DEFAULT_HISTORY,
+    DEFAULT_HORIZON,
+    DEFAULT_WINDOW,
+    FORECAST_METHODS,
+    consumption_forecast,
+)
+from inventory.models import DEFAULT_LOCATION_ID, Location
+
+
+class Command(BaseCommand):
+    help = (
+        'Forecast the consumption of every ingredient from the daily sales '
+        'history and write it as CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=DEFAULT_HORIZON,
+            help='Days to forecast.',
+        )
+        parser.add_argument(
+            '--history',
+            type=int,
+            default=DEFAULT_HISTORY,
+            help='Days of history to forecast from.',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=DEFAULT_WINDOW,
+            help='Moving average window in days.',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=DEFAULT_ALPHA,
+            help='Exponential smoothing factor.',
+        )
+        parser.add_argument(
+            '--method', choices=FORECAST_METHODS, default='exponential'
+        )
+        parser.add_argument(
+            '--location',
+            type=int,
+            default=DEFAULT_LOCATION_ID,
+            help='Id of the location to forecast.',
+        )
+
+    def handle(self, *args, **options):
+        if not Location.objects.filter(pk=options['location']).exists():
+            raise CommandError(f'Location {options["location"]} not found.')
+
+        started = time.perf_counter()
+        forecast = consumption_forecast(
+            location_id=options['location'],
+            horizon=options['horizon'],
+            history=options['history'],
+            window=options['window'],
+            alpha=options['alpha'],
+            method=options['method'],
+        )
+        writer = csv.DictWriter(
+            self.stdout,
+            fieldnames=['ingredient', 'name', 'daily_consumption', 'forecast'],
+        )
+        writer.writeheader()
+        writer.writerows(forecast)
+        self.stderr.write(
+            f'Forecast {len(forecast)} ingredients in '
+            f'{time.perf_counter() - started:.2f}s.'
+        )
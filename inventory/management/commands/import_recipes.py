@@ -0,0 +1,64 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.availability import AVAILABILITY_CACHE_TIMEOUT
+from inventory.bulk import upsert_recipe_requirements
+from inventory.costing import COSTING_CACHE_TIMEOUT
+from inventory.models import DEFAULT_LOCATION_ID, Location
+from sl_backend.caches import cache_is_shared
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert or update recipe requirements from a CSV (menu_item, '
+        'ingredient, quantity columns) or JSON (list of objects) file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--location',
+            type=int,
+            default=DEFAULT_LOCATION_ID,
+            help='Id of the location to import the recipes of.',
+        )
+
+    def handle(self, *args, **options):
+        if not Location.objects.filter(pk=options['location']).exists():
+            raise CommandError(f'Location {options["location"]} not found.')
+
+        path = options['path']
+        try:
+            with path.open(newline='') as f:
+                if path.suffix.lower() == '.json':
+                    rows = json.load(f)
+                else:
+                    rows = list(csv.DictReader(f))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        if not isinstance(rows, list):
+            raise CommandError('Expected a list of recipe requirements.')
+
+        errors = upsert_recipe_requirements(rows, options['location'])
+        if errors:
+            for error in errors:
+                self.stderr.write(f'Row {error["index"]}: {error["errors"]}')
+            raise CommandError(
+                f'{len(errors)} invalid rows; nothing was imported.'
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Imported {len(rows)} recipe requirements.')
+        )
+        if not cache_is_shared():
+            # The import only invalidated this process's cache
+            timeout = max(AVAILABILITY_CACHE_TIMEOUT, COSTING_CACHE_TIMEOUT)
+            self.stderr.write(
+                self.style.WARNING(
+                    'The cache is local to this process: running servers '
+                    'may show the previous menu availability and costing '
+                    f'for up to {timeout // 3600} hours.'
+                )
+            )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.forecasting import FORECAST_METHODS
+from inventory.models import DEFAULT_LOCATION_ID, Location
+from inventory.planning import DEFAULT_COVERAGE_DAYS, create_draft_order
+
+
+class Command(BaseCommand):
+    help = (
+        'Draft a purchase order covering the forecast consumption of every '
+        'ingredient until the next delivery'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--coverage-days',
+            type=int,
+            default=DEFAULT_COVERAGE_DAYS,
+            help='Days until the next delivery the order has to cover.',
+        )
+        parser.add_argument(
+            '--method', choices=FORECAST_METHODS, default='exponential'
+        )
+        parser.add_argument(
+            '--location',
+            type=int,
+            default=DEFAULT_LOCATION_ID,
+            help='Id of the location to order for.',
+        )
+
+    def handle(self, *args, **options):
+        if not Location.objects.filter(pk=options['location']).exists():
+            raise CommandError(f'Location {options["location"]} not found.')
+
+        order = create_draft_order(
+            options['coverage_days'],
+            options['location'],
+            method=options['method'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Drafted purchase order {order.pk}: '
+                f'{order.lines.count()} lines, total {order.total_cost}.'
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inventory.sales import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily sales rollup from the purchases and archived '
+        'purchases'
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_sales()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt daily sales: {rows} rows written.')
+        )
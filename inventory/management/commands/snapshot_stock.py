@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import ledger_drift, take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Snapshot the ledger stock of every ingredient, so stock queries '
+        'only sum the movements made after it'
+    )
+
+    def handle(self, *args, **options):
+        snapshots = take_snapshots()
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored {snapshots} stock snapshots.')
+        )
+        drift = ledger_drift().count()
+        if drift:
+            self.stderr.write(
+                self.style.WARNING(
+                    f'{drift} ingredients differ from their ledger stock.'
+                )
+            )
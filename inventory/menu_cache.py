@@ -0,0 +1,122 @@
+import hashlib
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Location
+
+# Cached menu responses are keyed by version, so stale ones are never read
+# again; the timeout only bounds how long they occupy the cache
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_menu_version(location_id):
+    """
+    Return the current menu version of a location, read from the database
+    so a change made by any process is seen once it commits
+    """
+    # Never from a lagging replica: the version keys cached responses
+    version = (
+        Location.objects.using(DEFAULT_DB_ALIAS)
+        .filter(pk=location_id)
+        .values_list('menu_version', flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_menu_version(location_id):
+    """
+    Move the menu of a location to a new version, invalidating its cached
+    menu responses; other locations keep theirs.
+
+    The version is bumped in the surrounding transaction, so requests read
+    the new version exactly when they can read the change; a response
+    built from the old menu is cached under the old version.
+    """
+    Location.objects.filter(pk=location_id).update(
+        menu_version=F('menu_version') + 1
+    )
+
+
+def _cache_key(request, view_name):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    variant = '|'.join(
+        [
+            view_name,
+            request.get_host(),
+            request.accepted_renderer.format,
+            query,
+        ]
+    )
+    digest = hashlib.sha1(variant.encode()).hexdigest()
+    location_id = request.location_id
+    return (
+        f'inventory:menu:{location_id}:{get_menu_version(location_id)}:'
+        f'{digest}'
+    )
+
+
+def _lookup(request, view_name):
+    key = _cache_key(request, view_name)
+    return key, cache.get(key)
+
+
+def _store(key, response):
+    body = DjangoJSONEncoder(sort_keys=True).encode(response.data)
+    etag = '"%s"' % hashlib.sha1(f'{key}:{body}'.encode()).hexdigest()
+    cached = (etag, response.data)
+    cache.set(key, cached, timeout=MENU_CACHE_TIMEOUT)
+    return cached
+
+
+def _cached_response(request, cached):
+    etag, data = cached
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # If-None-Match uses the weak comparison
+        etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+        if '*' in etags or etag in etags:
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+            )
+    return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+def cached_menu_response(request, view_name, build_response):
+    """
+    Return the menu response for ``request`` from the versioned menu cache,
+    calling ``build_response`` only on a miss.
+
+    Successful responses carry a strong ``ETag``; a request whose
+    ``If-None-Match`` matches it gets an empty 304 after reading only the
+    menu version.
+    """
+    key, cached = _lookup(request, view_name)
+    if cached is None:
+        response = build_response()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cached = _store(key, response)
+    return _cached_response(request, cached)
+
+
+async def acached_menu_response(request, view_name, build_response):
+    """
+    ``cached_menu_response`` for async views: ``build_response`` is a
+    coroutine function and the cache is read in a worker thread.
+    """
+    key, cached = await sync_to_async(_lookup)(request, view_name)
+    if cached is None:
+        response = await build_response()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cached = await sync_to_async(_store)(key, response)
+    return _cached_response(request, cached)
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.4 on 2026-10-17 23:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_purchase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('date', models.DateField(verbose_name='Date')),
+                (
+                    'quantity',
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name='Quantity'
+                    ),
+                ),
+                (
+                    'revenue',
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name='Revenue',
+                    ),
+                ),
+                (
+                    'menu_item',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='inventory.menuitem',
+                        verbose_name='Menu Item',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Daily Sales',
+                'verbose_name_plural': 'Daily Sales',
+                'indexes': [
+                    models.Index(
+                        fields=['date'], name='inventory_d_date_ba03fa_idx'
+                    )
+                ],
+                'unique_together': {('menu_item', 'date')},
+            },
+        ),
+    ]
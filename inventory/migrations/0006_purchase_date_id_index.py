@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-17 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_dailysales'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='purchase',
+            name='inventory_p_purchas_30b10b_idx',
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(
+                fields=['purchase_date', 'id'],
+                name='inventory_p_purchas_055524_idx',
+            ),
+        ),
+    ]
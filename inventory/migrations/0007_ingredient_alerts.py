@@ -0,0 +1,93 @@
+# Generated by Django 4.2.4 on 2026-10-17 23:49
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_purchase_date_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'kind',
+                    models.CharField(
+                        choices=[('low_stock', 'Low stock')],
+                        default='low_stock',
+                        max_length=20,
+                        verbose_name='Kind',
+                    ),
+                ),
+                (
+                    'available_quantity',
+                    models.FloatField(verbose_name='Available Quantity'),
+                ),
+                (
+                    'reorder_threshold',
+                    models.FloatField(verbose_name='Reorder Threshold'),
+                ),
+                (
+                    'created_at',
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name='Created At',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Stock Alert',
+                'verbose_name_plural': 'Stock Alerts',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='reorder_threshold',
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0)],
+                verbose_name='Reorder Threshold',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['expiry_date'], name='inventory_i_expiry__be0e46_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                condition=models.Q(
+                    ('available_quantity__lte', models.F('reorder_threshold'))
+                ),
+                fields=['available_quantity'],
+                name='ingredient_low_stock_idx',
+            ),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='ingredient',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to='inventory.ingredient',
+                verbose_name='Ingredient',
+            ),
+        ),
+    ]
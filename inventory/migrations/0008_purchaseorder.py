@@ -0,0 +1,132 @@
+# Generated by Django 4.2.4 on 2026-10-17 23:59
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_ingredient_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrder',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'status',
+                    models.CharField(
+                        choices=[('draft', 'Draft')],
+                        default='draft',
+                        max_length=20,
+                        verbose_name='Status',
+                    ),
+                ),
+                (
+                    'created_at',
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name='Created At',
+                    ),
+                ),
+                (
+                    'coverage_days',
+                    models.PositiveIntegerField(verbose_name='Coverage Days'),
+                ),
+                (
+                    'total_cost',
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name='Total Cost',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Purchase Order',
+                'verbose_name_plural': 'Purchase Orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='PurchaseOrderLine',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'quantity',
+                    models.FloatField(
+                        validators=[
+                            django.core.validators.MinValueValidator(0)
+                        ],
+                        verbose_name='Quantity',
+                    ),
+                ),
+                (
+                    'unit_price',
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=5,
+                        verbose_name='Unit Price',
+                    ),
+                ),
+                (
+                    'total_price',
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=12,
+                        verbose_name='Total Price',
+                    ),
+                ),
+                (
+                    'forecast',
+                    models.FloatField(verbose_name='Forecast Consumption'),
+                ),
+                (
+                    'available_quantity',
+                    models.FloatField(verbose_name='Available Quantity'),
+                ),
+                (
+                    'ingredient',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='inventory.ingredient',
+                        verbose_name='Ingredient',
+                    ),
+                ),
+                (
+                    'purchase_order',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='lines',
+                        to='inventory.purchaseorder',
+                        verbose_name='Purchase Order',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Purchase Order Line',
+                'verbose_name_plural': 'Purchase Order Lines',
+                'unique_together': {('purchase_order', 'ingredient')},
+            },
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.4 on 2026-10-18 00:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_purchaseorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('taken_at', models.DateTimeField(verbose_name='Taken At')),
+                ('quantity', models.FloatField(verbose_name='Quantity')),
+                (
+                    'ingredient',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='inventory.ingredient',
+                        verbose_name='Ingredient',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Stock Snapshot',
+                'verbose_name_plural': 'Stock Snapshots',
+                'unique_together': {('ingredient', 'taken_at')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'kind',
+                    models.CharField(
+                        choices=[
+                            ('purchase', 'Purchase'),
+                            ('delivery', 'Delivery'),
+                            ('waste', 'Waste'),
+                            ('adjustment', 'Adjustment'),
+                        ],
+                        max_length=20,
+                        verbose_name='Kind',
+                    ),
+                ),
+                ('quantity', models.FloatField(verbose_name='Quantity')),
+                (
+                    'created_at',
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name='Created At',
+                    ),
+                ),
+                (
+                    'ingredient',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='inventory.ingredient',
+                        verbose_name='Ingredient',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Stock Movement',
+                'verbose_name_plural': 'Stock Movements',
+                'indexes': [
+                    models.Index(
+                        fields=['ingredient', 'created_at', 'quantity'],
+                        name='stock_movement_ledger_idx',
+                    )
+                ],
+            },
+        ),
+    ]
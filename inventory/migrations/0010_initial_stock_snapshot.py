@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def snapshot_stock(apps, schema_editor):
+    # The ledger starts from the stock levels at migration time
+    Ingredient = apps.get_model('inventory', 'Ingredient')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    db_alias = schema_editor.connection.alias
+    taken_at = timezone.now()
+    levels = (
+        Ingredient.objects.using(db_alias)
+        .values_list('pk', 'available_quantity')
+        .iterator()
+    )
+    StockSnapshot.objects.using(db_alias).bulk_create(
+        (
+            StockSnapshot(
+                ingredient_id=ingredient_id,
+                taken_at=taken_at,
+                quantity=available_quantity,
+            )
+            for ingredient_id, available_quantity in levels
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(snapshot_stock, migrations.RunPython.noop),
+    ]
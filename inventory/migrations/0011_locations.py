@@ -0,0 +1,189 @@
+# Generated by Django 4.2.4 on 2026-10-18 00:18
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import migrations, models
+import django.db.models.deletion
+import inventory.models
+from inventory.models import DEFAULT_LOCATION_ID
+
+
+def create_default_location(apps, schema_editor):
+    # Existing ingredients, menu items, recipes and purchases move to the
+    # default location
+    Location = apps.get_model('inventory', 'Location')
+    connection = schema_editor.connection
+    Location.objects.using(connection.alias).get_or_create(
+        pk=DEFAULT_LOCATION_ID, defaults={'name': 'Default'}
+    )
+    # The id was set explicitly, so move the sequence past it (PostgreSQL)
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Location]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0010_initial_stock_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'name',
+                    models.CharField(
+                        max_length=255,
+                        unique=True,
+                        verbose_name='Location Name',
+                    ),
+                ),
+                (
+                    'members',
+                    models.ManyToManyField(
+                        blank=True,
+                        related_name='locations',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='Members',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Location',
+                'verbose_name_plural': 'Locations',
+            },
+        ),
+        migrations.RunPython(
+            create_default_location, migrations.RunPython.noop
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='location',
+            field=models.ForeignKey(
+                db_index=False,
+                default=inventory.models.default_location,
+                on_delete=django.db.models.deletion.CASCADE,
+                to='inventory.location',
+                verbose_name='Location',
+            ),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='location',
+            field=models.ForeignKey(
+                db_index=False,
+                default=inventory.models.default_location,
+                on_delete=django.db.models.deletion.CASCADE,
+                to='inventory.location',
+                verbose_name='Location',
+            ),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='location',
+            field=models.ForeignKey(
+                db_index=False,
+                default=inventory.models.default_location,
+                on_delete=django.db.models.deletion.CASCADE,
+                to='inventory.location',
+                verbose_name='Location',
+            ),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='location',
+            field=models.ForeignKey(
+                default=inventory.models.default_location,
+                on_delete=django.db.models.deletion.CASCADE,
+                to='inventory.location',
+                verbose_name='Location',
+            ),
+        ),
+        migrations.AddField(
+            model_name='reciperequirement',
+            name='location',
+            field=models.ForeignKey(
+                db_index=False,
+                default=inventory.models.default_location,
+                on_delete=django.db.models.deletion.CASCADE,
+                to='inventory.location',
+                verbose_name='Location',
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='inventory_i_expiry__be0e46_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_low_stock_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='purchase',
+            name='inventory_p_purchas_055524_idx',
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(
+                max_length=255, verbose_name='Ingredient Name'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['location', 'expiry_date'],
+                name='inventory_i_locatio_5576b7_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                condition=models.Q(
+                    ('available_quantity__lte', models.F('reorder_threshold'))
+                ),
+                fields=['location', 'available_quantity'],
+                name='ingredient_low_stock_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(
+                fields=['location', 'item_name'],
+                name='inventory_m_locatio_ed5a42_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(
+                fields=['location', 'purchase_date', 'id'],
+                name='inventory_p_locatio_2c9346_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='reciperequirement',
+            index=models.Index(
+                fields=['location', 'menu_item'],
+                name='inventory_r_locatio_4c2c2d_idx',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(
+                fields=('location', 'name'),
+                name='ingredient_location_name_uniq',
+            ),
+        ),
+    ]
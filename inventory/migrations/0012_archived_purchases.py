@@ -0,0 +1,76 @@
+# Generated by Django 4.2.4 on 2026-10-18 00:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPurchase',
+            fields=[
+                (
+                    'id',
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'purchase_date',
+                    models.DateTimeField(verbose_name='Purchase Date'),
+                ),
+                (
+                    'customer_name',
+                    models.CharField(
+                        blank=True,
+                        max_length=255,
+                        verbose_name='Customer Name',
+                    ),
+                ),
+                (
+                    'quantity',
+                    models.PositiveIntegerField(verbose_name='Quantity'),
+                ),
+                (
+                    'total_price',
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        verbose_name='Total Price',
+                    ),
+                ),
+                (
+                    'location',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='inventory.location',
+                        verbose_name='Location',
+                    ),
+                ),
+                (
+                    'menu_item',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='inventory.menuitem',
+                        verbose_name='Menu Item',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Archived Purchase',
+                'verbose_name_plural': 'Archived Purchases',
+                'indexes': [
+                    models.Index(
+                        fields=['location', 'purchase_date', 'id'],
+                        name='inventory_a_locatio_e4189b_idx',
+                    )
+                ],
+            },
+        ),
+    ]
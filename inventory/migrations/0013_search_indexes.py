@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# (table, column) pairs searched by substring (see inventory/search.py)
+SEARCHED_COLUMNS = [
+    ('inventory_purchase', 'customer_name'),
+    ('inventory_archivedpurchase', 'customer_name'),
+    ('inventory_menuitem', 'item_name'),
+]
+
+# The trigram tokenizer needs SQLite 3.34
+SQLITE_TRIGRAM_VERSION = (3, 34)
+
+
+def sqlite_create_sql(table, column):
+    # An external-content FTS5 table (it stores only the index, reading
+    # the text from the table) kept in sync by triggers
+    index = f'{table}_search'
+    return [
+        f'CREATE VIRTUAL TABLE {index} USING fts5({column}, '
+        f"content='{table}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {index}(rowid, {column}) '
+        f'VALUES (new.id, new.{column}); END',
+        f'CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN '
+        f'INSERT INTO {index}({index}, rowid, {column}) '
+        f"VALUES ('delete', old.id, old.{column}); END",
+        f'CREATE TRIGGER {index}_update AFTER UPDATE OF {column} '
+        f'ON {table} BEGIN '
+        f'INSERT INTO {index}({index}, rowid, {column}) '
+        f"VALUES ('delete', old.id, old.{column}); "
+        f'INSERT INTO {index}(rowid, {column}) '
+        f'VALUES (new.id, new.{column}); END',
+        # Index the rows already stored
+        f"INSERT INTO {index}({index}) VALUES ('rebuild')",
+    ]
+
+
+def sqlite_drop_sql(table, column):
+    index = f'{table}_search'
+    return [
+        f'DROP TRIGGER IF EXISTS {index}_insert',
+        f'DROP TRIGGER IF EXISTS {index}_delete',
+        f'DROP TRIGGER IF EXISTS {index}_update',
+        f'DROP TABLE IF EXISTS {index}',
+    ]
+
+
+def postgresql_create_sql(table, column):
+    # Serves the UPPER(column) LIKE UPPER(...) of icontains lookups
+    return [
+        f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} '
+        f'USING gin (UPPER({column}) gin_trgm_ops)',
+    ]
+
+
+def postgresql_drop_sql(table, column):
+    return [f'DROP INDEX IF EXISTS {table}_{column}_trgm']
+
+
+def statements(connection, create):
+    if connection.vendor == 'sqlite':
+        if connection.Database.sqlite_version_info < SQLITE_TRIGRAM_VERSION:
+            return []
+        build = sqlite_create_sql if create else sqlite_drop_sql
+    elif connection.vendor == 'postgresql':
+        build = postgresql_create_sql if create else postgresql_drop_sql
+    else:
+        return []
+    sql = []
+    if create and connection.vendor == 'postgresql':
+        sql.append('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in SEARCHED_COLUMNS:
+        sql.extend(build(table, column))
+    if create and connection.vendor == 'sqlite':
+        # Statistics let the planner start searches from the index
+        sql.append('ANALYZE')
+    return sql
+
+
+def create_search_indexes(apps, schema_editor):
+    for sql in statements(schema_editor.connection, create=True):
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for sql in statements(schema_editor.connection, create=False):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_archived_purchases'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.4 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='menu_version',
+            field=models.PositiveBigIntegerField(
+                default=0, editable=False, verbose_name='Menu Version'
+            ),
+        ),
+    ]
@@ -1,7 +1,42 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+# Created by the migration adding locations; rows written without a
+# location belong to it
+DEFAULT_LOCATION_ID = 1
+
+
+def default_location():
+    return DEFAULT_LOCATION_ID
+
+
+class Location(models.Model):
+    # A kitchen; its ingredients, menu, recipes and sales are kept apart
+    # from every other location's
+    name = models.CharField(
+        max_length=255, unique=True, verbose_name='Location Name'
+    )
+    members = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        blank=True,
+        related_name='locations',
+        verbose_name='Members',
+    )
+    # Bumped by every menu change and part of the keys of the cached menu
+    # responses, so every worker sees a change once it commits
+    menu_version = models.PositiveBigIntegerField(
+        default=0, editable=False, verbose_name='Menu Version'
+    )
+
+    class Meta:
+        verbose_name = 'Location'
+        verbose_name_plural = 'Locations'
+
+    def __str__(self):
+        return self.name
+
 
 class Ingredient(models.Model):
     # Choices for the measurement_unit field
@@ -15,9 +50,15 @@ class Ingredient(models.Model):
     ]
 
     # Fields
-    name = models.CharField(
-        max_length=255, unique=True, verbose_name='Ingredient Name'
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.CASCADE,
+        default=default_location,
+        # Covered by the indexes below, which all lead with the location
+        db_index=False,
+        verbose_name='Location',
     )
+    name = models.CharField(max_length=255, verbose_name='Ingredient Name')
     available_quantity = models.FloatField(
         validators=[MinValueValidator(0)], verbose_name='Available Quantity'
     )
@@ -38,10 +79,36 @@ class Ingredient(models.Model):
     expiry_date = models.DateField(
         null=True, blank=True, verbose_name='Expiry Date'
     )
+    # Stock level at or below which the ingredient needs reordering
+    reorder_threshold = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0)],
+        verbose_name='Reorder Threshold',
+    )
 
     class Meta:
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
+        constraints = [
+            # Names are unique per location; also serves name lookups
+            models.UniqueConstraint(
+                fields=['location', 'name'],
+                name='ingredient_location_name_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'expiry_date']),
+            # Only holds the ingredients at or below their reorder
+            # threshold, so the low-stock list is a scan of those rows alone
+            models.Index(
+                fields=['location', 'available_quantity'],
+                condition=models.Q(
+                    available_quantity__lte=models.F('reorder_threshold')
+                ),
+                name='ingredient_low_stock_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -49,6 +116,14 @@ class Ingredient(models.Model):
 
 class MenuItem(models.Model):
     # Fields
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.CASCADE,
+        default=default_location,
+        # Covered by the index below
+        db_index=False,
+        verbose_name='Location',
+    )
     item_name = models.CharField(max_length=255, verbose_name='Menu Item Name')
     price = models.DecimalField(
         max_digits=6,
@@ -60,6 +135,9 @@ class MenuItem(models.Model):
     class Meta:
         verbose_name = 'Menu Item'
         verbose_name_plural = 'Menu Items'
+        indexes = [
+            models.Index(fields=['location', 'item_name']),
+        ]
 
     def __str__(self):
         return self.item_name
@@ -67,6 +145,15 @@ class MenuItem(models.Model):
 
 class RecipeRequirement(models.Model):
     # Fields
+    # Always the menu item's location
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.CASCADE,
+        default=default_location,
+        # Covered by the index below
+        db_index=False,
+        verbose_name='Location',
+    )
     menu_item = models.ForeignKey(
         'MenuItem', on_delete=models.CASCADE, verbose_name='Menu Item'
     )
@@ -93,14 +180,28 @@ class RecipeRequirement(models.Model):
                     'ingredient',
                 ]
             ),
+            models.Index(fields=['location', 'menu_item']),
         ]
 
+    def save(self, *args, **kwargs):
+        self.location_id = self.menu_item.location_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.menu_item} - {self.ingredient}'
 
 
 class Purchase(models.Model):
     # Fields
+    # Always the menu item's location
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.CASCADE,
+        default=default_location,
+        # Covered by the index below
+        db_index=False,
+        verbose_name='Location',
+    )
     menu_item = models.ForeignKey(
         'MenuItem', on_delete=models.CASCADE, verbose_name='Menu Item'
     )
@@ -126,13 +227,252 @@ class Purchase(models.Model):
         # Creating indexes on fields for optimizing query performance
         indexes = [
             models.Index(fields=['menu_item']),
-            models.Index(fields=['purchase_date']),
+            # Also serves keyset pagination ordered by (purchase_date, id)
+            models.Index(fields=['location', 'purchase_date', 'id']),
         ]
 
     def save(self, *args, **kwargs):
         # Ensure total price is correctly calculated
         self.total_price = self.menu_item.price * self.quantity
+        self.location_id = self.menu_item.location_id
         super(Purchase, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        # Taken out of the daily sales rollup here rather than by a delete
+        # signal, which would make deleting a menu item or location load
+        # and delete its purchases one by one
+        from .sales import remove_sales
+
+        with transaction.atomic():
+            remove_sales([self])
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f'Purchase of {self.quantity} {self.menu_item} on {self.purchase_date}'
+
+
+class ArchivedPurchase(models.Model):
+    # Purchases moved out of the Purchase table by archive_purchases, with
+    # their ids. The fields match Purchase's, in the same order, so both
+    # tables can be read as one (see inventory/archive.py)
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.CASCADE,
+        # Covered by the index below
+        db_index=False,
+        verbose_name='Location',
+    )
+    menu_item = models.ForeignKey(
+        'MenuItem', on_delete=models.CASCADE, verbose_name='Menu Item'
+    )
+    purchase_date = models.DateTimeField(verbose_name='Purchase Date')
+    customer_name = models.CharField(
+        max_length=255, blank=True, verbose_name='Customer Name'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Quantity')
+    total_price = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name='Total Price'
+    )
+
+    class Meta:
+        verbose_name = 'Archived Purchase'
+        verbose_name_plural = 'Archived Purchases'
+        indexes = [
+            models.Index(fields=['location', 'purchase_date', 'id']),
+        ]
+
+    def __str__(self):
+        return f'Archived purchase of {self.quantity} {self.menu_item} on {self.purchase_date}'
+
+
+class DailySales(models.Model):
+    # Sales of one menu item on one day, maintained as purchases are written
+    menu_item = models.ForeignKey(
+        'MenuItem', on_delete=models.CASCADE, verbose_name='Menu Item'
+    )
+    date = models.DateField(verbose_name='Date')
+    quantity = models.PositiveBigIntegerField(
+        default=0, verbose_name='Quantity'
+    )
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name='Revenue'
+    )
+
+    class Meta:
+        verbose_name = 'Daily Sales'
+        verbose_name_plural = 'Daily Sales'
+        unique_together = ['menu_item', 'date']
+        # Creating indexes on fields for optimizing query performance
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f'{self.menu_item} on {self.date}'
+
+
+class StockAlert(models.Model):
+    # Queue of ingredients that dropped to their reorder threshold; consumers
+    # poll it in id order
+    LOW_STOCK = 'low_stock'
+    KIND_CHOICES = [
+        (LOW_STOCK, 'Low stock'),
+    ]
+
+    ingredient = models.ForeignKey(
+        'Ingredient', on_delete=models.CASCADE, verbose_name='Ingredient'
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        default=LOW_STOCK,
+        verbose_name='Kind',
+    )
+    available_quantity = models.FloatField(verbose_name='Available Quantity')
+    reorder_threshold = models.FloatField(verbose_name='Reorder Threshold')
+    created_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Created At'
+    )
+
+    class Meta:
+        verbose_name = 'Stock Alert'
+        verbose_name_plural = 'Stock Alerts'
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.ingredient}'
+
+
+class PurchaseOrder(models.Model):
+    # Order of ingredients from suppliers, drafted by the reorder planner
+    DRAFT = 'draft'
+    STATUS_CHOICES = [
+        (DRAFT, 'Draft'),
+    ]
+
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.CASCADE,
+        default=default_location,
+        verbose_name='Location',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=DRAFT,
+        verbose_name='Status',
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Created At'
+    )
+    coverage_days = models.PositiveIntegerField(verbose_name='Coverage Days')
+    total_cost = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name='Total Cost'
+    )
+
+    class Meta:
+        verbose_name = 'Purchase Order'
+        verbose_name_plural = 'Purchase Orders'
+
+    def __str__(self):
+        return f'Purchase order {self.pk} ({self.get_status_display()})'
+
+
+class PurchaseOrderLine(models.Model):
+    purchase_order = models.ForeignKey(
+        'PurchaseOrder',
+        on_delete=models.CASCADE,
+        related_name='lines',
+        verbose_name='Purchase Order',
+    )
+    ingredient = models.ForeignKey(
+        'Ingredient', on_delete=models.CASCADE, verbose_name='Ingredient'
+    )
+    quantity = models.FloatField(
+        validators=[MinValueValidator(0)], verbose_name='Quantity'
+    )
+    unit_price = models.DecimalField(
+        max_digits=5, decimal_places=2, verbose_name='Unit Price'
+    )
+    total_price = models.DecimalField(
+        max_digits=12, decimal_places=2, verbose_name='Total Price'
+    )
+    # Planning inputs, kept to explain the quantity
+    forecast = models.FloatField(verbose_name='Forecast Consumption')
+    available_quantity = models.FloatField(verbose_name='Available Quantity')
+
+    class Meta:
+        verbose_name = 'Purchase Order Line'
+        verbose_name_plural = 'Purchase Order Lines'
+        unique_together = ['purchase_order', 'ingredient']
+
+    def __str__(self):
+        return f'{self.quantity} {self.ingredient}'
+
+
+class StockMovement(models.Model):
+    # Append-only ledger of every change to an ingredient's stock
+    PURCHASE = 'purchase'
+    DELIVERY = 'delivery'
+    WASTE = 'waste'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = [
+        (PURCHASE, 'Purchase'),
+        (DELIVERY, 'Delivery'),
+        (WASTE, 'Waste'),
+        (ADJUSTMENT, 'Adjustment'),
+    ]
+
+    ingredient = models.ForeignKey(
+        'Ingredient',
+        on_delete=models.CASCADE,
+        # Covered by the ledger index below
+        db_index=False,
+        verbose_name='Ingredient',
+    )
+    kind = models.CharField(
+        max_length=20, choices=KIND_CHOICES, verbose_name='Kind'
+    )
+    # Signed: negative quantities leave the stock
+    quantity = models.FloatField(verbose_name='Quantity')
+    created_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Created At'
+    )
+
+    class Meta:
+        verbose_name = 'Stock Movement'
+        verbose_name_plural = 'Stock Movements'
+        indexes = [
+            # Covers "sum of an ingredient's movements in a time range"
+            # without reading the table
+            models.Index(
+                fields=['ingredient', 'created_at', 'quantity'],
+                name='stock_movement_ledger_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.get_kind_display()} of {self.quantity} {self.ingredient}'
+        )
+
+
+class StockSnapshot(models.Model):
+    # Stock of an ingredient at a point in time, summarising the ledger
+    ingredient = models.ForeignKey(
+        'Ingredient',
+        on_delete=models.CASCADE,
+        # Covered by the unique (ingredient, taken_at) index
+        db_index=False,
+        verbose_name='Ingredient',
+    )
+    taken_at = models.DateTimeField(verbose_name='Taken At')
+    quantity = models.FloatField(verbose_name='Quantity')
+
+    class Meta:
+        verbose_name = 'Stock Snapshot'
+        verbose_name_plural = 'Stock Snapshots'
+        unique_together = ['ingredient', 'taken_at']
+
+    def __str__(self):
+        return f'{self.ingredient} at {self.taken_at}'
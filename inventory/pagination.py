@@ -0,0 +1,135 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .archive import combine_partitions
+
+
+class PurchaseKeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over ``(purchase_date, id)``.
+
+    Every page is an index range scan starting right after the last row of
+    the previous page, so there is no ``COUNT(*)`` and no ``OFFSET`` and
+    deep pages cost the same as the first one. The cursor holds the last
+    row's sort key, so rows inserted while a client pages through do not
+    shift the pages it has not read yet.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Same as paginate_queryset, with the async ORM
+        return self.set_page(
+            [row async for row in self.page_queryset(queryset, request)]
+        )
+
+    def page_queryset(self, queryset, request):
+        # ``queryset`` may also be a list of purchase partitions (see
+        # inventory/archive.py), paged through as one
+        self.request = request
+        position = self.decode_cursor(request)
+
+        partitions = queryset if isinstance(queryset, list) else [queryset]
+        if position is not None:
+            purchase_date, pk = position
+            # The leading range condition keeps this an index range scan
+            partitions = [
+                partition.filter(purchase_date__gte=purchase_date).filter(
+                    Q(purchase_date__gt=purchase_date) | Q(pk__gt=pk)
+                )
+                for partition in partitions
+            ]
+        queryset = combine_partitions(partitions)
+        return queryset.order_by('purchase_date', 'pk')[: self.page_size + 1]
+
+    def set_page(self, page):
+        self.has_next = len(page) > self.page_size
+        page = page[: self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.last.purchase_date, self.last.pk),
+        )
+
+    def encode_cursor(self, purchase_date, pk):
+        position = f'{purchase_date.isoformat()}|{pk}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = urlsafe_b64decode(encoded.encode()).decode()
+            purchase_date, pk = position.rsplit('|', 1)
+            purchase_date = parse_datetime(purchase_date)
+            pk = int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if purchase_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return purchase_date, pk
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    ``PageNumberPagination`` for async views: the count and the page rows
+    are read with the async ORM, and responses have the same shape.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        # Page numbers are validated against the count alone; only the
+        # rows of the requested page are read
+        paginator = self.django_paginator_class(
+            range(await queryset.acount()), page_size
+        )
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            # The browsable API should display pagination controls
+            self.display_page_controls = True
+
+        self.request = request
+        offset = (self.page.number - 1) * page_size
+        if paginator.count:
+            self.page.object_list = [
+                row async for row in queryset[offset : offset + page_size]
+            ]
+        else:
+            self.page.object_list = []
+        return list(self.page)
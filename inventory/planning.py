@@ -0,0 +1,117 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.db import transaction
+
+from .forecasting import fetch_columns, forecast_consumption
+from .models import (
+    DEFAULT_LOCATION_ID,
+    Ingredient,
+    PurchaseOrder,
+    PurchaseOrderLine,
+)
+
+DEFAULT_COVERAGE_DAYS = 7
+CENT = Decimal('0.01')
+
+
+def plan_reorder(
+    coverage_days=DEFAULT_COVERAGE_DAYS,
+    location_id=DEFAULT_LOCATION_ID,
+    **forecast_options,
+):
+    """
+    Return the quantity of every ingredient of a location to order so the
+    stock covers the forecast consumption of the next ``coverage_days``
+    days, plus the ingredient's reorder threshold as safety stock.
+
+    Stock, prices and thresholds are read with one query and the whole
+    ingredient table is planned with array arithmetic. Returns a dict of
+    aligned arrays: ``ingredient_ids``, ``forecast``, ``available``,
+    ``prices`` and ``quantities``.
+    """
+    ingredient_ids, _, _, forecast = forecast_consumption(
+        horizon=coverage_days, location_id=location_id, **forecast_options
+    )
+    stock_ids, stock, thresholds, prices, units = fetch_columns(
+        Ingredient.objects.filter(location_id=location_id)
+        .values_list(
+            'pk',
+            'available_quantity',
+            'reorder_threshold',
+            'price_per_unit',
+            'measurement_unit',
+        )
+        .order_by('pk'),
+        [np.int64, float, float, float, object],
+    )
+    # Align with the forecast; ingredients deleted since are planned as
+    # absent and ones created since are left out
+    rows = np.searchsorted(stock_ids, ingredient_ids)
+    found = rows < len(stock_ids)
+    found[found] = stock_ids[rows[found]] == ingredient_ids[found]
+    rows = rows[found]
+    available = np.zeros(len(ingredient_ids))
+    available[found] = stock[rows]
+    safety = np.zeros(len(ingredient_ids))
+    # A missing threshold reads as NaN: no safety stock
+    safety[found] = np.nan_to_num(thresholds[rows])
+    unit_prices = np.zeros(len(ingredient_ids))
+    unit_prices[found] = prices[rows]
+    pieces = np.zeros(len(ingredient_ids), dtype=bool)
+    pieces[found] = units[rows] == Ingredient.PIECES
+
+    quantities = np.maximum(forecast + safety - available, 0)
+    # Whole pieces only; other units to three decimals, rounded up
+    quantities = np.where(
+        pieces,
+        np.ceil(quantities),
+        # round first so float noise (0.1 * 1000) does not round up
+        np.ceil(np.round(quantities * 1000, 6)) / 1000,
+    )
+    return {
+        'ingredient_ids': ingredient_ids,
+        'forecast': forecast,
+        'available': available,
+        'prices': unit_prices,
+        'quantities': quantities,
+    }
+
+
+@transaction.atomic
+def create_draft_order(
+    coverage_days=DEFAULT_COVERAGE_DAYS,
+    location_id=DEFAULT_LOCATION_ID,
+    **forecast_options,
+):
+    """
+    Plan the reorder of a location with ``plan_reorder`` and store it as a
+    draft ``PurchaseOrder`` with one line per ingredient to order
+    """
+    plan = plan_reorder(coverage_days, location_id, **forecast_options)
+    order = PurchaseOrder.objects.create(
+        location_id=location_id, coverage_days=coverage_days
+    )
+
+    lines = []
+    for index in np.flatnonzero(plan['quantities'] > 0).tolist():
+        quantity = float(plan['quantities'][index])
+        unit_price = Decimal(str(plan['prices'][index])).quantize(CENT)
+        lines.append(
+            PurchaseOrderLine(
+                purchase_order=order,
+                ingredient_id=int(plan['ingredient_ids'][index]),
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=(Decimal(str(quantity)) * unit_price).quantize(
+                    CENT, rounding=ROUND_HALF_UP
+                ),
+                forecast=round(float(plan['forecast'][index]), 4),
+                available_quantity=float(plan['available'][index]),
+            )
+        )
+    PurchaseOrderLine.objects.bulk_create(lines, batch_size=1000)
+
+    order.total_cost = sum((line.total_price for line in lines), Decimal(0))
+    order.save(update_fields=['total_cost'])
+    return order
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import (
+    DEFAULT_LOCATION_ID,
+    ArchivedPurchase,
+    DailySales,
+    Purchase,
+)
+
+# Rollup periods and the function truncating a day to the period start
+PERIODS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def sales_date(purchase_date):
+    """
+    Return the day a purchase is rolled up under
+    """
+    if timezone.is_naive(purchase_date):
+        return purchase_date.date()
+    return timezone.localdate(purchase_date)
+
+
+def _daily_totals(purchases):
+    # {(menu_item_id, day): [quantity, revenue]} summed in memory
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for purchase in purchases:
+        total = totals[
+            (purchase.menu_item_id, sales_date(purchase.purchase_date))
+        ]
+        total[0] += purchase.quantity
+        total[1] += Decimal(purchase.total_price)
+    return totals
+
+
+def record_sales(purchases):
+    """
+    Add ``purchases`` to the daily rollup.
+
+    Purchases are summed per menu item and day in memory and applied with a
+    single ``INSERT ... ON CONFLICT DO UPDATE`` statement (executed once per
+    rollup row), which increments the stored totals in place, so concurrent
+    writers never lose each other's updates.
+    """
+    totals = _daily_totals(purchases)
+    if not totals:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(DailySales._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} '
+        f'({qn("menu_item_id")}, {qn("date")}, {qn("quantity")}, '
+        f'{qn("revenue")}) VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT ({qn("menu_item_id")}, {qn("date")}) DO UPDATE SET '
+        f'{qn("quantity")} = {table}.{qn("quantity")} + '
+        f'EXCLUDED.{qn("quantity")}, '
+        f'{qn("revenue")} = {table}.{qn("revenue")} + '
+        f'EXCLUDED.{qn("revenue")}'
+    )
+    params = [
+        (
+            menu_item_id,
+            connection.ops.adapt_datefield_value(day),
+            quantity,
+            connection.ops.adapt_decimalfield_value(revenue, 14, 2),
+        )
+        for (menu_item_id, day), (quantity, revenue) in totals.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def remove_sales(purchases):
+    """
+    Subtract deleted (or since modified) ``purchases`` from the daily rollup
+    """
+    for (menu_item_id, day), (quantity, revenue) in _daily_totals(
+        purchases
+    ).items():
+        DailySales.objects.filter(menu_item_id=menu_item_id, date=day).update(
+            quantity=F('quantity') - quantity, revenue=F('revenue') - revenue
+        )
+
+
+@transaction.atomic
+def delete_purchases(purchases):
+    """
+    Delete ``purchases`` (a queryset) and subtract them from the daily
+    rollup.
+
+    Purchases have no delete signals, so deleting a menu item or location
+    removes their purchases (and rollup rows) with fast bulk deletes;
+    purchases deleted on their own go through here or ``Purchase.delete``.
+    """
+    purchases = list(purchases)
+    remove_sales(purchases)
+    return Purchase.objects.filter(
+        pk__in=[purchase.pk for purchase in purchases]
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_daily_sales():
+    """
+    Recompute the whole daily rollup from the purchases and the archived
+    purchases and return the number of rollup rows written
+    """
+    DailySales.objects.all().delete()
+    # {(menu_item_id, date): [quantity, revenue]}, summed over both tables
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for model in (Purchase, ArchivedPurchase):
+        rows = (
+            model.objects.annotate(date=TruncDate('purchase_date'))
+            .values_list('menu_item_id', 'date')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('total_price'))
+            .order_by()
+        )
+        for menu_item_id, date, quantity, revenue in rows.iterator():
+            total = totals[(menu_item_id, date)]
+            total[0] += quantity
+            total[1] += revenue
+    daily_sales = DailySales.objects.bulk_create(
+        (
+            DailySales(
+                menu_item_id=menu_item_id,
+                date=date,
+                quantity=quantity,
+                revenue=revenue,
+            )
+            for (menu_item_id, date), (quantity, revenue) in totals.items()
+        ),
+        batch_size=1000,
+    )
+    return len(daily_sales)
+
+
+def sales_rollup(
+    period='day',
+    date_from=None,
+    date_to=None,
+    menu_item_id=None,
+    location_id=DEFAULT_LOCATION_ID,
+):
+    """
+    Return revenue and quantity per menu item of a location and period,
+    read from the daily rollup instead of the purchases table
+    """
+    daily_sales = DailySales.objects.filter(menu_item__location_id=location_id)
+    if menu_item_id:
+        daily_sales = daily_sales.filter(menu_item_id=menu_item_id)
+    if date_from:
+        daily_sales = daily_sales.filter(date__gte=date_from)
+    if date_to:
+        daily_sales = daily_sales.filter(date__lte=date_to)
+
+    trunc = PERIODS[period]
+    return (
+        daily_sales.annotate(period=trunc('date') if trunc else F('date'))
+        .values('menu_item_id', 'period')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('period', 'menu_item_id')
+    )
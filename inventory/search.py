@@ -0,0 +1,166 @@
+"""
+Indexed substring search of customer and menu item names.
+
+Names are matched like ``icontains`` (every term anywhere in the name, any
+case), but through a trigram index instead of a ``LIKE '%term%'`` scan:
+
+* SQLite: an FTS5 table with the trigram tokenizer per searched table
+  (``<table>_search``), kept in sync by triggers (migration 0013). Tables
+  rebuilt by a later SQLite migration lose their triggers, which that
+  migration has to create again; ``check_search_indexes`` reports missing
+  ones.
+* PostgreSQL: ``pg_trgm`` GIN indexes, which serve ``icontains`` as is.
+
+Terms shorter than three characters have no trigrams and fall back to a
+scan. Ranked searches annotate ``search_prefix`` and ``search_rank``, lower
+being the better match, and are ordered by ``SEARCH_ORDERING``: names
+starting with the first term come first, then by trigram similarity on
+PostgreSQL and the name's length elsewhere.
+
+On SQLite the matches are selected by ``id IN (SELECT rowid ... MATCH)``,
+which runs the index query once; a join would let the planner re-run it for
+every purchase of the location. Without table statistics the planner still
+walks the location's purchases, testing each against the matches, so
+``archive_purchases`` runs ``ANALYZE``; with statistics it starts from the
+matches.
+"""
+from django.core import checks
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Case, F, FloatField, Func, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+
+from .models import ArchivedPurchase, MenuItem, Purchase
+
+# Searched field of every indexed model, also the column of its index
+# (``<table>_search`` on SQLite)
+SEARCH_FIELDS = {
+    Purchase: 'customer_name',
+    ArchivedPurchase: 'customer_name',
+    MenuItem: 'item_name',
+}
+
+# Order of ranked searches, best match first
+SEARCH_ORDERING = ['search_prefix', 'search_rank', 'pk']
+
+# Terms need a full trigram to use the index
+MIN_INDEXED_LENGTH = 3
+
+# The trigram tokenizer needs SQLite 3.34
+SQLITE_TRIGRAM_VERSION = (3, 34)
+
+# Migration creating the search indexes
+SEARCH_MIGRATION = ('inventory', '0013_search_indexes')
+
+
+def fts_query(terms):
+    """
+    Return an FTS5 query matching rows that contain every term: each one a
+    quoted string, so it is matched as a substring whatever it contains
+    """
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _has_fts(connection):
+    return (
+        connection.vendor == 'sqlite'
+        and connection.Database.sqlite_version_info >= SQLITE_TRIGRAM_VERSION
+    )
+
+
+def _uses_fts(connection, terms):
+    return _has_fts(connection) and all(
+        len(term) >= MIN_INDEXED_LENGTH for term in terms
+    )
+
+
+def missing_search_objects(connection):
+    """
+    Return the names of the index tables and triggers of ``SEARCH_FIELDS``
+    missing from the SQLite database of ``connection``
+    """
+    expected = []
+    for model in SEARCH_FIELDS:
+        index = f'{model._meta.db_table}_search'
+        expected += [
+            index,
+            f'{index}_insert',
+            f'{index}_delete',
+            f'{index}_update',
+        ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN ({})'.format(
+                ', '.join(['%s'] * len(expected))
+            ),
+            expected,
+        )
+        found = {name for name, in cursor.fetchall()}
+    return [name for name in expected if name not in found]
+
+
+def check_search_indexes(app_configs, databases=None, **kwargs):
+    errors = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if not _has_fts(connection) or SEARCH_MIGRATION not in (
+            MigrationRecorder(connection).applied_migrations()
+        ):
+            continue
+        missing = missing_search_objects(connection)
+        if missing:
+            errors.append(
+                checks.Error(
+                    'Search index tables or triggers are missing from the '
+                    f'{alias!r} database: {", ".join(missing)}.',
+                    hint='A migration rebuilding a searched table has to '
+                    'create its triggers again (see migration 0013).',
+                    id='inventory.E001',
+                )
+            )
+    return errors
+
+
+def search(queryset, terms, rank=False):
+    """
+    Filter ``queryset`` (of a ``SEARCH_FIELDS`` model) to the rows whose
+    searched field contains every one of ``terms``, annotating
+    ``search_prefix`` and ``search_rank`` when ``rank`` is set
+    """
+    terms = [term for term in terms if term]
+    if not terms:
+        return queryset
+
+    field = SEARCH_FIELDS[queryset.model]
+    connection = connections[queryset.db]
+    if _uses_fts(connection, terms):
+        index = f'{queryset.model._meta.db_table}_search'
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM {index} WHERE {index} MATCH %s',
+                [fts_query(terms)],
+            )
+        )
+    else:
+        for term in terms:
+            queryset = queryset.filter(**{f'{field}__icontains': term})
+    if rank:
+        if connection.vendor == 'postgresql':
+            search_rank = -Func(
+                F(field),
+                Value(' '.join(terms)),
+                function='SIMILARITY',
+                output_field=FloatField(),
+            )
+        else:
+            # The shorter the name, the more of it the terms cover
+            search_rank = Length(field)
+        queryset = queryset.annotate(
+            search_prefix=Case(
+                When(**{f'{field}__istartswith': terms[0]}, then=Value(0)),
+                default=Value(1),
+            ),
+            search_rank=search_rank,
+        )
+    return queryset
@@ -1,8 +1,62 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import Ingredient, MenuItem, RecipeRequirement, Purchase
+from .models import (
+    DEFAULT_LOCATION_ID,
+    Ingredient,
+    MenuItem,
+    RecipeRequirement,
+    Purchase,
+    PurchaseOrder,
+    PurchaseOrderLine,
+    StockAlert,
+    StockMovement,
+)
+from .forecasting import (
+    DEFAULT_ALPHA,
+    DEFAULT_HISTORY,
+    DEFAULT_HORIZON,
+    DEFAULT_WINDOW,
+    FORECAST_METHODS,
+)
+from .planning import DEFAULT_COVERAGE_DAYS
+from .sales import PERIODS
+from .stream import STOCK_STREAM_MAX_SECONDS
+
+
+class LocationScopedSerializer(serializers.ModelSerializer):
+    """
+    Model serializer for the rows of one location: the request's
+    (``context['location_id']``), else the instance's, else the default.
+
+    Rows are created in that location and the ``scoped_fields`` relations
+    only accept rows of it.
+    """
+
+    scoped_fields = []
 
+    @property
+    def location_id(self):
+        if 'location_id' in self.context:
+            return self.context['location_id']
+        if isinstance(self.instance, self.Meta.model):
+            return self.instance.location_id
+        return DEFAULT_LOCATION_ID
 
-class IngredientSerializer(serializers.ModelSerializer):
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.scoped_fields:
+            fields[name].queryset = fields[name].queryset.filter(
+                location_id=self.location_id
+            )
+        return fields
+
+    def create(self, validated_data):
+        validated_data['location_id'] = self.location_id
+        return super().create(validated_data)
+
+
+class IngredientSerializer(LocationScopedSerializer):
     class Meta:
         model = Ingredient
         fields = [
@@ -13,10 +67,111 @@ class IngredientSerializer(serializers.ModelSerializer):
             'date_added',
             'expiry_date',
             'measurement_unit',
+            'reorder_threshold',
         ]
 
+    def validate_name(self, value):
+        # Names are unique per location
+        ingredients = Ingredient.objects.filter(
+            location_id=self.location_id, name=value
+        )
+        if self.instance is not None:
+            ingredients = ingredients.exclude(pk=self.instance.pk)
+        if ingredients.exists():
+            raise serializers.ValidationError(
+                'An ingredient with this name already exists.'
+            )
+        return value
+
+
+class BulkIngredientStockSerializer(serializers.Serializer):
+    # Plain serializer for bulk stock updates: ingredients are resolved for
+    # the whole batch at once instead of one lookup per row
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(max_length=255, required=False)
+    available_quantity = serializers.FloatField(min_value=0, required=False)
+    delta = serializers.FloatField(required=False)
+    # Only used when a name does not match an ingredient and it is created
+    measurement_unit = serializers.ChoiceField(
+        choices=Ingredient.MEASUREMENT_CHOICES, required=False
+    )
+    price_per_unit = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        min_value=Decimal('0.01'),
+        required=False,
+    )
+    expiry_date = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, data):
+        if ('id' in data) == ('name' in data):
+            raise serializers.ValidationError(
+                'Provide either an id or a name.'
+            )
+        if ('available_quantity' in data) == ('delta' in data):
+            raise serializers.ValidationError(
+                'Provide either available_quantity or delta.'
+            )
+        return data
+
+
+class IngredientAlertsQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(
+        min_value=0, max_value=3650, required=False, default=7
+    )
+
+
+class StockStreamQuerySerializer(serializers.Serializer):
+    # Seconds the stream stays open; 0 only sends the current levels
+    timeout = serializers.IntegerField(
+        min_value=0,
+        max_value=STOCK_STREAM_MAX_SECONDS,
+        required=False,
+        default=STOCK_STREAM_MAX_SECONDS,
+    )
+
+
+class StockAlertsQuerySerializer(serializers.Serializer):
+    after = serializers.IntegerField(min_value=0, required=False, default=0)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=1000, required=False, default=100
+    )
+
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(source='ingredient.name')
+
+    class Meta:
+        model = StockAlert
+        fields = [
+            'id',
+            'kind',
+            'ingredient',
+            'ingredient_name',
+            'available_quantity',
+            'reorder_threshold',
+            'created_at',
+        ]
+
+
+class StockAtQuerySerializer(serializers.Serializer):
+    at = serializers.DateTimeField(required=False)
+    ingredient_id = serializers.IntegerField(required=False)
+
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class IngredientStockSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.FloatField(source='quantity_at')
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'kind', 'quantity', 'created_at']
+
+
+class MenuItemSerializer(LocationScopedSerializer):
     name = serializers.CharField(source='item_name')
 
     class Meta:
@@ -28,7 +183,9 @@ class MenuItemSerializer(serializers.ModelSerializer):
             # This is for update scenarios. If the name hasn't changed during update, then it's okay.
             return value
 
-        if MenuItem.objects.filter(item_name=value).exists():
+        if MenuItem.objects.filter(
+            location_id=self.location_id, item_name=value
+        ).exists():
             raise serializers.ValidationError(
                 'A menu item with this name already exists.'
             )
@@ -42,7 +199,18 @@ class MenuItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeRequirementSerializer(serializers.ModelSerializer):
+class MenuItemCostingSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    price = serializers.DecimalField(max_digits=6, decimal_places=2)
+    cost = serializers.DecimalField(max_digits=12, decimal_places=2)
+    margin = serializers.DecimalField(max_digits=12, decimal_places=2)
+    margin_percent = serializers.FloatField(allow_null=True)
+
+
+class RecipeRequirementSerializer(LocationScopedSerializer):
+    scoped_fields = ['menu_item', 'ingredient']
+
     class Meta:
         model = RecipeRequirement
         fields = ['menu_item', 'ingredient', 'quantity']
@@ -52,7 +220,17 @@ class RecipeRequirementSerializer(serializers.ModelSerializer):
         return data
 
 
-class PurchaseSerializer(serializers.ModelSerializer):
+class BulkRecipeRequirementSerializer(serializers.Serializer):
+    # Plain serializer for bulk imports: references are checked for the
+    # whole batch at once instead of one lookup per row
+    menu_item = serializers.IntegerField()
+    ingredient = serializers.IntegerField()
+    quantity = serializers.FloatField(min_value=0)
+
+
+class PurchaseSerializer(LocationScopedSerializer):
+    scoped_fields = ['menu_item']
+
     class Meta:
         model = Purchase
         fields = [
@@ -62,3 +240,97 @@ class PurchaseSerializer(serializers.ModelSerializer):
             'quantity',
             'total_price',
         ]
+
+
+class BulkPurchaseSerializer(serializers.Serializer):
+    # Plain serializer for bulk ingestion: menu items are resolved for the
+    # whole batch at once instead of one lookup per row
+    menu_item = serializers.IntegerField()
+    purchase_date = serializers.DateTimeField(required=False)
+    customer_name = serializers.CharField(
+        max_length=255, allow_blank=True, required=False, default=''
+    )
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class SalesRollupQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(
+        choices=list(PERIODS), required=False, default='day'
+    )
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    menu_item_id = serializers.IntegerField(required=False)
+
+
+class SalesRollupSerializer(serializers.Serializer):
+    menu_item = serializers.IntegerField(source='menu_item_id')
+    period = serializers.DateField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class ForecastQuerySerializer(serializers.Serializer):
+    horizon = serializers.IntegerField(
+        min_value=1, max_value=365, required=False, default=DEFAULT_HORIZON
+    )
+    history = serializers.IntegerField(
+        min_value=1, max_value=3650, required=False, default=DEFAULT_HISTORY
+    )
+    window = serializers.IntegerField(
+        min_value=1, max_value=3650, required=False, default=DEFAULT_WINDOW
+    )
+    alpha = serializers.FloatField(
+        min_value=0.01, max_value=1, required=False, default=DEFAULT_ALPHA
+    )
+    method = serializers.ChoiceField(
+        choices=FORECAST_METHODS, required=False, default='exponential'
+    )
+
+
+class ConsumptionForecastSerializer(serializers.Serializer):
+    ingredient = serializers.IntegerField()
+    name = serializers.CharField()
+    daily_consumption = serializers.FloatField()
+    forecast = serializers.FloatField()
+
+
+class PurchaseOrderPlanSerializer(ForecastQuerySerializer):
+    # The forecast horizon is the coverage
+    horizon = None
+    coverage_days = serializers.IntegerField(
+        min_value=1,
+        max_value=365,
+        required=False,
+        default=DEFAULT_COVERAGE_DAYS,
+    )
+
+
+class PurchaseOrderLineSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(source='ingredient.name')
+
+    class Meta:
+        model = PurchaseOrderLine
+        fields = [
+            'ingredient',
+            'ingredient_name',
+            'quantity',
+            'unit_price',
+            'total_price',
+            'forecast',
+            'available_quantity',
+        ]
+
+
+class PurchaseOrderSerializer(serializers.ModelSerializer):
+    lines = PurchaseOrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = [
+            'id',
+            'status',
+            'created_at',
+            'coverage_days',
+            'total_cost',
+            'lines',
+        ]
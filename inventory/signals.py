@@ -0,0 +1,153 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .alerts import is_low_stock, stock_alerts_queued
+from .availability import invalidate_menu_availability
+from .costing import mark_costs_dirty
+from .ledger import record_movements
+from .locations import forget_locations, forget_memberships
+from .menu_cache import bump_menu_version
+from .models import (
+    Ingredient,
+    Location,
+    MenuItem,
+    Purchase,
+    RecipeRequirement,
+    StockAlert,
+    StockMovement,
+)
+from .sales import record_sales, remove_sales
+from .stream import broker
+
+
+@receiver(pre_save, sender=Purchase)
+def remember_previous_purchase(sender, instance, **kwargs):
+    # Keep the stored row of an edited purchase so its rollup can be undone
+    instance._previous = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous = Purchase.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Purchase)
+def update_daily_sales(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if previous is not None:
+        remove_sales([previous])
+    record_sales([instance])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=RecipeRequirement)
+@receiver(post_delete, sender=RecipeRequirement)
+def clear_menu_availability(sender, instance, **kwargs):
+    invalidate_menu_availability([instance.location_id])
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def clear_menu_cache(sender, instance, **kwargs):
+    bump_menu_version(instance.location_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def mark_ingredient_costs_dirty(sender, instance, created, **kwargs):
+    if not created:
+        mark_costs_dirty(
+            instance.location_id,
+            RecipeRequirement.objects.filter(ingredient=instance).values_list(
+                'menu_item_id', flat=True
+            ),
+        )
+
+
+@receiver(post_save, sender=RecipeRequirement)
+@receiver(post_delete, sender=RecipeRequirement)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def mark_recipe_costs_dirty(sender, instance, **kwargs):
+    mark_costs_dirty(
+        instance.location_id,
+        [instance.pk if sender is MenuItem else instance.menu_item_id],
+    )
+
+
+@receiver(pre_save, sender=Ingredient)
+def remember_previous_stock(sender, instance, **kwargs):
+    # Keep the stored level and threshold to record the change in the
+    # ledger and tell if the save crosses the threshold
+    instance._previous_stock = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_stock = (
+            Ingredient.objects.filter(pk=instance.pk)
+            .values_list('available_quantity', 'reorder_threshold')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def record_stock_movement(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_stock', None)
+    previous_quantity = previous[0] if previous else 0
+    record_movements(
+        {instance.pk: instance.available_quantity - previous_quantity},
+        StockMovement.ADJUSTMENT,
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def queue_low_stock_alert(sender, instance, created, **kwargs):
+    if not stock_alerts_queued() or not is_low_stock(
+        instance.available_quantity, instance.reorder_threshold
+    ):
+        return
+    previous = getattr(instance, '_previous_stock', None)
+    if created or previous is None or not is_low_stock(*previous):
+        StockAlert.objects.create(
+            ingredient=instance,
+            available_quantity=instance.available_quantity,
+            reorder_threshold=instance.reorder_threshold,
+        )
+
+
+@receiver(post_delete, sender=Ingredient)
+def stream_ingredient_deletion(sender, instance, **kwargs):
+    # Deletions leave nothing in the ledger for the stock streams to read
+    location_id, ingredient_id = instance.location_id, instance.pk
+    transaction.on_commit(
+        lambda: broker.publish_deleted(location_id, [ingredient_id])
+    )
+
+
+@receiver(m2m_changed, sender=Location.members.through)
+def clear_memberships(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward changes pass the location and user ids, reverse ones
+    # (user.locations) the user
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        forget_memberships([instance.pk])
+    elif action == 'pre_clear':
+        forget_memberships(instance.members.values_list('pk', flat=True))
+    else:
+        forget_memberships(pk_set)
+
+
+@receiver(pre_delete, sender=Location)
+def clear_location_memberships(sender, instance, **kwargs):
+    forget_memberships(instance.members.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def clear_single_site(sender, instance, **kwargs):
+    forget_locations()
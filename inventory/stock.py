@@ -0,0 +1,247 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+from .alerts import queue_low_stock_alerts
+from .availability import invalidate_menu_availability
+from .ledger import record_movements
+from .models import (
+    DEFAULT_LOCATION_ID,
+    Ingredient,
+    RecipeRequirement,
+    StockMovement,
+)
+
+
+class InsufficientStockError(Exception):
+    """
+    Raised when an order needs more of an ingredient than is in stock
+    """
+
+    def __init__(self, ingredient_ids):
+        self.ingredient_ids = sorted(ingredient_ids)
+        super().__init__(
+            f'Insufficient stock for ingredients: {self.ingredient_ids}'
+        )
+
+
+def recipe_needs(menu_item_quantities):
+    """
+    Return the ingredient quantities needed to make the given menu items,
+    as a dict of ``{ingredient_id: quantity}``.
+
+    ``menu_item_quantities`` maps menu item ids to the number of servings.
+    All recipes are read with a single query.
+    """
+    needs = defaultdict(float)
+    requirements = RecipeRequirement.objects.filter(
+        menu_item_id__in=menu_item_quantities.keys()
+    ).values_list('menu_item_id', 'ingredient_id', 'quantity')
+    for menu_item_id, ingredient_id, quantity in requirements:
+        needs[ingredient_id] += quantity * menu_item_quantities[menu_item_id]
+    return {
+        ingredient_id: quantity
+        for ingredient_id, quantity in needs.items()
+        if quantity > 0
+    }
+
+
+def _per_ingredient(needs):
+    # CASE expression mapping every ingredient id to its needed quantity
+    return Case(
+        *[
+            When(pk=ingredient_id, then=Value(quantity))
+            for ingredient_id, quantity in needs.items()
+        ],
+        output_field=FloatField(),
+    )
+
+
+@transaction.atomic
+def deplete_stock(needs, location_id=DEFAULT_LOCATION_ID):
+    """
+    Deduct ``needs`` (``{ingredient_id: quantity}``) from the available
+    quantities of a location's ingredients with a single conditional UPDATE.
+
+    The UPDATE only touches rows that still hold enough stock, so the
+    check and the deduction are one atomic statement and concurrent
+    checkouts cannot oversell. If any ingredient runs short nothing is
+    deducted and ``InsufficientStockError`` is raised. The deductions are
+    appended to the stock ledger as purchase movements.
+    """
+    if not needs:
+        return
+
+    need = _per_ingredient(needs)
+    try:
+        with transaction.atomic():
+            updated = Ingredient.objects.filter(
+                location_id=location_id,
+                pk__in=needs.keys(),
+                available_quantity__gte=need,
+            ).update(available_quantity=F('available_quantity') - need)
+            if updated != len(needs):
+                # roll back the rows that did have enough stock
+                raise InsufficientStockError(())
+            record_movements(
+                {
+                    ingredient_id: -quantity
+                    for ingredient_id, quantity in needs.items()
+                },
+                StockMovement.PURCHASE,
+            )
+            queue_low_stock_alerts(needs.keys(), -need)
+            # update() sends no signals
+            invalidate_menu_availability([location_id])
+    except InsufficientStockError:
+        levels = dict(
+            Ingredient.objects.filter(
+                location_id=location_id, pk__in=needs.keys()
+            ).values_list('pk', 'available_quantity')
+        )
+        raise InsufficientStockError(
+            ingredient_id
+            for ingredient_id, quantity in needs.items()
+            # ingredients deleted in the meantime are short as well
+            if levels.get(ingredient_id, 0) < quantity
+        ) from None
+
+
+# Ingredients updated per UPDATE statement when adjusting stock
+ADJUST_BATCH_SIZE = 500
+
+
+def _short_ingredients(adjustments, location_id):
+    # Ingredients the adjustments would take below zero (or deleted ones)
+    levels = dict(
+        Ingredient.objects.filter(
+            location_id=location_id, pk__in=adjustments.keys()
+        ).values_list('pk', 'available_quantity')
+    )
+    return [
+        ingredient_id
+        for ingredient_id, (quantity, delta) in adjustments.items()
+        if ingredient_id not in levels
+        or (levels[ingredient_id] if quantity is None else quantity) + delta
+        < 0
+    ]
+
+
+@transaction.atomic
+def adjust_stock(
+    adjustments,
+    kind=StockMovement.ADJUSTMENT,
+    location_id=DEFAULT_LOCATION_ID,
+):
+    """
+    Apply ``adjustments`` (``{ingredient_id: (quantity, delta)}``) to the
+    available quantities of a location's ingredients and return the new
+    levels as ``{ingredient_id: level}``.
+
+    ``quantity`` is an absolute level, or ``None`` to keep the current one,
+    and ``delta`` is added on top of it. Relative changes are applied with
+    ``F()`` expressions, so they never lose deductions made by concurrent
+    purchases. Each chunk of ingredients is one conditional UPDATE that
+    only touches rows left non-negative; if any ingredient would go below
+    zero nothing is changed and ``InsufficientStockError`` is raised.
+
+    Every change is also appended to the stock ledger as a movement of
+    ``kind``.
+    """
+    if not adjustments:
+        return {}
+    if any(
+        quantity is not None and quantity + delta < 0
+        for quantity, delta in adjustments.values()
+    ):
+        raise InsufficientStockError(
+            _short_ingredients(adjustments, location_id)
+        )
+
+    ingredient_ids = list(adjustments)
+    try:
+        with transaction.atomic():
+            for start in range(0, len(ingredient_ids), ADJUST_BATCH_SIZE):
+                chunk = {
+                    ingredient_id: adjustments[ingredient_id]
+                    for ingredient_id in ingredient_ids[
+                        start : start + ADJUST_BATCH_SIZE
+                    ]
+                }
+                absolute = [
+                    ingredient_id
+                    for ingredient_id, (quantity, _) in chunk.items()
+                    if quantity is not None
+                ]
+                relative = {
+                    ingredient_id: delta
+                    for ingredient_id, (quantity, delta) in chunk.items()
+                    if quantity is None
+                }
+                condition = Q(pk__in=absolute)
+                if relative:
+                    # Relative rows must keep a non-negative level
+                    condition |= Q(
+                        pk__in=relative.keys(),
+                        available_quantity__gte=_per_ingredient(
+                            {
+                                ingredient_id: -delta
+                                for ingredient_id, delta in relative.items()
+                            }
+                        ),
+                    )
+                level = Case(
+                    *[
+                        When(
+                            pk=ingredient_id,
+                            then=Value(quantity + delta)
+                            if quantity is not None
+                            else F('available_quantity') + Value(delta),
+                        )
+                        for ingredient_id, (quantity, delta) in chunk.items()
+                    ],
+                    output_field=FloatField(),
+                )
+                changes = dict(relative)
+                if absolute:
+                    # Absolute levels only tell the change against the
+                    # current level, read under the write lock: a no-op
+                    # UPDATE takes it first, as SQLite ignores SELECT ...
+                    # FOR UPDATE and a purchase could commit a deduction
+                    # between the read and the write
+                    Ingredient.objects.filter(
+                        pk__in=absolute, location_id=location_id
+                    ).update(available_quantity=F('available_quantity'))
+                    changes.update(
+                        (ingredient_id, sum(chunk[ingredient_id]) - previous)
+                        for ingredient_id, previous in (
+                            Ingredient.objects.filter(
+                                pk__in=absolute
+                            ).values_list('pk', 'available_quantity')
+                        )
+                    )
+                updated = Ingredient.objects.filter(
+                    condition, location_id=location_id
+                ).update(available_quantity=level)
+                if updated != len(chunk):
+                    # roll back the chunks already applied
+                    raise InsufficientStockError(())
+                record_movements(changes, kind)
+                queue_low_stock_alerts(
+                    changes.keys(), _per_ingredient(changes)
+                )
+            # update() sends no signals
+            invalidate_menu_availability([location_id])
+    except InsufficientStockError:
+        raise InsufficientStockError(
+            _short_ingredients(adjustments, location_id)
+        ) from None
+
+    # The updated rows stay locked until commit, so these are the levels
+    # this transaction wrote
+    return dict(
+        Ingredient.objects.filter(pk__in=ingredient_ids).values_list(
+            'pk', 'available_quantity'
+        )
+    )
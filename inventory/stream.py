@@ -0,0 +1,271 @@
+"""
+Live stock levels for server-sent event streams.
+
+``stock_events`` yields the SSE messages of one stream: the current level
+of every ingredient of a location, then the levels of its ingredients that
+change, until the stream times out. Changes are fanned out by the process-wide
+``broker``.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import Max
+
+from .models import DEFAULT_LOCATION_ID, Ingredient, StockMovement
+from .versions import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two reads of the ledger; all changes made within one
+# interval are sent as one message
+STOCK_STREAM_INTERVAL = 1.0
+# Seconds without a change after which a keep-alive comment is sent, so
+# proxies do not close idle streams
+STOCK_STREAM_KEEPALIVE = 15.0
+# Longest a stream stays open; EventSource clients reconnect on their own
+STOCK_STREAM_MAX_SECONDS = 300
+# Reconnection delay suggested to clients, in milliseconds
+STOCK_STREAM_RETRY_MS = 2000
+
+# Incremented by every deletion; each deletion stores its location and
+# ingredient ids under its own number, read by the pollers of every process
+DELETIONS_VERSION_KEY = 'inventory:stock-deletions-version'
+DELETION_CACHE_KEY = 'inventory:stock-deletion:{number}'
+# Seconds a deletion stays readable; pollers read every interval
+DELETION_CACHE_TIMEOUT = 60
+# More deletions since the last read mean the counter was evicted and
+# restarted from the clock (see versions.get_version)
+DELETIONS_READ_LIMIT = 10000
+
+
+class Subscription:
+    """
+    Levels of a location waiting to be sent to one stream, merged by
+    ingredient
+    """
+
+    def __init__(self, location_id):
+        self.location_id = location_id
+        self.levels = {}
+        self.ready = asyncio.Event()
+
+    def push(self, levels):
+        # A slow stream gets the latest level of each ingredient, not a
+        # backlog of messages
+        self.levels.update(levels)
+        self.ready.set()
+
+    async def changes(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for changes and return them as
+        ``{ingredient_id: level}``, ``None`` for deleted ingredients
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.ready.clear()
+        levels, self.levels = self.levels, {}
+        return levels
+
+
+class StockBroker:
+    """
+    Fan-out of stock level changes to the streams served by this process.
+
+    While any stream is open, one poller task reads the movements appended
+    to the stock ledger since its last read, every
+    ``STOCK_STREAM_INTERVAL``, and pushes the current levels of the changed
+    ingredients to the streams of their location. Every stock change of
+    every process is in the ledger, so streams see changes made by other
+    workers too. A read is one index range scan plus one lookup of the
+    changed ingredients, whatever the number of streams or the size of the
+    burst, and each stream gets at most one message per interval.
+
+    Deleted ingredients lose their movements with them, so deletions are
+    recorded with ``publish_deleted`` in the shared cache, where the
+    pollers of every process read them along with the ledger.
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.task = None
+        self.last_movement = 0
+        self.last_deletion = 0
+        # Number of a deletion found missing on the last read
+        self._awaited_deletion = None
+
+    async def subscribe(self, location_id):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.get_loop() is not loop:
+            self.started = loop.create_future()
+            self.task = loop.create_task(self._poll())
+        # Only changes made after the poller started are streamed
+        await asyncio.shield(self.started)
+        subscription = Subscription(location_id)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.discard(subscription)
+        if not self.subscriptions and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def publish_deleted(self, location_id, ingredient_ids):
+        """
+        Stream the deletion of ``ingredient_ids`` of a location to the
+        streams of every process
+        """
+        number = bump_version(DELETIONS_VERSION_KEY)
+        cache.set(
+            DELETION_CACHE_KEY.format(number=number),
+            (location_id, list(ingredient_ids)),
+            timeout=DELETION_CACHE_TIMEOUT,
+        )
+
+    async def _poll(self):
+        try:
+            self.last_movement = (
+                await StockMovement.objects.aaggregate(last=Max('pk'))
+            )['last'] or 0
+            self.last_deletion = await sync_to_async(get_version)(
+                DELETIONS_VERSION_KEY
+            )
+            self._awaited_deletion = None
+        except Exception as e:
+            self.task = None
+            self.started.set_exception(e)
+            raise
+        self.started.set_result(None)
+
+        while True:
+            await asyncio.sleep(STOCK_STREAM_INTERVAL)
+            try:
+                levels = await self._changed_levels()
+            except DatabaseError:
+                # Retried on the next interval from the same movement
+                logger.exception('Reading stock changes failed')
+                continue
+            for subscription in self.subscriptions:
+                if subscription.location_id in levels:
+                    subscription.push(levels[subscription.location_id])
+
+    async def _changed_levels(self):
+        # Movement ids grow in commit order on SQLite, where writes are
+        # serialised; elsewhere a late commit is streamed with the next
+        # change of its ingredient
+        changed = [
+            row
+            async for row in StockMovement.objects.filter(
+                pk__gt=self.last_movement
+            )
+            .values('ingredient_id')
+            .annotate(last=Max('pk'))
+            .order_by()
+        ]
+        # {location_id: {ingredient_id: level}}
+        levels = defaultdict(dict)
+        if changed:
+            self.last_movement = max(row['last'] for row in changed)
+            async for ingredient_id, location_id, quantity in (
+                Ingredient.objects.filter(
+                    pk__in=[row['ingredient_id'] for row in changed]
+                ).values_list('pk', 'location_id', 'available_quantity')
+            ):
+                levels[location_id][ingredient_id] = quantity
+
+        for location_id, ingredient_ids in await sync_to_async(
+            self._deletions
+        )():
+            levels[location_id].update(dict.fromkeys(ingredient_ids))
+        return levels
+
+    def _deletions(self):
+        # The deletions recorded since the last read, as (location_id,
+        # ingredient_ids) pairs
+        last = get_version(DELETIONS_VERSION_KEY)
+        if last - self.last_deletion > DELETIONS_READ_LIMIT:
+            self.last_deletion = last
+            return []
+        numbers = range(self.last_deletion + 1, last + 1)
+        found = cache.get_many(
+            [DELETION_CACHE_KEY.format(number=number) for number in numbers]
+        )
+        deletions = []
+        for number in numbers:
+            deletion = found.get(DELETION_CACHE_KEY.format(number=number))
+            if deletion is None and number != self._awaited_deletion:
+                # Stored just after its number is taken: read again on the
+                # next interval, then taken as expired
+                self._awaited_deletion = number
+                break
+            self.last_deletion = number
+            if deletion is not None:
+                deletions.append(deletion)
+        return deletions
+
+
+broker = StockBroker()
+
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def _stock_levels(levels):
+    return [
+        {'id': ingredient_id, 'deleted': True}
+        if quantity is None
+        else {'id': ingredient_id, 'available_quantity': quantity}
+        for ingredient_id, quantity in sorted(levels.items())
+    ]
+
+
+async def stock_events(
+    timeout=STOCK_STREAM_MAX_SECONDS, location_id=DEFAULT_LOCATION_ID
+):
+    """
+    Yield the SSE messages of a location's stock stream open for
+    ``timeout`` seconds: a ``snapshot`` event with the level of every
+    ingredient, then a ``stock`` event with the levels that changed since
+    the last message.
+
+    A ``timeout`` of 0 only sends the snapshot.
+    """
+    # Subscribe before the snapshot is read so no change falls in between
+    subscription = await broker.subscribe(location_id) if timeout else None
+    try:
+        yield f'retry: {STOCK_STREAM_RETRY_MS}\n\n'
+        yield _event(
+            'snapshot',
+            _stock_levels(
+                {
+                    ingredient_id: quantity
+                    async for ingredient_id, quantity in (
+                        Ingredient.objects.filter(location_id=location_id)
+                        .order_by('pk')
+                        .values_list('pk', 'available_quantity')
+                    )
+                }
+            ),
+        )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            levels = await subscription.changes(
+                min(remaining, STOCK_STREAM_KEEPALIVE)
+            )
+            if levels:
+                yield _event('stock', _stock_levels(levels))
+            elif deadline - loop.time() > 0:
+                yield ': keep-alive\n\n'
+    finally:
+        if subscription is not None:
+            broker.unsubscribe(subscription)
@@ -1,10 +1,58 @@
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 from rest_framework.test import APIClient, APITestCase
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
-from .models import Ingredient, MenuItem, RecipeRequirement, Purchase
-from unittest import mock
-from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .benchmarks import (
+    CONCURRENCY_ROUTES,
+    CONNECTION_PROFILES,
+    CONNECTION_ROUTES,
+    SCENARIOS,
+    find_regressions,
+    run_benchmarks,
+    run_concurrency_benchmarks,
+    run_connection_benchmarks,
+    unbenchmarked_routes,
+)
+from . import availability
+from .archive import archive_cutoff
+from .bulk import upsert_recipe_requirements
+from .costing import compute_costs
+from .ledger import ledger_drift, take_snapshots
+from .models import (
+    ArchivedPurchase,
+    DEFAULT_LOCATION_ID,
+    Ingredient,
+    Location,
+    MenuItem,
+    RecipeRequirement,
+    Purchase,
+    DailySales,
+    PurchaseOrder,
+    StockAlert,
+    StockMovement,
+    StockSnapshot,
+)
+from .pagination import PurchaseKeysetPagination
+from .sales import delete_purchases, record_sales
+from .search import check_search_indexes, fts_query, search
+from .serializers import IngredientSerializer
+from .stock import deplete_stock
+from .stream import StockBroker, broker, stock_events
+from unittest import mock, skipUnless
+from datetime import date, datetime, timedelta
 
 
 class GetIngredientApiViewTestCase(APITestCase):
@@ -46,6 +94,385 @@ class GetIngredientApiViewTestCase(APITestCase):
         self.assertEqual(response.data['error'], 'No ingredients found')
 
 
+class IngredientAlertsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser15', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        today = timezone.localdate()
+        self.flour = Ingredient.objects.create(
+            name='Flour',
+            available_quantity=100,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=1.0,
+            reorder_threshold=50,
+            expiry_date=today + timedelta(days=30),
+        )
+        self.milk = Ingredient.objects.create(
+            name='Milk',
+            available_quantity=5,
+            measurement_unit=Ingredient.LITERS,
+            price_per_unit=2.0,
+            reorder_threshold=10,
+            expiry_date=today + timedelta(days=2),
+        )
+        self.bread = MenuItem.objects.create(item_name='Bread', price=4.00)
+        RecipeRequirement.objects.create(
+            menu_item=self.bread, ingredient=self.flour, quantity=30
+        )
+        # Milk was created below its threshold
+        self.milk_alert = StockAlert.objects.get()
+
+    def test_ingredient_alerts(self):
+        response = self.client.get(reverse('ingredient-alerts'), {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data['low_stock']],
+            ['Milk'],
+        )
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data['expiring']],
+            ['Milk'],
+        )
+
+        response = self.client.get(reverse('ingredient-alerts'), {'days': 60})
+        self.assertEqual(len(response.data['expiring']), 2)
+
+        response = self.client.get(reverse('ingredient-alerts'), {'days': -1})
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+    def test_alert_lists_use_indexes(self):
+        from .alerts import expiring_ingredients, low_stock_ingredients
+
+        self.assertIn(
+            'USING INDEX ingredient_low_stock_idx',
+            low_stock_ingredients().explain(),
+        )
+        self.assertIn('SEARCH', expiring_ingredients(7).explain())
+
+    def test_purchase_crossing_threshold_queues_alert(self):
+        alerts = StockAlert.objects.filter(ingredient=self.flour)
+        data = {
+            'menu_item': self.bread.id,
+            'quantity': 1,
+            'total_price': '4.00',
+        }
+        self.client.post(reverse('store-purchase'), data)  # 70 left
+        self.assertFalse(alerts.exists())
+        self.client.post(reverse('store-purchase'), data)  # 40 left
+        self.assertEqual(alerts.count(), 1)
+        self.assertEqual(alerts.get().available_quantity, 40)
+        self.client.post(reverse('store-purchase'), data)  # 10 left
+        # Already below the threshold, nothing new crossed
+        self.assertEqual(alerts.count(), 1)
+
+    def test_bulk_adjustment_crossing_threshold_queues_alert(self):
+        response = self.client.patch(
+            reverse('update-ingredients-bulk'),
+            [
+                {'id': self.flour.id, 'available_quantity': 20},
+                {'id': self.milk.id, 'delta': 100},
+            ],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(
+                StockAlert.objects.exclude(pk=self.milk_alert.pk).values_list(
+                    'ingredient__name', flat=True
+                )
+            ),
+            ['Flour'],
+        )
+
+    def test_stock_alerts_polling(self):
+        self.client.patch(
+            reverse('update-ingredient', args=[self.flour.id]),
+            {'available_quantity': 10},
+        )
+        response = self.client.get(reverse('stock-alerts'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [alert['ingredient_name'] for alert in response.data['results']],
+            ['Milk', 'Flour'],
+        )
+
+        response = self.client.get(
+            reverse('stock-alerts'), {'after': response.data['last_id']}
+        )
+        self.assertEqual(response.data['results'], [])
+
+    @override_settings(STOCK_ALERTS_QUEUE=False)
+    def test_queue_disabled(self):
+        self.client.patch(
+            reverse('update-ingredients-bulk'),
+            [{'id': self.flour.id, 'delta': -80}],
+            format='json',
+        )
+        self.assertEqual(StockAlert.objects.count(), 1)
+
+
+class StockLedgerTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser18', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.flour = Ingredient.objects.create(
+            name='Flour',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=0.01,
+        )
+        self.bread = MenuItem.objects.create(item_name='Bread', price=4.00)
+        RecipeRequirement.objects.create(
+            menu_item=self.bread, ingredient=self.flour, quantity=300
+        )
+
+    def movements(self):
+        return list(
+            StockMovement.objects.filter(ingredient=self.flour)
+            .order_by('pk')
+            .values_list('kind', 'quantity')
+        )
+
+    def stock(self, **params):
+        response = self.client.get(
+            reverse('ingredient-stock'),
+            dict(params, ingredient_id=self.flour.id),
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]['quantity']
+
+    def test_stock_changes_are_recorded(self):
+        self.client.post(
+            reverse('store-purchase'),
+            {'menu_item': self.bread.id, 'quantity': 2, 'total_price': '8.00'},
+        )
+        self.client.patch(
+            reverse('update-ingredients-bulk'),
+            {
+                'reason': StockMovement.DELIVERY,
+                'ingredients': [{'id': self.flour.id, 'delta': 500}],
+            },
+            format='json',
+        )
+        self.client.patch(
+            reverse('update-ingredients-bulk'),
+            {
+                'reason': StockMovement.WASTE,
+                'ingredients': [
+                    {'id': self.flour.id, 'available_quantity': 850}
+                ],
+            },
+            format='json',
+        )
+        self.client.patch(
+            reverse('update-ingredient', args=[self.flour.id]),
+            {'available_quantity': 1000},
+        )
+        self.assertEqual(
+            self.movements(),
+            [
+                (StockMovement.ADJUSTMENT, 1000),
+                (StockMovement.PURCHASE, -600),
+                (StockMovement.DELIVERY, 500),
+                (StockMovement.WASTE, -50),
+                (StockMovement.ADJUSTMENT, 150),
+            ],
+        )
+        self.assertEqual(self.stock(), 1000)
+
+        response = self.client.get(
+            reverse('ingredient-movements', args=[self.flour.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][0]['quantity'], 150)
+
+    def test_invalid_reason(self):
+        response = self.client.patch(
+            reverse('update-ingredients-bulk'),
+            {
+                'reason': StockMovement.PURCHASE,
+                'ingredients': [{'id': self.flour.id, 'delta': 1}],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_point_in_time_stock(self):
+        now = timezone.now()
+        StockMovement.objects.create(
+            ingredient=self.flour,
+            kind=StockMovement.WASTE,
+            quantity=-100,
+            created_at=now + timedelta(hours=1),
+        )
+        StockMovement.objects.create(
+            ingredient=self.flour,
+            kind=StockMovement.DELIVERY,
+            quantity=400,
+            created_at=now + timedelta(hours=2),
+        )
+        self.assertEqual(self.stock(at=now.isoformat()), 1000)
+        at = (now + timedelta(hours=1, minutes=30)).isoformat()
+        self.assertEqual(self.stock(at=at), 900)
+        at = (now + timedelta(hours=3)).isoformat()
+        self.assertEqual(self.stock(at=at), 1300)
+        at = (now - timedelta(days=1)).isoformat()
+        self.assertEqual(self.stock(at=at), 0)
+
+    def test_snapshots(self):
+        call_command('snapshot_stock', stdout=StringIO(), stderr=StringIO())
+        snapshot = StockSnapshot.objects.get(ingredient=self.flour)
+        self.assertEqual(snapshot.quantity, 1000)
+
+        # Movements before the snapshot are no longer read
+        StockMovement.objects.filter(ingredient=self.flour).delete()
+        self.assertEqual(self.stock(), 1000)
+
+    def test_existing_snapshots_are_not_counted(self):
+        taken_at = timezone.now()
+        self.assertEqual(take_snapshots(taken_at), 1)
+        self.assertEqual(take_snapshots(taken_at), 0)
+        self.assertEqual(StockSnapshot.objects.count(), 1)
+
+    def test_ledger_drift(self):
+        stderr = StringIO()
+        Ingredient.objects.filter(pk=self.flour.pk).update(
+            available_quantity=10
+        )
+        call_command('snapshot_stock', stdout=StringIO(), stderr=stderr)
+        self.assertIn('1 ingredients differ', stderr.getvalue())
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+    def test_stock_query_uses_ledger_index(self):
+        from .ledger import stock_at
+
+        plan = stock_at().explain()
+        self.assertIn('USING COVERING INDEX stock_movement_ledger_idx', plan)
+
+
+class StockStreamTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser20', password='testpass'
+        )
+        token = Token.objects.create(user=self.user)
+        self.headers = {
+            'authorization': 'Token ' + token.key,
+            'accept': 'text/event-stream',
+        }
+        self.flour = Ingredient.objects.create(
+            name='Flour',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=0.01,
+        )
+        self.salt = Ingredient.objects.create(
+            name='Salt',
+            available_quantity=50,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=0.01,
+        )
+
+    async def read_event(self, events):
+        # Next event of the stream, keep-alives and retry hints skipped
+        async for message in events:
+            if message.startswith('event: '):
+                name, data = message.splitlines()[:2]
+                return (
+                    name.split(': ', 1)[1],
+                    json.loads(data.split(': ', 1)[1]),
+                )
+
+    async def test_snapshot(self):
+        response = await self.async_client.get(
+            reverse('ingredient-stream'), {'timeout': 0}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        retry, snapshot = [part.decode() async for part in response]
+        self.assertEqual(retry, 'retry: 2000\n\n')
+        self.assertEqual(
+            snapshot.splitlines()[:2],
+            [
+                'event: snapshot',
+                'data: '
+                + json.dumps(
+                    [
+                        {'id': self.flour.id, 'available_quantity': 1000.0},
+                        {'id': self.salt.id, 'available_quantity': 50.0},
+                    ]
+                ),
+            ],
+        )
+
+    async def test_errors(self):
+        url = reverse('ingredient-stream')
+        response = await self.async_client.get(
+            url, headers={'accept': 'text/event-stream'}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        response = await self.async_client.get(
+            url, {'timeout': 3600}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('timeout', response.json())
+
+    def purchase_burst(self):
+        for _ in range(500):
+            deplete_stock({self.flour.id: 1})
+
+    def delete_flour(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flour.delete()
+
+    @mock.patch('inventory.stream.STOCK_STREAM_INTERVAL', 0.01)
+    async def test_changes_are_coalesced(self):
+        flour_id = self.flour.id
+        events = stock_events(timeout=60)
+        try:
+            name, _ = await self.read_event(events)
+            self.assertEqual(name, 'snapshot')
+
+            # 500 purchases make one message with the final level
+            await sync_to_async(self.purchase_burst)()
+            self.assertEqual(
+                await self.read_event(events),
+                ('stock', [{'id': flour_id, 'available_quantity': 500}]),
+            )
+            await sync_to_async(self.delete_flour)()
+            self.assertEqual(
+                await self.read_event(events),
+                ('stock', [{'id': flour_id, 'deleted': True}]),
+            )
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.read_event(events), 0.2)
+        finally:
+            await events.aclose()
+        # The poller stops with the last stream
+        self.assertIsNone(broker.task)
+
+    @mock.patch('inventory.stream.STOCK_STREAM_INTERVAL', 0.01)
+    async def test_deletions_by_other_workers_are_streamed(self):
+        events = stock_events(timeout=60)
+        try:
+            await self.read_event(events)
+            # The deleting worker has no stream of its own
+            StockBroker().publish_deleted(DEFAULT_LOCATION_ID, [self.salt.id])
+            self.assertEqual(
+                await self.read_event(events),
+                ('stock', [{'id': self.salt.id, 'deleted': True}]),
+            )
+        finally:
+            await events.aclose()
+
+
 class DeleteIngredientApiViewTests(APITestCase):
     def setUp(self):
         # Creating a test user and setting up the client to use this user.
@@ -164,6 +591,164 @@ class GetMenuItemApiViewTests(APITestCase):
         self.assertEqual(response.data['count'], 15)
 
 
+class GetMenuAvailabilityApiViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser11', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('menu-items-availability')
+        self.pancakes = MenuItem.objects.create(
+            item_name='Pancakes', price=5.00
+        )
+        self.water = MenuItem.objects.create(item_name='Water', price=1.00)
+        self.flour = Ingredient.objects.create(
+            name='Flour', available_quantity=1000, price_per_unit=0.01
+        )
+        self.eggs = Ingredient.objects.create(
+            name='Eggs', available_quantity=7, price_per_unit=0.2
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.pancakes, ingredient=self.flour, quantity=150
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.pancakes, ingredient=self.eggs, quantity=2
+        )
+
+    def servings(self, response):
+        return {row['name']: row['max_servings'] for row in response.data}
+
+    def test_max_servings(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Eggs limit pancakes to 3 servings; water needs no ingredients
+        self.assertEqual(
+            self.servings(response), {'Pancakes': 3, 'Water': None}
+        )
+
+    def test_cached_until_stock_changes(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        self.eggs.available_quantity = 1
+        self.eggs.save()
+        response = self.client.get(self.url, {'available': 'true'})
+        self.assertEqual(self.servings(response), {'Water': None})
+
+    def test_purchase_invalidates_cache(self):
+        self.client.get(self.url)
+        self.client.post(
+            reverse('store-purchases-bulk'),
+            [{'menu_item': self.pancakes.id, 'quantity': 2}],
+            format='json',
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(self.servings(response)['Pancakes'], 1)
+
+    def test_copy_computed_before_a_change_is_not_served(self):
+        # A request computes the availability, then a stock change commits
+        # before it stores its (now stale) copy
+        compute = availability.compute_menu_availability
+
+        def compute_then_change(location_id):
+            computed = compute(location_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.eggs.available_quantity = 1
+                self.eggs.save()
+            return computed
+
+        with mock.patch.object(
+            availability,
+            'compute_menu_availability',
+            side_effect=compute_then_change,
+        ):
+            self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(self.servings(response)['Pancakes'], 0)
+
+
+class GetMenuCostingApiViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser12', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('menu-items-costing')
+        self.omelette = MenuItem.objects.create(
+            item_name='Omelette', price=6.00
+        )
+        self.toast = MenuItem.objects.create(item_name='Toast', price=2.00)
+        self.eggs = Ingredient.objects.create(
+            name='Eggs', available_quantity=100, price_per_unit=0.25
+        )
+        self.cheese = Ingredient.objects.create(
+            name='Cheese', available_quantity=100, price_per_unit=1.10
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.omelette, ingredient=self.eggs, quantity=3
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.omelette, ingredient=self.cheese, quantity=0.5
+        )
+
+    def costing(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return {row['name']: row for row in response.data}
+
+    def test_cost_and_margin(self):
+        costing = self.costing()
+        self.assertEqual(costing['Omelette']['cost'], '1.30')
+        self.assertEqual(costing['Omelette']['margin'], '4.70')
+        self.assertEqual(costing['Omelette']['margin_percent'], 78.33)
+        self.assertEqual(costing['Toast']['cost'], '0.00')
+
+    def test_warm_costing_runs_no_queries(self):
+        self.costing()
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_price_change_recomputes_touched_items(self):
+        self.costing()
+        self.cheese.price_per_unit = 2.10
+        self.cheese.save()
+        with CaptureQueriesContext(connection) as queries:
+            costing = self.costing()
+        self.assertEqual(costing['Omelette']['cost'], '1.80')
+        # only the omelette is recomputed
+        self.assertEqual(len(queries), 1)
+        self.assertIn('IN (%s)' % self.omelette.id, queries[0]['sql'])
+
+    def test_recipe_change_recomputes_cost(self):
+        self.costing()
+        RecipeRequirement.objects.create(
+            menu_item=self.toast, ingredient=self.cheese, quantity=1
+        )
+        self.assertEqual(self.costing()['Toast']['cost'], '1.10')
+
+    def test_change_during_recomputation_is_not_lost(self):
+        self.costing()
+        self.cheese.price_per_unit = 2.10
+        self.cheese.save()
+        # The toast's recipe changes while the omelette is recomputed
+        def compute_then_change(location_id, menu_item_ids=None):
+            computed = compute_costs(location_id, menu_item_ids)
+            with self.captureOnCommitCallbacks(execute=True):
+                RecipeRequirement.objects.create(
+                    menu_item=self.toast, ingredient=self.eggs, quantity=2
+                )
+            return computed
+
+        with mock.patch(
+            'inventory.costing.compute_costs', side_effect=compute_then_change
+        ):
+            self.assertEqual(self.costing()['Omelette']['cost'], '1.80')
+        self.assertEqual(self.costing()['Toast']['cost'], '0.50')
+
+
 class StoreMenuItemApiViewTests(APITestCase):
     def setUp(self):
         self.url = reverse(
@@ -354,6 +939,99 @@ class StoreRecipeRequirementApiViewTest(APITestCase):
         self.assertEqual(response.status_code, 401)
 
 
+class StoreRecipeRequirementsBulkApiViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser13', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('store-reciperequirements-bulk')
+        self.menu_item = MenuItem.objects.create(
+            item_name='Curry', price=11.00
+        )
+        self.rice = Ingredient.objects.create(
+            name='Rice', available_quantity=1000, price_per_unit=0.01
+        )
+        self.chicken = Ingredient.objects.create(
+            name='Chicken', available_quantity=1000, price_per_unit=0.02
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.menu_item, ingredient=self.rice, quantity=100
+        )
+
+    def test_upsert_recipe_requirements(self):
+        data = [
+            {
+                'menu_item': self.menu_item.id,
+                'ingredient': self.rice.id,
+                'quantity': 150,
+            },
+            {
+                'menu_item': self.menu_item.id,
+                'ingredient': self.chicken.id,
+                'quantity': 120,
+            },
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            dict(
+                RecipeRequirement.objects.values_list(
+                    'ingredient__name', 'quantity'
+                )
+            ),
+            {'Rice': 150, 'Chicken': 120},
+        )
+
+    def test_invalid_reference_rejects_import(self):
+        data = [
+            {
+                'menu_item': self.menu_item.id,
+                'ingredient': self.chicken.id,
+                'quantity': 120,
+            },
+            {'menu_item': 9999, 'ingredient': self.rice.id, 'quantity': 1},
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertIn('menu_item', response.data['errors'][0]['errors'])
+        self.assertEqual(RecipeRequirement.objects.count(), 1)
+
+    def test_references_are_checked_in_the_import_transaction(self):
+        rows = [
+            {
+                'menu_item': self.menu_item.id,
+                'ingredient': self.chicken.id,
+                'quantity': 120,
+            }
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(upsert_recipe_requirements(rows), [])
+        statements = [query['sql'] for query in queries]
+        self.assertTrue(statements[0].startswith('SAVEPOINT'))
+        self.assertIn('"inventory_menuitem"', statements[1])
+        self.assertTrue(statements[-1].startswith('RELEASE SAVEPOINT'))
+
+    def test_import_recipes_command(self):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False
+        ) as f:
+            f.write('menu_item,ingredient,quantity\n')
+            f.write(f'{self.menu_item.id},{self.chicken.id},80\n')
+        self.addCleanup(os.remove, f.name)
+        stderr = StringIO()
+        call_command(
+            'import_recipes', f.name, stdout=mock.MagicMock(), stderr=stderr
+        )
+        self.assertEqual(
+            RecipeRequirement.objects.get(ingredient=self.chicken).quantity,
+            80,
+        )
+        # The test cache is local to the process
+        self.assertIn('The cache is local to this process', stderr.getvalue())
+
+
 class StorePurchaseApiViewTestCase(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -409,6 +1087,60 @@ class StorePurchaseApiViewTestCase(APITestCase):
         response = self.client.post(self.url, data)
         self.assertEqual(response.status_code, 400)
 
+    def test_purchase_depletes_ingredients(self):
+        """Test a purchase deducts its recipe ingredients from stock."""
+        flour = Ingredient.objects.create(
+            name='Flour', available_quantity=100, price_per_unit=0.5
+        )
+        eggs = Ingredient.objects.create(
+            name='Eggs', available_quantity=10, price_per_unit=0.2
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.menu_item, ingredient=flour, quantity=20
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.menu_item, ingredient=eggs, quantity=2
+        )
+        data = {
+            'menu_item': self.menu_item.id,
+            'customer_name': 'John Doe',
+            'quantity': 3,
+            'total_price': 30,
+        }
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 201)
+        flour.refresh_from_db()
+        eggs.refresh_from_db()
+        self.assertEqual(flour.available_quantity, 40)
+        self.assertEqual(eggs.available_quantity, 4)
+
+    def test_insufficient_stock(self):
+        """Test an order is rejected when any ingredient runs short."""
+        flour = Ingredient.objects.create(
+            name='Flour', available_quantity=100, price_per_unit=0.5
+        )
+        eggs = Ingredient.objects.create(
+            name='Eggs', available_quantity=3, price_per_unit=0.2
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.menu_item, ingredient=flour, quantity=20
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.menu_item, ingredient=eggs, quantity=2
+        )
+        data = {
+            'menu_item': self.menu_item.id,
+            'customer_name': 'John Doe',
+            'quantity': 2,
+            'total_price': 20,
+        }
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['ingredients'], [eggs.id])
+        self.assertEqual(Purchase.objects.count(), 0)
+        flour.refresh_from_db()
+        self.assertEqual(flour.available_quantity, 100)
+
     def test_unauthenticated_request(self):
         """Test request without authentication."""
         self.client.credentials()  # Remove credentials
@@ -421,6 +1153,277 @@ class StorePurchaseApiViewTestCase(APITestCase):
         self.assertEqual(response.status_code, 401)
 
 
+class StorePurchasesBulkApiViewTestCase(APITestCase):
+    def setUp(self):
+        self.url = reverse('store-purchases-bulk')
+        self.user = User.objects.create_user(
+            username='testuser5b', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.burger = MenuItem.objects.create(item_name='Burger', price=8.50)
+        self.salad = MenuItem.objects.create(item_name='Salad', price=6.00)
+        self.buns = Ingredient.objects.create(
+            name='Buns', available_quantity=5, price_per_unit=0.3
+        )
+        RecipeRequirement.objects.create(
+            menu_item=self.burger, ingredient=self.buns, quantity=1
+        )
+
+    def test_store_purchases(self):
+        data = {
+            'purchases': [
+                {'menu_item': self.burger.id, 'quantity': 2},
+                {'menu_item': self.salad.id, 'quantity': 1},
+                {'menu_item': 9999, 'quantity': 1},
+                {'menu_item': self.salad.id, 'quantity': 0},
+            ]
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        results = response.data['results']
+        self.assertEqual(results[0]['total_price'], '17.00')
+        self.assertEqual(results[1]['total_price'], '6.00')
+        self.assertIn('menu_item', results[2]['errors'])
+        self.assertIn('quantity', results[3]['errors'])
+        self.assertEqual(Purchase.objects.count(), 2)
+        self.buns.refresh_from_db()
+        self.assertEqual(self.buns.available_quantity, 3)
+
+    def test_rows_beyond_stock_are_rejected(self):
+        data = [
+            {'menu_item': self.burger.id, 'quantity': 3},
+            {'menu_item': self.burger.id, 'quantity': 3},
+            {'menu_item': self.burger.id, 'quantity': 2},
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        statuses = [row['status'] for row in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'created'])
+        self.buns.refresh_from_db()
+        self.assertEqual(self.buns.available_quantity, 0)
+
+    def test_rows_are_validated_like_the_serializer(self):
+        data = [
+            {
+                'menu_item': self.salad.id,
+                'purchase_date': '2024-05-01T23:30:00+02:00',
+                'customer_name': '  Ann  ',
+                'quantity': 1,
+            },
+            # Coerced by the serializer
+            {
+                'menu_item': str(self.salad.id),
+                'purchase_date': '2024-05-01T12:00:00',
+                'quantity': '2',
+            },
+            {'menu_item': self.salad.id, 'quantity': True},
+            {
+                'menu_item': self.salad.id,
+                'purchase_date': '2024-13-01T12:00:00Z',
+                'quantity': 1,
+            },
+            {
+                'menu_item': self.salad.id,
+                'customer_name': 'x' * 256,
+                'quantity': 1,
+            },
+            'not a row',
+            # Valid JSON the database cannot store
+            {
+                'menu_item': self.salad.id,
+                'customer_name': '\ud800',
+                'quantity': 1,
+            },
+        ]
+        # Sent escaped, as the renderer cannot encode the surrogate
+        response = self.client.post(
+            self.url, json.dumps(data), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        results = response.data['results']
+        self.assertEqual(
+            [row['status'] for row in results],
+            ['created', 'created'] + ['error'] * 5,
+        )
+        self.assertIn('quantity', results[2]['errors'])
+        self.assertIn('purchase_date', results[3]['errors'])
+        self.assertIn('customer_name', results[4]['errors'])
+        self.assertIn('non_field_errors', results[5]['errors'])
+        self.assertIn('customer_name', results[6]['errors'])
+        first, second = Purchase.objects.order_by('pk')
+        self.assertEqual(first.customer_name, 'Ann')
+        self.assertEqual(
+            first.purchase_date.isoformat(), '2024-05-01T21:30:00+00:00'
+        )
+        self.assertEqual(second.quantity, 2)
+        self.assertEqual(
+            second.purchase_date.isoformat(), '2024-05-01T12:00:00+00:00'
+        )
+
+    def test_invalid_payload(self):
+        response = self.client.post(self.url, {'purchases': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unauthenticated_request(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(
+            self.url,
+            [{'menu_item': self.salad.id, 'quantity': 1}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class UpdateIngredientsBulkApiViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser14', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('update-ingredients-bulk')
+        self.flour = Ingredient.objects.create(
+            name='Flour',
+            available_quantity=100.0,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=1.0,
+        )
+        self.milk = Ingredient.objects.create(
+            name='Milk',
+            available_quantity=10.0,
+            measurement_unit=Ingredient.LITERS,
+            price_per_unit=2.0,
+        )
+
+    def levels(self):
+        return dict(
+            Ingredient.objects.values_list('name', 'available_quantity')
+        )
+
+    def test_absolute_and_relative_updates(self):
+        data = [
+            {'id': self.flour.id, 'delta': 50},
+            {'name': 'Milk', 'available_quantity': 40},
+            {'name': 'Milk', 'delta': -5},
+            {
+                'name': 'Eggs',
+                'available_quantity': 12,
+                'measurement_unit': Ingredient.PIECES,
+                'price_per_unit': '0.30',
+            },
+        ]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(
+            {
+                ingredient['name']: ingredient['available_quantity']
+                for ingredient in response.data['ingredients']
+            },
+            {'Flour': 150, 'Milk': 35, 'Eggs': 12},
+        )
+        self.assertEqual(self.levels(), {'Flour': 150, 'Milk': 35, 'Eggs': 12})
+
+    def test_delta_keeps_concurrent_deductions(self):
+        # A purchase deducting stock after the client read its levels
+        Ingredient.objects.filter(pk=self.flour.pk).update(
+            available_quantity=70
+        )
+        response = self.client.patch(
+            self.url, [{'id': self.flour.id, 'delta': 30}], format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.levels()['Flour'], 100)
+
+    def test_absolute_levels_are_read_under_the_write_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                self.url,
+                [{'id': self.flour.id, 'available_quantity': 40}],
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in queries]
+        lock = next(
+            index
+            for index, sql in enumerate(statements)
+            if sql.startswith('UPDATE "inventory_ingredient"')
+        )
+        read = next(
+            index
+            for index, sql in enumerate(statements)
+            if sql.startswith(
+                'SELECT "inventory_ingredient"."id", '
+                '"inventory_ingredient"."available_quantity"'
+            )
+        )
+        self.assertLess(lock, read)
+        self.assertEqual(
+            StockMovement.objects.filter(ingredient=self.flour)
+            .latest('pk')
+            .quantity,
+            -60,
+        )
+
+    def test_negative_stock_rejects_batch(self):
+        data = [
+            {'id': self.flour.id, 'delta': 10},
+            {'id': self.milk.id, 'delta': -11},
+        ]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['ingredients'], [self.milk.id])
+        self.assertEqual(self.levels(), {'Flour': 100, 'Milk': 10})
+
+    def test_invalid_rows_reject_batch(self):
+        data = [
+            {'id': self.flour.id, 'delta': 10},
+            {'name': 'Unknown', 'delta': 1},
+            {'id': self.milk.id, 'available_quantity': 1, 'delta': 1},
+        ]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [error['index'] for error in response.data['errors']], [1, 2]
+        )
+        self.assertEqual(self.levels(), {'Flour': 100, 'Milk': 10})
+
+    def test_constant_query_count(self):
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'Spice {i}',
+                available_quantity=1,
+                measurement_unit=Ingredient.GRAMS,
+                price_per_unit=1.0,
+            )
+            for i in range(50)
+        )
+        data = [
+            {'id': ingredient.id, 'delta': 1} for ingredient in ingredients
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        updates = [
+            query
+            for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        # One lookup, one UPDATE, one ledger INSERT, one check for crossed
+        # reorder thresholds and one read of the new levels
+        self.assertEqual(len(updates), 1)
+        self.assertLessEqual(len(queries), 11)
+
+    def test_unauthenticated_user(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.patch(
+            self.url, [{'id': self.flour.id, 'delta': 1}], format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
 class UpdateIngredientApiViewTest(APITestCase):
     def setUp(self):
         # Create a user
@@ -487,6 +1490,52 @@ class UpdateIngredientApiViewTest(APITestCase):
             response.data['price_per_unit'], str(original_price)
         )  # Ensure other fields remain unchanged
 
+    def patch_after_a_purchase(self, data):
+        # A purchase deducts stock after the view read the ingredient
+        def deduct(attrs):
+            deplete_stock({self.ingredient.id: 30})
+            return attrs
+
+        with mock.patch.object(
+            IngredientSerializer, 'validate', side_effect=deduct
+        ):
+            return self.client.patch(self.url, data)
+
+    def test_update_keeps_concurrent_deductions(self):
+        response = self.patch_after_a_purchase({'name': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['available_quantity'], 70)
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.ingredient.available_quantity, 70)
+        self.assertFalse(ledger_drift().exists())
+
+    def test_stock_level_change_is_recorded_against_the_locked_level(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'available_quantity': 50})
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in queries]
+        lock = next(
+            index
+            for index, sql in enumerate(statements)
+            if sql.startswith('UPDATE "inventory_ingredient"')
+        )
+        read = next(
+            index
+            for index, sql in enumerate(statements)
+            if sql.startswith(
+                'SELECT "inventory_ingredient"."id", '
+                '"inventory_ingredient"."available_quantity"'
+            )
+        )
+        self.assertLess(lock, read)
+        self.assertEqual(
+            StockMovement.objects.filter(ingredient=self.ingredient)
+            .latest('pk')
+            .quantity,
+            -50,
+        )
+        self.assertFalse(ledger_drift().exists())
+
 
 class GetMenuItemsApiViewTestCase(APITestCase):
     @classmethod
@@ -530,7 +1579,61 @@ class GetMenuItemsApiViewTestCase(APITestCase):
         )  # Check if paginated response structure is used
 
 
-class GetPurchasesApiViewTest(APITestCase):
+class MenuCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        MenuItem.objects.create(item_name='Chicken Wrap', price=9.00)
+        MenuItem.objects.create(item_name='Veggie Wrap', price=8.00)
+        self.url = reverse('get-menu-items')
+
+    def test_warm_cache_only_reads_the_menu_version(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_variants_are_cached_separately(self):
+        response = self.client.get(self.url)
+        searched = self.client.get(self.url, {'search': 'Chicken'})
+        self.assertEqual(len(searched.data['results']), 1)
+        self.assertNotEqual(response['ETag'], searched['ETag'])
+
+    def test_menu_change_invalidates_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        MenuItem.objects.create(item_name='Fish Wrap', price=10.00)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_change_in_another_process_invalidates_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another worker, with a cache of its own, changes the menu
+        with override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                    'LocMemCache',
+                    'LOCATION': 'other-worker',
+                }
+            }
+        ):
+            MenuItem.objects.create(item_name='Fish Wrap', price=10.00)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class GetPurchasesApiViewTest(APITestCase):
     def setUp(self):
         # Setting up data for the tests
         self.user = User.objects.create_user(
@@ -588,3 +1691,983 @@ class GetPurchasesApiViewTest(APITestCase):
         self.assertIn(
             'count', response.data
         )  # Checking if pagination structure exists
+
+
+class PurchaseKeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser9', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.item = MenuItem.objects.create(item_name='Soup', price=4.00)
+        self.start = timezone.make_aware(datetime(2023, 9, 1))
+        # Purchases sharing a timestamp must still be paged exactly once
+        for minutes in range(25):
+            Purchase.objects.create(
+                menu_item=self.item,
+                quantity=1,
+                purchase_date=self.start + timedelta(minutes=minutes // 2),
+            )
+
+    def test_pages_through_all_purchases(self):
+        seen = []
+        url = reverse('get-purchases') + '?pagination=keyset'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(
+                row['purchase_date'] for row in response.data['results']
+            )
+            url = response.data['next']
+            if len(seen) == 10:
+                # Purchases inserted while paging do not shift later pages
+                Purchase.objects.create(
+                    menu_item=self.item,
+                    quantity=1,
+                    purchase_date=self.start - timedelta(days=1),
+                )
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('get-purchases'), {'pagination': 'keyset'}
+            )
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertFalse(
+            any('COUNT' in query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('get-purchases'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncListingApiViewTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser_async', password='testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for i in range(12):
+            Ingredient.objects.create(
+                name=f'Ingredient {i}',
+                available_quantity=i,
+                measurement_unit=Ingredient.GRAMS,
+                price_per_unit=1.00,
+            )
+        self.soup = MenuItem.objects.create(item_name='Chicken Soup', price=5)
+        MenuItem.objects.create(item_name='Veggie Salad', price=7.49)
+        MenuItem.objects.create(item_name='Chicken Salad', price=8.99)
+        start = timezone.make_aware(datetime(2023, 9, 1))
+        for minutes in range(15):
+            Purchase.objects.create(
+                menu_item=self.soup,
+                quantity=1,
+                customer_name=f'Customer {minutes % 3}',
+                purchase_date=start + timedelta(minutes=minutes),
+            )
+
+    def assertSameResults(self, url_name, params=None):
+        # The async route answers like its sync counterpart
+        expected = self.client.get(reverse(url_name), params)
+        response = self.client.get(reverse(f'async-{url_name}'), params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.data['results'], expected.data['results'])
+        self.assertEqual(
+            response.data.get('count'), expected.data.get('count')
+        )
+        return response
+
+    def test_same_results_as_sync_views(self):
+        response = self.assertSameResults('ingredient-list', {'page': 2})
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('/api/async/ingredients/', response.data['previous'])
+        self.assertSameResults('menu-items-list')
+        self.assertSameResults(
+            'get-menu-items', {'search': 'Chicken', 'ordering': 'price'}
+        )
+        self.assertSameResults('get-purchases', {'ordering': 'purchase_date'})
+        self.assertSameResults(
+            'get-purchases',
+            {
+                'customer_name': 'Customer 1',
+                'date_from': '2023-09-01T00:00:00Z',
+                'date_to': '2023-09-01T00:10:00Z',
+            },
+        )
+
+    def test_keyset_pagination(self):
+        seen = []
+        url = reverse('async-get-purchases') + '?pagination=keyset'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(
+                row['purchase_date'] for row in response.data['results']
+            )
+            url = response.data['next']
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_invalid_page(self):
+        response = self.client.get(
+            reverse('async-ingredient-list'), {'page': 3}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_ingredients(self):
+        Ingredient.objects.all().delete()
+        response = self.client.get(reverse('async-ingredient-list'))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {'error': 'No ingredients found'})
+
+    def test_ingredient_list_queries(self):
+        # Token lookup, (then cached) memberships and single-site check,
+        # count and page; no separate existence check
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('async-ingredient-list'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_menu_cache(self):
+        url = reverse('async-get-menu-items')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        MenuItem.objects.create(item_name='Fish Wrap', price=10.00)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_permissions(self):
+        self.client.credentials()
+        for url_name in (
+            'async-ingredient-list',
+            'async-menu-items-list',
+            'async-get-purchases',
+        ):
+            response = self.client.get(reverse(url_name))
+            self.assertEqual(response.status_code, 401)
+        # The menu listing is public, like its sync counterpart
+        response = self.client.get(reverse('async-get-menu-items'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_method_not_allowed(self):
+        response = self.client.post(reverse('async-ingredient-list'), {})
+        self.assertEqual(response.status_code, 405)
+
+
+class ExportPurchasesApiViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser10', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.item = MenuItem.objects.create(item_name='Tacos', price=3.50)
+        Purchase.objects.create(
+            menu_item=self.item, customer_name='John Doe', quantity=2
+        )
+        Purchase.objects.create(
+            menu_item=self.item, customer_name='Jane Doe', quantity=1
+        )
+        self.url = reverse('export-purchases')
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.url, {'customer_name': 'jane'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row['customer_name'], 'Jane Doe')
+        self.assertEqual(row['menu_item'], self.item.id)
+        self.assertEqual(row['total_price'], '3.50')
+
+    def test_export_csv(self):
+        response = self.client.get(self.url, {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0],
+            'id,menu_item,purchase_date,customer_name,quantity,total_price',
+        )
+        self.assertEqual(len(lines), 3)
+
+    def test_unsupported_output(self):
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unauthenticated_request(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+
+class PurchaseArchiveTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(
+            username='testuser11', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.item = MenuItem.objects.create(item_name='Ramen', price=9.00)
+        self.now = timezone.now()
+        self.old = Purchase.objects.create(
+            menu_item=self.item,
+            customer_name='Old Customer',
+            quantity=1,
+            purchase_date=self.now - timedelta(days=500),
+        )
+        self.recent = Purchase.objects.create(
+            menu_item=self.item,
+            customer_name='New Customer',
+            quantity=2,
+            purchase_date=self.now - timedelta(days=1),
+        )
+        out = StringIO()
+        call_command('archive_purchases', months=12, stdout=out)
+        self.assertIn('Archived 1 purchases', out.getvalue())
+
+    def test_archive_cutoff(self):
+        self.assertEqual(
+            archive_cutoff(2, today=date(2024, 3, 15)).date(),
+            date(2024, 1, 1),
+        )
+        self.assertEqual(
+            archive_cutoff(3, today=date(2024, 3, 15)).date(),
+            date(2023, 12, 1),
+        )
+
+    def test_old_purchases_are_moved(self):
+        self.assertEqual(
+            list(Purchase.objects.values_list('pk', flat=True)),
+            [self.recent.pk],
+        )
+        archived = ArchivedPurchase.objects.get()
+        self.assertEqual(archived.pk, self.old.pk)
+        self.assertEqual(archived.total_price, self.old.total_price)
+        # Archived purchases stay in the rollup, also when it is rebuilt
+        self.assertEqual(DailySales.objects.filter(quantity=1).count(), 1)
+        call_command('rebuild_daily_sales', stdout=StringIO())
+        self.assertEqual(DailySales.objects.filter(quantity=1).count(), 1)
+
+    def test_listing_reads_both_tables(self):
+        response = self.client.get(reverse('get-purchases'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(
+            reverse('get-purchases'),
+            {
+                'date_from': (self.now - timedelta(days=600)).isoformat(),
+                'date_to': (self.now - timedelta(days=400)).isoformat(),
+            },
+        )
+        self.assertEqual(
+            [row['customer_name'] for row in response.data['results']],
+            ['Old Customer'],
+        )
+
+    def test_recent_range_only_reads_the_archive_end(self):
+        params = {
+            'date_from': (self.now - timedelta(days=7)).isoformat(),
+            'date_to': self.now.isoformat(),
+        }
+        self.client.get(reverse('get-purchases'), params)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get-purchases'), params)
+        self.assertEqual(response.data['count'], 1)
+        archive_queries = [
+            query['sql']
+            for query in queries
+            if ArchivedPurchase._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(archive_queries), 1)
+        self.assertIn('MAX(', archive_queries[0])
+
+    def test_archiving_in_another_process_is_listed(self):
+        ArchivedPurchase.objects.all().delete()
+        Purchase.objects.create(
+            menu_item=self.item,
+            customer_name='Older Customer',
+            quantity=1,
+            purchase_date=self.now - timedelta(days=450),
+        )
+        self.assertEqual(
+            self.client.get(reverse('get-purchases')).data['count'], 2
+        )
+        # The archive command runs in a process with a cache of its own
+        with override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                    'LocMemCache',
+                    'LOCATION': 'archive-command',
+                }
+            }
+        ):
+            call_command('archive_purchases', months=12, stdout=StringIO())
+        self.assertEqual(Purchase.objects.count(), 1)
+        response = self.client.get(reverse('get-purchases'))
+        self.assertEqual(response.data['count'], 2)
+
+    def test_purchases_committed_during_a_batch_are_not_lost(self):
+        late = Purchase.objects.create(
+            menu_item=self.item,
+            quantity=1,
+            purchase_date=self.now - timedelta(days=450),
+        )
+        Purchase.objects.create(
+            menu_item=self.item,
+            quantity=1,
+            purchase_date=self.now - timedelta(days=450),
+        )
+        late_pk = late.pk
+        late.delete()
+        bulk_create = ArchivedPurchase.objects.bulk_create
+
+        def copy_then_commit_late_purchase(objs):
+            archived = bulk_create(objs)
+            if not Purchase.objects.filter(pk=late_pk).exists():
+                # A replayed purchase holding a lower id commits between
+                # the copy and the delete
+                Purchase.objects.create(
+                    pk=late_pk,
+                    menu_item=self.item,
+                    quantity=1,
+                    purchase_date=self.now - timedelta(days=450),
+                )
+            return archived
+
+        with mock.patch.object(
+            ArchivedPurchase.objects,
+            'bulk_create',
+            side_effect=copy_then_commit_late_purchase,
+        ):
+            call_command('archive_purchases', months=12, stdout=StringIO())
+        self.assertTrue(ArchivedPurchase.objects.filter(pk=late_pk).exists())
+        self.assertEqual(
+            list(Purchase.objects.values_list('pk', flat=True)),
+            [self.recent.pk],
+        )
+
+    def test_keyset_pages_span_both_tables(self):
+        seen = []
+        url = reverse('get-purchases') + '?pagination=keyset'
+        with mock.patch.object(PurchaseKeysetPagination, 'page_size', 1):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                seen.extend(
+                    row['customer_name'] for row in response.data['results']
+                )
+                url = response.data['next']
+        self.assertEqual(seen, ['Old Customer', 'New Customer'])
+
+    def test_export_and_async_listing_read_both_tables(self):
+        response = self.client.get(reverse('export-purchases'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+        response = self.client.get(reverse('async-get-purchases'))
+        self.assertEqual(response.data['count'], 2)
+
+
+class SearchIndexTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(
+            username='testuser12', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.item = MenuItem.objects.create(item_name='Noodles', price=5.00)
+        for name in ['Jane', 'Janet Jones', 'John Doe']:
+            Purchase.objects.create(
+                menu_item=self.item, customer_name=name, quantity=1
+            )
+
+    def test_fts_query_quotes_terms(self):
+        self.assertEqual(fts_query(['ja"ne', 'doe']), '"ja""ne" "doe"')
+
+    def test_missing_triggers_are_reported(self):
+        self.assertEqual(check_search_indexes(None, databases=['default']), [])
+        # As a migration rebuilding the table would leave it
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER inventory_purchase_search_update')
+        errors = check_search_indexes(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['inventory.E001'])
+        self.assertIn('inventory_purchase_search_update', errors[0].msg)
+
+    def test_purchases_are_searched_through_the_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('get-purchases'), {'customer_name': 'JAN'}
+            )
+        self.assertEqual(response.status_code, 200)
+        # The closest match comes first
+        self.assertEqual(
+            [row['customer_name'] for row in response.data['results']],
+            ['Jane', 'Janet Jones'],
+        )
+        if connection.Database.sqlite_version_info >= (3, 34):
+            self.assertTrue(any('MATCH' in query['sql'] for query in queries))
+
+    def test_short_terms_fall_back_to_a_scan(self):
+        response = self.client.get(
+            reverse('get-purchases'), {'customer_name': 'do'}
+        )
+        self.assertEqual(
+            [row['customer_name'] for row in response.data['results']],
+            ['John Doe'],
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        purchase = Purchase.objects.get(customer_name='John Doe')
+        purchase.customer_name = 'Johnny Cash'
+        purchase.save()
+        Purchase.objects.filter(customer_name='Jane').delete()
+
+        def names(term):
+            return sorted(
+                search(Purchase.objects.all(), [term]).values_list(
+                    'customer_name', flat=True
+                )
+            )
+
+        self.assertEqual(names('john'), ['Johnny Cash'])
+        self.assertEqual(names('doe'), [])
+        self.assertEqual(names('jane'), ['Janet Jones'])
+
+    def test_archived_purchases_are_searched(self):
+        Purchase.objects.filter(customer_name='John Doe').update(
+            purchase_date=timezone.now() - timedelta(days=500)
+        )
+        call_command('archive_purchases', stdout=StringIO())
+        response = self.client.get(
+            reverse('get-purchases'), {'customer_name': 'john'}
+        )
+        self.assertEqual(
+            [row['customer_name'] for row in response.data['results']],
+            ['John Doe'],
+        )
+
+    def test_menu_search_ranks_every_term(self):
+        MenuItem.objects.create(item_name='Spicy Noodle Soup', price=7.00)
+        MenuItem.objects.create(item_name='Noodle Soup', price=6.00)
+        for name in ('get-menu-items', 'async-get-menu-items'):
+            response = self.client.get(reverse(name), {'search': 'noodle sou'})
+            self.assertEqual(
+                [row['name'] for row in response.data['results']],
+                ['Noodle Soup', 'Spicy Noodle Soup'],
+            )
+
+    def test_names_starting_with_the_term_rank_first(self):
+        MenuItem.objects.create(item_name='Zucchini', price=3.00)
+        MenuItem.objects.create(item_name='Chicken Tikka', price=9.00)
+        for name in ('get-menu-items', 'async-get-menu-items'):
+            response = self.client.get(reverse(name), {'search': 'chi'})
+            self.assertEqual(
+                [row['name'] for row in response.data['results']],
+                ['Chicken Tikka', 'Zucchini'],
+            )
+
+
+class SalesRollupTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser8', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.item = MenuItem.objects.create(item_name='Pizza', price=12.00)
+        self.day = timezone.make_aware(datetime(2023, 9, 4, 12))
+
+    def test_purchases_update_daily_sales(self):
+        purchase = Purchase.objects.create(
+            menu_item=self.item, quantity=2, purchase_date=self.day
+        )
+        Purchase.objects.create(
+            menu_item=self.item, quantity=1, purchase_date=self.day
+        )
+        daily_sales = DailySales.objects.get()
+        self.assertEqual(daily_sales.date, date(2023, 9, 4))
+        self.assertEqual(daily_sales.quantity, 3)
+        self.assertEqual(daily_sales.revenue, 36)
+
+        purchase.delete()
+        daily_sales.refresh_from_db()
+        self.assertEqual(daily_sales.quantity, 1)
+        self.assertEqual(daily_sales.revenue, 12)
+
+        delete_purchases(Purchase.objects.all())
+        daily_sales.refresh_from_db()
+        self.assertEqual(daily_sales.quantity, 0)
+
+    def test_menu_item_deletion_is_a_fast_delete(self):
+        purchases = Purchase.objects.bulk_create(
+            Purchase(
+                menu_item=self.item,
+                quantity=1,
+                total_price=12,
+                purchase_date=self.day + timedelta(days=i % 5),
+            )
+            for i in range(200)
+        )
+        record_sales(purchases)
+        # Purchases and rollup rows go with one DELETE each, not per row
+        with CaptureQueriesContext(connection) as queries:
+            self.item.delete()
+        self.assertLess(len(queries), 20)
+        self.assertFalse(Purchase.objects.exists())
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_bulk_purchases_update_daily_sales(self):
+        response = self.client.post(
+            reverse('store-purchases-bulk'),
+            [
+                {
+                    'menu_item': self.item.id,
+                    'quantity': 1,
+                    'purchase_date': self.day.isoformat(),
+                }
+            ]
+            * 3,
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(DailySales.objects.get().quantity, 3)
+
+    def test_rebuild_daily_sales(self):
+        for days in range(3):
+            Purchase.objects.create(
+                menu_item=self.item,
+                quantity=1,
+                purchase_date=self.day + timedelta(days=days),
+            )
+        DailySales.objects.all().delete()
+        call_command('rebuild_daily_sales', stdout=mock.MagicMock())
+        self.assertEqual(DailySales.objects.count(), 3)
+
+    def test_rollup_by_month(self):
+        for days in (0, 10, 40):
+            Purchase.objects.create(
+                menu_item=self.item,
+                quantity=1,
+                purchase_date=self.day + timedelta(days=days),
+            )
+        response = self.client.get(
+            reverse('sales-rollup'), {'period': 'month'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['period'], row['quantity']) for row in response.data],
+            [('2023-09-01', 2), ('2023-10-01', 1)],
+        )
+        self.assertEqual(response.data[0]['revenue'], '24.00')
+
+    def test_invalid_period(self):
+        response = self.client.get(reverse('sales-rollup'), {'period': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConsumptionForecastTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser16', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.localdate()
+        self.flour = Ingredient.objects.create(
+            name='Flour',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=1.0,
+        )
+        self.cheese = Ingredient.objects.create(
+            name='Cheese',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=1.0,
+        )
+        self.salt = Ingredient.objects.create(
+            name='Salt',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=1.0,
+        )
+        pizza = MenuItem.objects.create(item_name='Pizza', price=12.00)
+        bread = MenuItem.objects.create(item_name='Bread', price=4.00)
+        RecipeRequirement.objects.create(
+            menu_item=pizza, ingredient=self.flour, quantity=200
+        )
+        RecipeRequirement.objects.create(
+            menu_item=pizza, ingredient=self.cheese, quantity=100
+        )
+        RecipeRequirement.objects.create(
+            menu_item=bread, ingredient=self.flour, quantity=300
+        )
+        # 2 pizzas and 1 bread a day for the last 10 days
+        for days in range(10):
+            day = self.today - timedelta(days=days)
+            DailySales.objects.create(
+                menu_item=pizza, date=day, quantity=2, revenue=24
+            )
+            DailySales.objects.create(
+                menu_item=bread, date=day, quantity=1, revenue=4
+            )
+
+    def forecast(self, **params):
+        response = self.client.get(reverse('ingredient-forecast'), params)
+        self.assertEqual(response.status_code, 200)
+        return {row['name']: row for row in response.data}
+
+    def test_moving_average_forecast(self):
+        forecast = self.forecast(
+            method='moving_average', window=10, history=10, horizon=7
+        )
+        self.assertEqual(forecast['Flour']['daily_consumption'], 700)
+        self.assertEqual(forecast['Flour']['forecast'], 4900)
+        self.assertEqual(forecast['Cheese']['daily_consumption'], 200)
+        self.assertEqual(forecast['Salt']['forecast'], 0)
+
+        # Days without sales count as zero consumption
+        forecast = self.forecast(method='moving_average', window=20)
+        self.assertEqual(forecast['Cheese']['daily_consumption'], 100)
+
+    def test_exponential_smoothing_forecast(self):
+        forecast = self.forecast(alpha=0.5, history=10)
+        # A constant series smooths to itself
+        self.assertAlmostEqual(forecast['Flour']['daily_consumption'], 700)
+
+        forecast = self.forecast(alpha=0.5, history=11)
+        # One leading empty day: its weight is 0.5 ** 10
+        self.assertAlmostEqual(
+            forecast['Cheese']['daily_consumption'], 200 * (1 - 0.5**10), 3
+        )
+
+    def test_invalid_method(self):
+        response = self.client.get(
+            reverse('ingredient-forecast'), {'method': 'arima'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_forecast_command(self):
+        stdout = StringIO()
+        call_command(
+            'forecast_consumption',
+            '--method=moving_average',
+            '--window=10',
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+        rows = list(csv.DictReader(StringIO(stdout.getvalue())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(float(rows[0]['forecast']), 4900)
+
+
+class PlanPurchaseOrderApiViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser17', password='testpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('plan-purchase-order')
+        today = timezone.localdate()
+        self.flour = Ingredient.objects.create(
+            name='Flour',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=0.01,
+            reorder_threshold=500,
+        )
+        self.eggs = Ingredient.objects.create(
+            name='Eggs',
+            available_quantity=4,
+            measurement_unit=Ingredient.PIECES,
+            price_per_unit=0.25,
+        )
+        self.salt = Ingredient.objects.create(
+            name='Salt',
+            available_quantity=1000,
+            measurement_unit=Ingredient.GRAMS,
+            price_per_unit=0.01,
+        )
+        cake = MenuItem.objects.create(item_name='Cake', price=20.00)
+        RecipeRequirement.objects.create(
+            menu_item=cake, ingredient=self.flour, quantity=300
+        )
+        RecipeRequirement.objects.create(
+            menu_item=cake, ingredient=self.eggs, quantity=1.5
+        )
+        # One cake a day for the last four weeks
+        for days in range(28):
+            DailySales.objects.create(
+                menu_item=cake,
+                date=today - timedelta(days=days),
+                quantity=1,
+                revenue=20,
+            )
+
+    def test_plan_purchase_order(self):
+        response = self.client.post(
+            self.url,
+            {'coverage_days': 7, 'method': 'moving_average'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], PurchaseOrder.DRAFT)
+        lines = {
+            line['ingredient_name']: line for line in response.data['lines']
+        }
+        # Salt is not used, so it is not ordered
+        self.assertEqual(set(lines), {'Flour', 'Eggs'})
+        # 7 x 300 needed plus 500 safety stock, 1000 in stock
+        self.assertEqual(lines['Flour']['quantity'], 1600)
+        self.assertEqual(lines['Flour']['total_price'], '16.00')
+        # 7 x 1.5 = 10.5 eggs needed, 4 in stock: whole pieces
+        self.assertEqual(lines['Eggs']['quantity'], 7)
+        self.assertEqual(response.data['total_cost'], '17.75')
+        self.assertEqual(PurchaseOrder.objects.get().lines.count(), 2)
+
+    def test_nothing_to_order(self):
+        Ingredient.objects.update(available_quantity=1e6)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['lines'], [])
+        self.assertEqual(response.data['total_cost'], '0.00')
+
+    def test_invalid_coverage(self):
+        response = self.client.post(
+            self.url, {'coverage_days': 0}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_plan_purchase_orders_command(self):
+        call_command(
+            'plan_purchase_orders',
+            '--coverage-days=14',
+            stdout=StringIO(),
+        )
+        order = PurchaseOrder.objects.get()
+        self.assertEqual(order.coverage_days, 14)
+        self.assertEqual(order.lines.count(), 2)
+
+
+class LocationScopingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # User ids are reused by later tests; drop the cached memberships
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(
+            username='manager', password='password'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.north = Location.objects.create(name='North')
+        self.south = Location.objects.create(name='South')
+        self.north.members.add(self.user)
+        self.south.members.add(self.user)
+        self.north_flour = Ingredient.objects.create(
+            location=self.north,
+            name='Flour',
+            available_quantity=10,
+            price_per_unit=0.5,
+        )
+        Ingredient.objects.create(
+            location=self.south,
+            name='Flour',
+            available_quantity=20,
+            price_per_unit=0.5,
+        )
+        self.south_bread = MenuItem.objects.create(
+            location=self.south, item_name='Bread', price=4.00
+        )
+
+    def names(self, response):
+        return [row['name'] for row in response.data['results']]
+
+    def test_views_only_see_their_location(self):
+        response = self.client.get(
+            reverse('ingredient-list'), HTTP_X_LOCATION=self.south.pk
+        )
+        self.assertEqual(
+            [row['available_quantity'] for row in response.data['results']],
+            [20],
+        )
+        # Without the header, the user's first location
+        response = self.client.get(reverse('ingredient-list'))
+        self.assertEqual(
+            [row['available_quantity'] for row in response.data['results']],
+            [10],
+        )
+        response = self.client.get(reverse('get-menu-items'))
+        self.assertEqual(self.names(response), [])
+
+    def test_rows_are_created_in_the_location(self):
+        data = {
+            'name': 'Flour',
+            'available_quantity': 5,
+            'price_per_unit': '0.50',
+            'measurement_unit': 'grams',
+        }
+        url = reverse('store-ingredient')
+        # Names are unique per location only
+        response = self.client.post(url, data, HTTP_X_LOCATION=self.north.pk)
+        self.assertEqual(response.status_code, 400)
+
+        other = Location.objects.create(name='East')
+        other.members.add(self.user)
+        response = self.client.post(url, data, HTTP_X_LOCATION=other.pk)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            Ingredient.objects.get(pk=response.data['id']).location, other
+        )
+
+    def test_other_locations_rows_are_not_found(self):
+        response = self.client.post(
+            reverse('store-purchase'),
+            {'menu_item': self.south_bread.pk, 'quantity': 1},
+            HTTP_X_LOCATION=self.north.pk,
+        )
+        self.assertEqual(response.status_code, 404)
+
+        url = reverse(
+            'ingredient-delete',
+            kwargs={'ingredient_id': self.north_flour.pk},
+        )
+        response = self.client.delete(url, HTTP_X_LOCATION=self.south.pk)
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Ingredient.objects.filter(pk=self.north_flour.pk))
+
+    def test_location_access(self):
+        url = reverse('ingredient-list')
+        other = Location.objects.create(name='East')
+        response = self.client.get(url, HTTP_X_LOCATION=other.pk)
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url, HTTP_X_LOCATION='north')
+        self.assertEqual(response.status_code, 400)
+
+        # Memberships are cached until they change
+        self.north.members.remove(self.user)
+        response = self.client.get(url, HTTP_X_LOCATION=self.north.pk)
+        self.assertEqual(response.status_code, 403)
+
+    def test_users_of_no_location_are_refused(self):
+        url = reverse('get-menu-items')
+        self.client.force_authenticate(
+            user=User.objects.create_user(username='clerk', password='x')
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url, HTTP_X_LOCATION=DEFAULT_LOCATION_ID)
+        self.assertEqual(response.status_code, 403)
+
+        # Superusers may work on any location
+        self.client.force_authenticate(
+            user=User.objects.create_superuser(username='root', password='x')
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # Single-site deployments need no memberships
+        self.client.force_authenticate(user=User.objects.get(username='clerk'))
+        Location.objects.exclude(pk=DEFAULT_LOCATION_ID).delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_memberships_read_before_a_revocation_are_not_used(self):
+        url = reverse('ingredient-list')
+        store = cache.set
+
+        # A request reads the memberships, then the revocation commits
+        # before it caches them
+        def revoke_then_store(key, value, timeout):
+            if key.startswith('inventory:user-locations:'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.north.members.remove(self.user)
+            store(key, value, timeout=timeout)
+
+        with mock.patch.object(cache, 'set', side_effect=revoke_then_store):
+            self.client.get(url, HTTP_X_LOCATION=self.north.pk)
+        response = self.client.get(url, HTTP_X_LOCATION=self.north.pk)
+        self.assertEqual(response.status_code, 403)
+
+    def test_menu_cache_per_location(self):
+        url = reverse('get-menu-items')
+        response = self.client.get(url, HTTP_X_LOCATION=self.south.pk)
+        self.assertEqual(self.names(response), ['Bread'])
+        etag = response['ETag']
+
+        # A menu change elsewhere keeps this location's responses cached
+        MenuItem.objects.create(
+            location=self.north, item_name='Soup', price=5.00
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, HTTP_X_LOCATION=self.south.pk, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_X_LOCATION=self.north.pk)
+        self.assertEqual(self.names(response), ['Soup'])
+
+
+class BenchmarkSuiteTestCase(APITestCase):
+    def test_every_route_has_a_scenario(self):
+        self.assertEqual(unbenchmarked_routes(), [])
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(scale=0.001, iterations=1)
+        self.assertEqual(
+            set(results), {scenario.name for scenario in SCENARIOS}
+        )
+        # Warm menu reads only read the menu version
+        self.assertEqual(results['get-menu-items']['queries'], 1)
+
+    def test_find_regressions(self):
+        baseline = {
+            'scale': 0.01,
+            'routes': {'sales-rollup': {'queries': 1, 'p95_ms': 5.0}},
+        }
+        results = {
+            'scale': 0.01,
+            'routes': {'sales-rollup': {'queries': 2, 'p95_ms': 20.0}},
+        }
+        self.assertEqual(len(find_regressions(results, baseline, 2.0)), 2)
+        results['scale'] = 1
+        self.assertEqual(len(find_regressions(results, baseline, 2.0)), 1)
+
+
+class ConcurrencyBenchmarkTestCase(TransactionTestCase):
+    # The WSGI worker threads use their own connections, so the seeded
+    # rows must be committed
+
+    def test_run_concurrency_benchmarks(self):
+        results = run_concurrency_benchmarks(
+            scale=0.001, requests=4, concurrency=2, workers=2
+        )
+        self.assertEqual(set(results), set(CONCURRENCY_ROUTES))
+        for modes in results.values():
+            self.assertEqual(set(modes), {'wsgi', 'asgi'})
+            self.assertGreater(modes['asgi']['requests_per_s'], 0)
+
+    def test_run_connection_benchmarks(self):
+        results = run_connection_benchmarks(
+            scale=0.001, requests=6, concurrency=2, workers=2
+        )
+        self.assertEqual(set(results), set(CONNECTION_ROUTES))
+        for profiles in results.values():
+            self.assertEqual(set(profiles), set(CONNECTION_PROFILES))
+            # Persistent connections are opened once per worker thread
+            self.assertLessEqual(profiles['persistent']['connections'], 2)
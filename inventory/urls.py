@@ -1,15 +1,35 @@
 from django.urls import path
+from .async_views import (
+    AsyncGetIngredientApiView,
+    AsyncGetMenuItemApiView,
+    AsyncGetMenuItemsApiView,
+    AsyncGetPurchasesApiView,
+    StockStreamApiView,
+)
 from .views import (
     GetIngredientApiView,
+    IngredientAlertsApiView,
+    IngredientForecastApiView,
+    IngredientStockApiView,
+    GetStockMovementsApiView,
+    GetStockAlertsApiView,
     DeleteIngredientApiView,
     GetMenuItemApiView,
+    GetMenuAvailabilityApiView,
+    GetMenuCostingApiView,
     StoreMenuItemApiView,
     StoreIngredientApiView,
     StoreRecipeRequirementApiView,
+    StoreRecipeRequirementsBulkApiView,
     StorePurchaseApiView,
+    StorePurchasesBulkApiView,
     UpdateIngredientApiView,
+    UpdateIngredientsBulkApiView,
     GetMenuItemsApiView,
     GetPurchasesApiView,
+    ExportPurchasesApiView,
+    SalesRollupApiView,
+    PlanPurchaseOrderApiView,
 )
 
 urlpatterns = [
@@ -18,6 +38,31 @@ urlpatterns = [
         GetIngredientApiView.as_view(),
         name='ingredient-list',
     ),
+    path(
+        'api/ingredients/alerts/',
+        IngredientAlertsApiView.as_view(),
+        name='ingredient-alerts',
+    ),
+    path(
+        'api/ingredients/forecast/',
+        IngredientForecastApiView.as_view(),
+        name='ingredient-forecast',
+    ),
+    path(
+        'api/ingredients/stock/',
+        IngredientStockApiView.as_view(),
+        name='ingredient-stock',
+    ),
+    path(
+        'api/ingredients/<int:ingredient_id>/movements/',
+        GetStockMovementsApiView.as_view(),
+        name='ingredient-movements',
+    ),
+    path(
+        'api/stock-alerts/',
+        GetStockAlertsApiView.as_view(),
+        name='stock-alerts',
+    ),
     path(
         'api/ingredients/<int:ingredient_id>/',
         DeleteIngredientApiView.as_view(),
@@ -26,6 +71,16 @@ urlpatterns = [
     path(
         'api/menu-items/', GetMenuItemApiView.as_view(), name='menu-items-list'
     ),
+    path(
+        'api/menu-items/availability/',
+        GetMenuAvailabilityApiView.as_view(),
+        name='menu-items-availability',
+    ),
+    path(
+        'api/menu-items/costing/',
+        GetMenuCostingApiView.as_view(),
+        name='menu-items-costing',
+    ),
     path(
         'api/store-menu-item/',
         StoreMenuItemApiView.as_view(),
@@ -41,16 +96,31 @@ urlpatterns = [
         StoreRecipeRequirementApiView.as_view(),
         name='store-reciperequirement',
     ),
+    path(
+        'api/store-reciperequirements/',
+        StoreRecipeRequirementsBulkApiView.as_view(),
+        name='store-reciperequirements-bulk',
+    ),
     path(
         'api/store-purchase/',
         StorePurchaseApiView.as_view(),
         name='store-purchase',
     ),
+    path(
+        'api/store-purchases/',
+        StorePurchasesBulkApiView.as_view(),
+        name='store-purchases-bulk',
+    ),
     path(
         'api/update-ingredient/<int:ingredient_id>/',
         UpdateIngredientApiView.as_view(),
         name='update-ingredient',
     ),
+    path(
+        'api/update-ingredients/',
+        UpdateIngredientsBulkApiView.as_view(),
+        name='update-ingredients-bulk',
+    ),
     path(
         'api/get-menu-items/',
         GetMenuItemsApiView.as_view(),
@@ -59,4 +129,45 @@ urlpatterns = [
     path(
         'api/purchases/', GetPurchasesApiView.as_view(), name='get-purchases'
     ),
+    path(
+        'api/purchases/export/',
+        ExportPurchasesApiView.as_view(),
+        name='export-purchases',
+    ),
+    path(
+        'api/sales/rollup/',
+        SalesRollupApiView.as_view(),
+        name='sales-rollup',
+    ),
+    path(
+        'api/purchase-orders/plan/',
+        PlanPurchaseOrderApiView.as_view(),
+        name='plan-purchase-order',
+    ),
+    # Async listings, for ASGI deployments
+    path(
+        'api/async/ingredients/',
+        AsyncGetIngredientApiView.as_view(),
+        name='async-ingredient-list',
+    ),
+    path(
+        'api/async/menu-items/',
+        AsyncGetMenuItemApiView.as_view(),
+        name='async-menu-items-list',
+    ),
+    path(
+        'api/async/get-menu-items/',
+        AsyncGetMenuItemsApiView.as_view(),
+        name='async-get-menu-items',
+    ),
+    path(
+        'api/async/purchases/',
+        AsyncGetPurchasesApiView.as_view(),
+        name='async-get-purchases',
+    ),
+    path(
+        'api/ingredients/stream/',
+        StockStreamApiView.as_view(),
+        name='ingredient-stream',
+    ),
 ]
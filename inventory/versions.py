@@ -0,0 +1,65 @@
+"""
+Version counters of cached data.
+
+Cached entries are keyed by the version of the data they were computed
+from, and changes bump the version instead of deleting entries: an entry
+computed concurrently from the old data is stored under a version that is
+never read again, and expires with its timeout.
+
+Changes made in a transaction bump the version right away and once more
+when the transaction commits (``bump_versions_on_commit``): a request
+running concurrently may read the not-yet-committed (old) data after the
+first bump, and the entry it computes is stored under that version, which
+the second bump retires.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_version(key):
+    """
+    Return the current value of the version counter ``key``
+    """
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a counter evicted from the cache never
+        # reissues a version already used for other data
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Increment the version counter ``key`` and return its new value, which
+    no other bump returns
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        get_version(key)
+        return cache.incr(key)
+
+
+def repeat_on_commit(func, *args):
+    """
+    Call ``func(*args)`` now and once more when the surrounding transaction
+    commits (right away outside one)
+    """
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+def _bump_all(keys):
+    for key in keys:
+        bump_version(key)
+
+
+def bump_versions_on_commit(keys):
+    """
+    Bump the version counters ``keys`` now and once more when the
+    surrounding transaction commits
+    """
+    repeat_on_commit(_bump_all, list(keys))
@@ -1,25 +1,75 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, pagination
-from .models import Ingredient, MenuItem, Purchase
+from .models import (
+    Ingredient,
+    MenuItem,
+    PurchaseOrder,
+    StockAlert,
+    StockMovement,
+)
 from .serializers import (
     IngredientSerializer,
+    IngredientAlertsQuerySerializer,
     MenuItemSerializer,
+    MenuItemCostingSerializer,
     RecipeRequirementSerializer,
     PurchaseSerializer,
+    PurchaseOrderPlanSerializer,
+    PurchaseOrderSerializer,
+    ConsumptionForecastSerializer,
+    ForecastQuerySerializer,
+    SalesRollupQuerySerializer,
+    SalesRollupSerializer,
+    StockAlertSerializer,
+    StockAlertsQuerySerializer,
+    IngredientStockSerializer,
+    StockAtQuerySerializer,
+    StockMovementSerializer,
+)
+from .alerts import expiring_ingredients, low_stock_ingredients
+from .archive import combine_partitions, purchase_partitions
+from .availability import get_menu_availability
+from .bulk import (
+    ingest_purchases,
+    upsert_ingredients,
+    upsert_recipe_requirements,
+)
+from .costing import get_menu_costing
+from .export import csv_stream, ndjson_stream
+from .filters import TrigramSearchFilter
+from .forecasting import consumption_forecast
+from .ledger import stock_at
+from .locations import LocationScopedMixin
+from .menu_cache import cached_menu_response
+from .pagination import PurchaseKeysetPagination
+from .planning import create_draft_order
+from .sales import sales_rollup
+from .search import SEARCH_ORDERING
+from .stock import (
+    InsufficientStockError,
+    adjust_stock,
+    deplete_stock,
+    recipe_needs,
 )
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 
 
-class GetIngredientApiView(APIView):
+class GetIngredientApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # GET requests may be served by a read replica (sl_backend/db_router.py)
+    replica_reads = True
     serializer_class = IngredientSerializer
     pagination_class = pagination.PageNumberPagination
 
     def get(self, request):
         try:
-            ingredients = Ingredient.objects.all()
+            ingredients = Ingredient.objects.filter(
+                location_id=request.location_id
+            )
 
             if not ingredients.exists():
                 return Response(
@@ -49,12 +99,145 @@ class GetIngredientApiView(APIView):
             )
 
 
-class DeleteIngredientApiView(APIView):
+class IngredientAlertsApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = IngredientSerializer
+
+    def get(self, request):
+        query_serializer = IngredientAlertsQuerySerializer(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Both lists are index range scans (see alerts.py)
+        days = query_serializer.validated_data['days']
+        return Response(
+            {
+                'low_stock': self.serializer_class(
+                    low_stock_ingredients(request.location_id), many=True
+                ).data,
+                'expiring': self.serializer_class(
+                    expiring_ingredients(days, request.location_id),
+                    many=True,
+                ).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class GetStockAlertsApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = StockAlertSerializer
+
+    def get(self, request):
+        query_serializer = StockAlertsQuerySerializer(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Consumers poll with the last id they have seen
+        after = query_serializer.validated_data['after']
+        alerts = (
+            StockAlert.objects.select_related('ingredient')
+            .filter(pk__gt=after, ingredient__location_id=request.location_id)
+            .order_by('pk')[: query_serializer.validated_data['limit']]
+        )
+        data = self.serializer_class(alerts, many=True).data
+        return Response(
+            {'last_id': data[-1]['id'] if data else after, 'results': data},
+            status=status.HTTP_200_OK,
+        )
+
+
+class IngredientForecastApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = ConsumptionForecastSerializer
+
+    def get(self, request):
+        query_serializer = ForecastQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # All ingredients are forecast at once from one aggregate query
+        forecast = consumption_forecast(
+            location_id=request.location_id,
+            **query_serializer.validated_data,
+        )
+        serializer = self.serializer_class(forecast, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class IngredientStockApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = IngredientStockSerializer
+    pagination_class = pagination.PageNumberPagination
+
+    def get(self, request):
+        query_serializer = StockAtQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Reconstructed from the ledger: snapshot + movements since
+        ingredients = stock_at(
+            query_serializer.validated_data.get('at')
+        ).filter(location_id=request.location_id)
+        ingredient_id = query_serializer.validated_data.get('ingredient_id')
+        if ingredient_id:
+            ingredients = ingredients.filter(pk=ingredient_id)
+        ingredients = ingredients.order_by('pk')
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(ingredients, request)
+        serializer = self.serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class GetStockMovementsApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = StockMovementSerializer
+    pagination_class = pagination.PageNumberPagination
+
+    def get(self, request, ingredient_id):
+        if not Ingredient.objects.filter(
+            pk=ingredient_id, location_id=request.location_id
+        ).exists():
+            return Response(
+                {'detail': 'Ingredient not found.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        # Newest first, read backwards from the ledger index
+        movements = StockMovement.objects.filter(
+            ingredient_id=ingredient_id
+        ).order_by('-created_at', '-pk')
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(movements, request)
+        serializer = self.serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class DeleteIngredientApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def delete(self, request, ingredient_id):
         try:
-            ingredient = Ingredient.objects.get(id=ingredient_id)
+            ingredient = Ingredient.objects.get(
+                id=ingredient_id, location_id=request.location_id
+            )
             ingredient.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -71,14 +254,22 @@ class DeleteIngredientApiView(APIView):
             )
 
 
-class GetMenuItemApiView(APIView):
+class GetMenuItemApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MenuItemSerializer
     pagination_class = pagination.PageNumberPagination
 
     def get(self, request):
+        # Served from the versioned menu cache until the menu changes
+        return cached_menu_response(
+            request, 'menu-items-list', lambda: self.list(request)
+        )
+
+    def list(self, request):
         try:
-            menu_items = MenuItem.objects.all()
+            menu_items = MenuItem.objects.filter(
+                location_id=request.location_id
+            )
 
             if not menu_items.exists():
                 return Response(
@@ -109,12 +300,44 @@ class GetMenuItemApiView(APIView):
             )
 
 
-class StoreMenuItemApiView(APIView):
+class GetMenuAvailabilityApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Served from cache until stock, recipes or the menu change
+        availability = get_menu_availability(request.location_id)
+
+        # Only sellable items if requested
+        if request.query_params.get('available') == 'true':
+            availability = [
+                menu_item
+                for menu_item in availability
+                if menu_item['max_servings'] != 0
+            ]
+
+        return Response(availability, status=status.HTTP_200_OK)
+
+
+class GetMenuCostingApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = MenuItemCostingSerializer
+
+    def get(self, request):
+        # Materialised costing; only items touched since the last read are
+        # recomputed
+        costing = get_menu_costing(request.location_id)
+        serializer = self.serializer_class(costing, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class StoreMenuItemApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MenuItemSerializer
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(
+            data=request.data, context={'location_id': request.location_id}
+        )
 
         if serializer.is_valid():
             serializer.save()
@@ -125,12 +348,14 @@ class StoreMenuItemApiView(APIView):
             )
 
 
-class StoreIngredientApiView(APIView):
+class StoreIngredientApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = IngredientSerializer
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(
+            data=request.data, context={'location_id': request.location_id}
+        )
 
         if serializer.is_valid():
             serializer.save()
@@ -141,13 +366,15 @@ class StoreIngredientApiView(APIView):
             )
 
 
-class StoreRecipeRequirementApiView(APIView):
+class StoreRecipeRequirementApiView(LocationScopedMixin, APIView):
     # Only authenticated users can access this view
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = RecipeRequirementSerializer
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(
+            data=request.data, context={'location_id': request.location_id}
+        )
 
         if serializer.is_valid():
             serializer.save()
@@ -158,7 +385,42 @@ class StoreRecipeRequirementApiView(APIView):
             )
 
 
-class StorePurchaseApiView(APIView):
+class StoreRecipeRequirementsBulkApiView(LocationScopedMixin, APIView):
+    # Only authenticated users can access this view
+    permission_classes = [permissions.IsAuthenticated]
+    max_rows = 20000
+
+    def post(self, request):
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('recipe_requirements')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {
+                    'detail': 'Expected a non-empty list of recipe requirements.'
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > self.max_rows:
+            return Response(
+                {
+                    'detail': f'At most {self.max_rows} recipe requirements '
+                    'can be stored per request.'
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # All rows are written in one transaction, or none if any is invalid
+        errors = upsert_recipe_requirements(rows, request.location_id)
+        if errors:
+            return Response(
+                {'detail': 'Invalid recipe requirements.', 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({'stored': len(rows)}, status=status.HTTP_201_CREATED)
+
+
+class StorePurchaseApiView(LocationScopedMixin, APIView):
     # Only authenticated users can access this view
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = PurchaseSerializer
@@ -166,15 +428,36 @@ class StorePurchaseApiView(APIView):
     def post(self, request):
         # Validate menu_item ID
         menu_item_id = request.data.get('menu_item')
-        if not MenuItem.objects.filter(id=menu_item_id).exists():
+        if not MenuItem.objects.filter(
+            id=menu_item_id, location_id=request.location_id
+        ).exists():
             return Response(
                 {'detail': 'MenuItem not found.'},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(
+            data=request.data, context={'location_id': request.location_id}
+        )
         if serializer.is_valid():
-            serializer.save()  # The total_price is calculated in the save method of the Purchase model
+            # Deduct the recipe ingredients and store the purchase in one
+            # transaction, so a failed deduction leaves no purchase behind
+            menu_item = serializer.validated_data['menu_item']
+            needs = recipe_needs(
+                {menu_item.pk: serializer.validated_data['quantity']}
+            )
+            try:
+                with transaction.atomic():
+                    deplete_stock(needs, request.location_id)
+                    serializer.save()  # The total_price is calculated in the save method of the Purchase model
+            except InsufficientStockError as e:
+                return Response(
+                    {
+                        'detail': 'Insufficient stock.',
+                        'ingredients': e.ingredient_ids,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(
@@ -182,13 +465,62 @@ class StorePurchaseApiView(APIView):
             )
 
 
-class UpdateIngredientApiView(APIView):
+class StorePurchasesBulkApiView(LocationScopedMixin, APIView):
+    # Only authenticated users can access this view
+    permission_classes = [permissions.IsAuthenticated]
+    max_rows = 10000
+
+    def post(self, request):
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('purchases')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'detail': 'Expected a non-empty list of purchases.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > self.max_rows:
+            return Response(
+                {
+                    'detail': f'At most {self.max_rows} purchases can be '
+                    'stored per request.'
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            results = ingest_purchases(rows, request.location_id)
+        except InsufficientStockError as e:
+            # Stock was used by concurrent orders while the batch was
+            # being checked; nothing was stored and the batch can be retried
+            return Response(
+                {
+                    'detail': 'Insufficient stock.',
+                    'ingredients': e.ingredient_ids,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        return Response(
+            {
+                'created': created,
+                'failed': len(results) - created,
+                'results': results,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class UpdateIngredientApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = IngredientSerializer
 
     def patch(self, request, ingredient_id):
         try:
-            ingredient = Ingredient.objects.get(pk=ingredient_id)
+            ingredient = Ingredient.objects.get(
+                pk=ingredient_id, location_id=request.location_id
+            )
         except Ingredient.DoesNotExist:
             return Response(
                 {'detail': 'Ingredient not found.'},
@@ -197,26 +529,123 @@ class UpdateIngredientApiView(APIView):
 
         # Partial update (only fields provided in the request payload)
         serializer = self.serializer_class(
-            instance=ingredient, data=request.data, partial=True
+            instance=ingredient,
+            data=request.data,
+            partial=True,
+            context={'location_id': request.location_id},
         )
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        else:
+        if not serializer.is_valid():
             return Response(
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
+        quantity = serializer.validated_data.pop('available_quantity', None)
+        try:
+            with transaction.atomic():
+                # The level is set (or kept) by adjust_stock, which reads it
+                # under the write lock: the save neither overwrites nor
+                # records in the ledger a level read before a concurrent
+                # purchase
+                levels = adjust_stock(
+                    {ingredient.pk: (quantity, 0.0)},
+                    StockMovement.ADJUSTMENT,
+                    request.location_id,
+                )
+                ingredient.available_quantity = levels[ingredient.pk]
+                serializer.save()
+        except InsufficientStockError as e:
+            return Response(
+                {
+                    'detail': 'Insufficient stock.',
+                    'ingredients': e.ingredient_ids,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class UpdateIngredientsBulkApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_rows = 5000
+
+    # Ledger movement kinds a stock update can be recorded as
+    reasons = [
+        StockMovement.ADJUSTMENT,
+        StockMovement.DELIVERY,
+        StockMovement.WASTE,
+    ]
+
+    def patch(self, request):
+        rows = request.data
+        reason = StockMovement.ADJUSTMENT
+        if isinstance(rows, dict):
+            reason = rows.get('reason', reason)
+            rows = rows.get('ingredients')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'detail': 'Expected a non-empty list of ingredients.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if reason not in self.reasons:
+            return Response(
+                {'detail': f'reason must be one of {self.reasons}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > self.max_rows:
+            return Response(
+                {
+                    'detail': f'At most {self.max_rows} ingredients can be '
+                    'updated per request.'
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # All rows are applied in one transaction, or none if any is invalid
+        try:
+            errors, ingredients = upsert_ingredients(
+                rows, reason, request.location_id
+            )
+        except InsufficientStockError as e:
+            return Response(
+                {
+                    'detail': 'Insufficient stock.',
+                    'ingredients': e.ingredient_ids,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        if errors:
+            return Response(
+                {'detail': 'Invalid ingredients.', 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created = sum(1 for ingredient in ingredients if ingredient['created'])
+        return Response(
+            {
+                'updated': len(ingredients) - created,
+                'created': created,
+                'ingredients': ingredients,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
-class GetMenuItemsApiView(APIView):
+class GetMenuItemsApiView(LocationScopedMixin, APIView):
     serializer_class = MenuItemSerializer
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [TrigramSearchFilter, OrderingFilter]
     search_fields = ['item_name']
     ordering_fields = ['price', 'item_name']
 
     def get(self, request):
-        menu_items = MenuItem.objects.all()
+        # Served from the versioned menu cache until the menu changes; the
+        # search and ordering parameters are part of the cache key
+        return cached_menu_response(
+            request, 'get-menu-items', lambda: self.list(request)
+        )
+
+    def list(self, request):
+        menu_items = MenuItem.objects.filter(location_id=request.location_id)
 
         # Filtering using DRF's built-in features
         for backend in list(self.filter_backends):
@@ -233,40 +662,47 @@ class GetMenuItemsApiView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class GetPurchasesApiView(APIView):
+class GetPurchasesApiView(LocationScopedMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
     serializer_class = PurchaseSerializer
 
     ordering_fields = ['purchase_date']
 
     def get(self, request):
-        # Get all purchases
-        purchases = Purchase.objects.all()
+        # Keyset pagination (opt-in) always orders by (purchase_date, id)
+        keyset = (
+            request.query_params.get('pagination') == 'keyset'
+            or PurchaseKeysetPagination.cursor_query_param
+            in request.query_params
+        )
+        ordering = request.query_params.get('ordering')
+        # Customer searches list the best matches first unless ordered
+        ranked = (
+            not keyset
+            and ordering not in self.ordering_fields
+            and bool(request.query_params.get('customer_name'))
+        )
 
-        # Filter by menu_item_id if provided
-        menu_item_id = request.query_params.get('menu_item_id')
-        if menu_item_id:
-            purchases = purchases.filter(menu_item_id=menu_item_id)
+        # The filtered purchases of the location, from the live table and,
+        # when the date range reaches back into it, the archive
+        partitions = purchase_partitions(
+            request.location_id, request.query_params, rank=ranked
+        )
 
-        # Filter by customer_name if provided
-        customer_name = request.query_params.get('customer_name')
-        if customer_name:
-            purchases = purchases.filter(
-                customer_name__icontains=customer_name
-            )
+        if keyset:
+            paginator = PurchaseKeysetPagination()
+            page = paginator.paginate_queryset(partitions, request)
+            serializer = self.serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
 
-        # Filter by date range if both date_from and date_to are provided
-        date_from = request.query_params.get('date_from', None)
-        date_to = request.query_params.get('date_to', None)
-        if date_from and date_to:
-            purchases = purchases.filter(
-                purchase_date__range=[date_from, date_to]
-            )
+        purchases = combine_partitions(partitions)
 
         # Ordering
-        ordering = request.query_params.get('ordering')
         if ordering in self.ordering_fields:
             purchases = purchases.order_by(ordering)
+        elif ranked:
+            purchases = purchases.order_by(*SEARCH_ORDERING)
 
         # Pagination
         paginator = PageNumberPagination()
@@ -277,3 +713,84 @@ class GetPurchasesApiView(APIView):
 
         serializer = self.serializer_class(purchases, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ExportPurchasesApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    # Output formats: content type and row generator
+    outputs = {
+        'ndjson': ('application/x-ndjson', ndjson_stream),
+        'csv': ('text/csv', csv_stream),
+    }
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.outputs:
+            return Response(
+                {'detail': f'Unsupported output: {output}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Same filters and tables as the purchases listing
+        purchases = combine_partitions(
+            purchase_partitions(request.location_id, request.query_params)
+        )
+
+        # Rows are streamed from a database cursor as they are written out,
+        # so the worker's memory does not grow with the size of the export.
+        # They are read after the response has left the replica routing,
+        # so the database is chosen now.
+        content_type, stream = self.outputs[output]
+        response = StreamingHttpResponse(
+            stream(purchases.using(purchases.db)), content_type=content_type
+        )
+        response[
+            'Content-Disposition'
+        ] = f'attachment; filename="purchases.{output}"'
+        return response
+
+
+class SalesRollupApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_reads = True
+    serializer_class = SalesRollupSerializer
+
+    def get(self, request):
+        query_serializer = SalesRollupQuerySerializer(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Read from the daily rollup, never from the purchases table
+        rollup = sales_rollup(
+            location_id=request.location_id,
+            **query_serializer.validated_data,
+        )
+        serializer = self.serializer_class(rollup, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PlanPurchaseOrderApiView(LocationScopedMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = PurchaseOrderSerializer
+
+    def post(self, request):
+        plan_serializer = PurchaseOrderPlanSerializer(data=request.data)
+        if not plan_serializer.is_valid():
+            return Response(
+                plan_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Every ingredient is planned in one pass and stored as a draft
+        order = create_draft_order(
+            location_id=request.location_id, **plan_serializer.validated_data
+        )
+        order = PurchaseOrder.objects.prefetch_related(
+            'lines__ingredient'
+        ).get(pk=order.pk)
+        serializer = self.serializer_class(order)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
+
+
+class SlBackendConfig(AppConfig):
+    name = 'sl_backend'
+
+    def ready(self):
+        from .caches import check_shared_cache
+        from .database import configure_sqlite
+
+        connection_created.connect(
+            configure_sqlite, dispatch_uid='sl_backend.configure_sqlite'
+        )
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
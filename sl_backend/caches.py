@@ -0,0 +1,84 @@
+"""
+Cache settings built from the environment.
+
+The inventory caches (menus, availability, costing) are invalidated by the
+process that changes the data, so every web worker and management command
+must use the same cache. ``cache_settings`` builds it from ``CACHE_URL``
+and refuses to fall back to a per-process one; ``check_shared_cache``
+reports process-local caches in ``manage.py check --deploy``.
+"""
+import os
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+
+# Backends whose entries only the current process sees
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Seconds an entry is kept unless its cache sets its own timeout
+DEFAULT_CACHE_TIMEOUT = 300
+
+
+def cache_settings(env=os.environ):
+    """
+    Return the ``default`` cache from ``CACHE_URL`` in ``env``:
+    ``redis://host:port/db`` (requires ``redis``),
+    ``memcached://host:port[,host:port]`` (requires ``pymemcache``) or
+    ``db://table`` (a table created by ``manage.py createcachetable``).
+
+    Raises ``ImproperlyConfigured`` when it is not set.
+    """
+    url = env.get('CACHE_URL')
+    if not url:
+        raise ImproperlyConfigured(
+            'Set CACHE_URL to a cache shared by every worker (redis://, '
+            'memcached:// or db://).'
+        )
+    parts = urlsplit(url)
+    if parts.scheme in ('redis', 'rediss'):
+        cache = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        }
+    elif parts.scheme == 'memcached':
+        cache = {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': parts.netloc.split(','),
+        }
+    elif parts.scheme == 'db':
+        cache = {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': parts.netloc or parts.path.lstrip('/'),
+        }
+    else:
+        raise ImproperlyConfigured(
+            f'Unsupported CACHE_URL scheme: {parts.scheme!r}.'
+        )
+    cache['TIMEOUT'] = int(env.get('CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    cache['KEY_PREFIX'] = env.get('CACHE_KEY_PREFIX', 'sl_backend')
+    return cache
+
+
+def cache_is_shared(alias='default'):
+    """
+    Return whether the ``alias`` cache is seen by every process
+    """
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [
+        checks.Error(
+            'The default cache is local to each process, so cache '
+            'invalidations do not reach the other workers.',
+            hint='Set CACHE_URL and use sl_backend.settings_production.',
+            id='sl_backend.E001',
+        )
+    ]
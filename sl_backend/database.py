@@ -0,0 +1,114 @@
+"""
+Database settings built from the environment, and per-connection setup.
+
+``database_settings`` returns the ``default`` database of the production
+profile (SQLite or PostgreSQL) with persistent connections and health
+checks; ``replica_databases`` derives the read replicas from it.
+``configure_sqlite`` applies ``settings.SQLITE_PRAGMAS`` to every new
+SQLite connection.
+"""
+import os
+
+from django.conf import settings
+
+# Seconds a connection is kept open between requests; 0 closes it after
+# every request, None never does
+DEFAULT_CONN_MAX_AGE = 600
+
+# Pragmas of the production profile, applied in this order
+SQLITE_PRODUCTION_PRAGMAS = {
+    # Readers no longer block the writer (and the other way round)
+    'journal_mode': 'WAL',
+    # Durable across application crashes; WAL makes FULL unnecessary
+    'synchronous': 'NORMAL',
+    # Milliseconds a writer waits for the lock instead of failing at once
+    'busy_timeout': 5000,
+    # Read the database through a 256 MiB memory map
+    'mmap_size': 256 * 1024 * 1024,
+    # 64 MiB page cache per connection (negative sizes are in KiB)
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def _flag(env, name, default):
+    return env.get(name, '1' if default else '0') == '1'
+
+
+def database_settings(env=os.environ):
+    """
+    Return the ``default`` database from the ``DATABASE_*`` variables in
+    ``env``.
+
+    ``DATABASE_ENGINE`` is ``sqlite`` (``DATABASE_NAME`` is the file) or
+    ``postgresql`` (``DATABASE_NAME``, ``_USER``, ``_PASSWORD``, ``_HOST``
+    and ``_PORT``). Connections persist for ``DATABASE_CONN_MAX_AGE``
+    seconds and are checked before reuse. With ``DATABASE_PGBOUNCER=1``
+    (transaction pooling) server-side cursors are turned off, as the
+    pooler may run each statement on another server connection.
+    """
+    conn_max_age = env.get('DATABASE_CONN_MAX_AGE', DEFAULT_CONN_MAX_AGE)
+    database = {
+        'CONN_MAX_AGE': (
+            None if conn_max_age == 'none' else int(conn_max_age)
+        ),
+        'CONN_HEALTH_CHECKS': _flag(env, 'DATABASE_CONN_HEALTH_CHECKS', True),
+    }
+    if env.get('DATABASE_ENGINE', 'sqlite') == 'postgresql':
+        database.update(
+            {
+                'ENGINE': 'django.db.backends.postgresql',
+                'NAME': env.get('DATABASE_NAME', 'sl_backend'),
+                'USER': env.get('DATABASE_USER', ''),
+                'PASSWORD': env.get('DATABASE_PASSWORD', ''),
+                'HOST': env.get('DATABASE_HOST', ''),
+                'PORT': env.get('DATABASE_PORT', ''),
+                'DISABLE_SERVER_SIDE_CURSORS': _flag(
+                    env, 'DATABASE_PGBOUNCER', False
+                ),
+                'OPTIONS': {
+                    'connect_timeout': int(
+                        env.get('DATABASE_CONNECT_TIMEOUT', 5)
+                    ),
+                    'application_name': 'sl_backend',
+                },
+            }
+        )
+    else:
+        database.update(
+            {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': env.get('DATABASE_NAME', 'db.sqlite3'),
+            }
+        )
+    return database
+
+
+def replica_databases(default, replicas):
+    """
+    Return the ``replica0``.. aliases of ``replicas``: database files for
+    SQLite, ``host[:port]`` for PostgreSQL. Each mirrors the primary in
+    tests.
+    """
+    databases = {}
+    for index, replica in enumerate(replicas):
+        database = {**default, 'TEST': {'MIRROR': 'default'}}
+        if default['ENGINE'] == 'django.db.backends.sqlite3':
+            database['NAME'] = replica
+        else:
+            host, _, port = replica.partition(':')
+            database.update(HOST=host, PORT=port or default.get('PORT', ''))
+        databases[f'replica{index}'] = database
+    return databases
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver applying ``settings.SQLITE_PRAGMAS``
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
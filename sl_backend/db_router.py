@@ -0,0 +1,240 @@
+"""
+Read-replica routing.
+
+Views with ``replica_reads = True`` serve their GET requests from one of
+the ``READ_REPLICAS['ALIASES']`` databases; everything else, and every
+write, uses ``default``:
+
+* ``ReplicaRoutingMiddleware`` marks the requests that may read from a
+  replica in a context variable, which ``ReplicaRouter`` reads.
+* A client that wrote is pinned to the primary for ``PIN_SECONDS``, so it
+  reads its own writes: with a cookie, and for an authenticated user with
+  a ``db-pin:{user_id}`` key in the shared cache, which token clients that
+  keep no cookies also hit.
+* Replicas lagging more than ``MAX_LAG`` seconds (or failing the lag
+  check) are skipped; with no usable replica reads go to the primary.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Defaults for settings.READ_REPLICAS
+READ_REPLICAS_DEFAULTS = {
+    'ALIASES': [],  # replica database aliases; none disables the routing
+    'APPS': ['inventory'],  # apps whose models are read from replicas
+    'PIN_SECONDS': 5,  # primary-only window after a client writes
+    'PIN_COOKIE': 'db_pin',
+    'MAX_LAG': 2.0,  # seconds a replica may trail the primary
+    'LAG_CHECK_INTERVAL': 5.0,  # seconds a lag check result is reused
+}
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+PIN_CACHE_KEY = 'db-pin:{user_id}'
+
+# True, False, or the request of a replica-routed view whose user's pin is
+# checked on its first routed read, once authentication has run
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_setting(name):
+    return getattr(settings, 'READ_REPLICAS', {}).get(
+        name, READ_REPLICAS_DEFAULTS[name]
+    )
+
+
+@contextmanager
+def replica_reads():
+    """
+    Route the reads made inside the block to a replica
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def user_pinned(user):
+    """
+    Return whether ``user`` wrote within the last ``PIN_SECONDS``
+    """
+    return bool(
+        user is not None
+        and user.is_authenticated
+        and cache.get(PIN_CACHE_KEY.format(user_id=user.pk))
+    )
+
+
+def _replica_allowed():
+    use = _use_replica.get()
+    if isinstance(use, bool):
+        return use
+    use = not user_pinned(getattr(use, 'user', None))
+    _use_replica.set(use)
+    return use
+
+
+def replica_lag(alias):
+    """
+    Return how many seconds the replica ``alias`` trails the primary.
+
+    PostgreSQL standbys report the time since the last replayed
+    transaction (0 when idle or not a standby); other backends have no
+    replication of their own, so copies such as SQLite files are taken as
+    current.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN NOT pg_is_in_recovery() '
+            'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+            'THEN 0 ELSE EXTRACT(EPOCH FROM '
+            'now() - pg_last_xact_replay_timestamp()) END'
+        )
+        return float(cursor.fetchone()[0] or 0)
+
+
+class ReplicaHealth:
+    """
+    Per-process, thread-safe record of which replicas are usable, checked
+    at most once per ``LAG_CHECK_INTERVAL`` per replica so routing a read
+    costs no query
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = Lock()
+
+    def usable(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and checked[0] > now:
+                return checked[1]
+        try:
+            usable = replica_lag(alias) <= replica_setting('MAX_LAG')
+        except DatabaseError:
+            logger.exception('Checking the lag of replica %s failed', alias)
+            usable = False
+        with self._lock:
+            self._checked[alias] = (
+                now + replica_setting('LAG_CHECK_INTERVAL'),
+                usable,
+            )
+        return usable
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """
+    Send the reads of replica-routed requests to a usable replica and all
+    other queries to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        # The app first: authentication reads users before the pin of the
+        # request's user can be checked
+        if (
+            model._meta.app_label not in replica_setting('APPS')
+            or not _replica_allowed()
+        ):
+            return None
+        usable = [
+            alias
+            for alias in replica_setting('ALIASES')
+            if replica_health.usable(alias)
+        ]
+        return random.choice(usable) if usable else None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {'default', *replica_setting('ALIASES')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary
+        if db in replica_setting('ALIASES'):
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let GET requests to views with ``replica_reads`` read from a replica,
+    unless the client or its user is pinned to the primary, and pin the
+    clients and users that send a write.
+
+    Without ``READ_REPLICAS['ALIASES']`` the middleware removes itself.
+    """
+
+    def __init__(self, get_response):
+        if not replica_setting('ALIASES'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie = replica_setting('PIN_COOKIE')
+        self.pin_seconds = replica_setting('PIN_SECONDS')
+
+    def pinned(self, request):
+        try:
+            return float(request.COOKIES[self.cookie]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    def __call__(self, request):
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+        # Failed writes may have written part of their changes as well
+        if request.method not in SAFE_METHODS and self.pin_seconds:
+            # DRF sets the user it authenticated on the request
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(
+                    PIN_CACHE_KEY.format(user_id=user.pk),
+                    True,
+                    timeout=self.pin_seconds,
+                )
+            response.set_cookie(
+                self.cookie,
+                str(time.time() + self.pin_seconds),
+                max_age=self.pin_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view_class, 'replica_reads', False)
+            and not self.pinned(request)
+        ):
+            _use_replica.set(request)
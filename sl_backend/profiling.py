@@ -0,0 +1,233 @@
+"""
+Per-request SQL profiling.
+
+``SQLProfilingMiddleware`` records, for profiled requests, the number of
+queries, the database time, the view time and the query shapes executed
+more than once (N+1 candidates), and reports them in a ``Server-Timing``
+header to staff users and to clients sending ``SQL_PROFILING['SECRET']``.
+Query shapes of all profiled requests are aggregated in-process and served
+by ``SQLProfileReportApiView``.
+"""
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+# Defaults for settings.SQL_PROFILING
+SQL_PROFILING_DEFAULTS = {
+    'ENABLED': False,  # when off, the middleware is removed from the stack
+    'HEADER': 'X-Profile-SQL',  # requests sending this header are profiled
+    'SECRET': None,  # header value profiling requests of non-staff users
+    'SAMPLE_RATE': 0.0,  # fraction of other requests that are profiled
+    'MAX_SHAPES': 500,  # query shapes kept for the report
+}
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+_VALUES_LIST = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def profiling_setting(name):
+    return getattr(settings, 'SQL_PROFILING', {}).get(
+        name, SQL_PROFILING_DEFAULTS[name]
+    )
+
+
+def fingerprint(sql):
+    """
+    Return the shape of ``sql``: parameter lists of any length, bulk insert
+    rows and numeric literals are collapsed, so repeated queries that only
+    differ in their arguments share a fingerprint
+    """
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _VALUES_LIST.sub(r'\1', sql)
+    sql = _NUMBER.sub('N', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryProfile:
+    """
+    Database execute wrapper timing every query of one request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.shape_durations = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            shape = fingerprint(sql)
+            self.count += 1
+            self.duration += duration
+            self.shapes[shape] += 1
+            self.shape_durations[shape] += duration
+
+    @property
+    def duplicates(self):
+        return {shape: n for shape, n in self.shapes.items() if n > 1}
+
+
+class HotQueries:
+    """
+    Thread-safe, bounded aggregate of query shapes over profiled requests
+    """
+
+    def __init__(self):
+        self._shapes = {}
+        self._lock = Lock()
+
+    def record(self, profile, path):
+        with self._lock:
+            for shape, count in profile.shapes.items():
+                entry = self._shapes.get(shape)
+                if entry is None:
+                    if len(self._shapes) >= profiling_setting('MAX_SHAPES'):
+                        self._evict()
+                    entry = self._shapes[shape] = {
+                        'fingerprint': shape,
+                        'count': 0,
+                        'total_ms': 0.0,
+                        'requests': 0,
+                        'duplicated_requests': 0,
+                        'last_path': path,
+                    }
+                entry['count'] += count
+                entry['total_ms'] += profile.shape_durations[shape] * 1000
+                entry['requests'] += 1
+                entry['duplicated_requests'] += count > 1
+                entry['last_path'] = path
+
+    def _evict(self):
+        # Drop the cheapest shape to make room
+        cheapest = min(
+            self._shapes, key=lambda shape: self._shapes[shape]['total_ms']
+        )
+        del self._shapes[cheapest]
+
+    def top(self, limit):
+        with self._lock:
+            entries = sorted(
+                self._shapes.values(),
+                key=lambda entry: entry['total_ms'],
+                reverse=True,
+            )[:limit]
+            return [
+                dict(entry, total_ms=round(entry['total_ms'], 3))
+                for entry in entries
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+hot_queries = HotQueries()
+
+
+class SQLProfilingMiddleware:
+    """
+    Profile requests that send ``SQL_PROFILING['HEADER']`` or fall in the
+    ``SAMPLE_RATE`` sample.
+
+    Timings are only added to the responses of authorized requests: from a
+    staff user, or sending ``SQL_PROFILING['SECRET']`` as the header value.
+    Other requests sending the header are neither reported nor recorded.
+
+    With ``SQL_PROFILING['ENABLED']`` off the middleware removes itself, and
+    unprofiled requests only pay for a header lookup.
+    """
+
+    def __init__(self, get_response):
+        if not profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = profiling_setting('HEADER')
+        self.secret = profiling_setting('SECRET')
+        self.sample_rate = profiling_setting('SAMPLE_RATE')
+
+    def is_authorized(self, request):
+        # Checked after the view, which authenticated the user
+        if self.secret and constant_time_compare(
+            request.headers.get(self.header, ''), self.secret
+        ):
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+
+    def __call__(self, request):
+        requested = bool(request.headers.get(self.header))
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not (requested or sampled):
+            return self.get_response(request)
+
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        authorized = self.is_authorized(request)
+        if sampled or authorized:
+            hot_queries.record(profile, request.path)
+        if not authorized:
+            return response
+        db_ms = profile.duration * 1000
+        view_ms = (total - profile.duration) * 1000
+        duplicates = sum(profile.duplicates.values())
+        response['Server-Timing'] = ', '.join(
+            [
+                f'db;dur={db_ms:.2f};desc="{profile.count} queries"',
+                f'db-dup;desc="{duplicates} duplicate queries in '
+                f'{len(profile.duplicates)} shapes"',
+                f'view;dur={view_ms:.2f}',
+            ]
+        )
+        return response
+
+
+class SQLProfileReportQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, required=False, default=20)
+
+
+class SQLProfileReportApiView(APIView):
+    """
+    Top query shapes of the profiled requests served by this process
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        query_serializer = SQLProfileReportQuerySerializer(
+            data=request.query_params
+        )
+        if not query_serializer.is_valid():
+            return Response(
+                query_serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            hot_queries.top(query_serializer.validated_data['limit']),
+            status=status.HTTP_200_OK,
+        )
+
+    def delete(self, request):
+        hot_queries.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import replica_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'sl_backend',
     'inventory',
     'user_management',
     'rest_framework',
@@ -47,12 +51,22 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user_management.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# Per-process cache of token lookups used by CachedTokenAuthentication
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+}
+
+# Queue a StockAlert whenever a stock change takes an ingredient to or below
+# its reorder threshold, for consumers polling api/stock-alerts/
+STOCK_ALERTS_QUEUE = os.environ.get('STOCK_ALERTS_QUEUE', '1') == '1'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -61,8 +75,22 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'sl_backend.profiling.SQLProfilingMiddleware',
+    'sl_backend.db_router.ReplicaRoutingMiddleware',
 ]
 
+# Per-request SQL profiling (query count, DB time, duplicate queries) reported
+# in Server-Timing headers. Requests are profiled when they send HEADER or
+# fall in SAMPLE_RATE; with ENABLED off the middleware costs nothing. Timings
+# are shown to staff users and to clients sending SECRET as the HEADER value.
+SQL_PROFILING = {
+    'ENABLED': DEBUG or os.environ.get('SQL_PROFILING_ENABLED') == '1',
+    'HEADER': 'X-Profile-SQL',
+    'SECRET': os.environ.get('SQL_PROFILING_SECRET') or None,
+    'SAMPLE_RATE': float(os.environ.get('SQL_PROFILING_SAMPLE_RATE', 0)),
+    'MAX_SHAPES': 500,
+}
+
 ROOT_URLCONF = 'sl_backend.urls'
 
 TEMPLATES = [
@@ -94,6 +122,35 @@ DATABASES = {
     }
 }
 
+# Read replicas, as a comma-separated list of database files (copies of the
+# primary kept up to date by replication). Listing and report views marked
+# replica_reads serve GET requests from them; see sl_backend/db_router.py.
+# Tests read the replicas' data from the test primary.
+DATABASE_REPLICAS = [
+    name.strip()
+    for name in os.environ.get('DATABASE_REPLICAS', '').split(',')
+    if name.strip()
+]
+DATABASES.update(replica_databases(DATABASES['default'], DATABASE_REPLICAS))
+
+DATABASE_ROUTERS = ['sl_backend.db_router.ReplicaRouter']
+
+READ_REPLICAS = {
+    'ALIASES': [f'replica{index}' for index in range(len(DATABASE_REPLICAS))],
+    'APPS': ['inventory'],
+    # Clients are pinned to the primary this long after they write, so they
+    # read their own writes
+    'PIN_SECONDS': int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 5)),
+    'PIN_COOKIE': 'db_pin',
+    # Replicas trailing the primary by more seconds are skipped
+    'MAX_LAG': float(os.environ.get('DATABASE_REPLICA_MAX_LAG', 2.0)),
+    'LAG_CHECK_INTERVAL': 5.0,
+}
+
+# Pragmas run on every new SQLite connection; the production profile
+# (sl_backend/settings_production.py) turns on WAL and a larger page cache
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -114,6 +171,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+
+# The first hasher is used for new hashes; the others still verify existing
+# ones. Passwords stored with another hasher or iteration count are rehashed
+# on the user's next successful login.
+PASSWORD_HASHERS = [
+    'user_management.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 work factor; lowering it trades brute-force resistance for login
+# latency
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000)
+)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -0,0 +1,60 @@
+"""
+Production settings, selected with
+``DJANGO_SETTINGS_MODULE=sl_backend.settings_production``.
+
+Everything deployment-specific comes from the environment:
+``DJANGO_SECRET_KEY`` and ``DJANGO_ALLOWED_HOSTS`` (comma-separated), the
+``DATABASE_*`` variables read by ``sl_backend.database`` and ``CACHE_URL``,
+the cache shared by every worker (required, see ``sl_backend.caches``).
+Database connections are kept open across requests and health-checked
+before reuse; SQLite databases run in WAL mode.
+"""
+import os
+
+from .caches import cache_settings
+from .database import (
+    SQLITE_PRODUCTION_PRAGMAS,
+    database_settings,
+    replica_databases,
+)
+from .settings import *  # noqa: F401, F403
+from .settings import DATABASE_REPLICAS, READ_REPLICAS, SQL_PROFILING
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+SQL_PROFILING = {
+    **SQL_PROFILING,
+    'ENABLED': DEBUG or os.environ.get('SQL_PROFILING_ENABLED') == '1',
+}
+
+DATABASES = {'default': database_settings()}
+DATABASES.update(replica_databases(DATABASES['default'], DATABASE_REPLICAS))
+
+CACHES = {'default': cache_settings()}
+
+READ_REPLICAS = {
+    **READ_REPLICAS,
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+}
+
+SQLITE_PRAGMAS = {
+    **SQLITE_PRODUCTION_PRAGMAS,
+    'mmap_size': int(
+        os.environ.get(
+            'SQLITE_MMAP_SIZE', SQLITE_PRODUCTION_PRAGMAS['mmap_size']
+        )
+    ),
+    'cache_size': int(
+        os.environ.get(
+            'SQLITE_CACHE_SIZE', SQLITE_PRODUCTION_PRAGMAS['cache_size']
+        )
+    ),
+}
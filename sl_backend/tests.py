@@ -0,0 +1,278 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connections
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from inventory.models import Ingredient
+
+from .caches import cache_settings, check_shared_cache
+from .database import database_settings, replica_databases
+from .db_router import (
+    ReplicaRouter,
+    _replica_allowed,
+    replica_health,
+    replica_reads,
+)
+from .profiling import fingerprint, hot_queries
+
+
+class FingerprintTestCase(APITestCase):
+    def test_parameter_lists_are_collapsed(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) LIMIT 10'),
+        )
+
+    def test_bulk_insert_rows_are_collapsed(self):
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (...)',
+        )
+
+
+class SQLProfilingMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        hot_queries.clear()
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin', password='adminpass'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_unprofiled_request(self):
+        response = self.client.get(reverse('ingredient-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_profiled_request(self):
+        response = self.client.get(
+            reverse('ingredient-list'), HTTP_X_PROFILE_SQL='1'
+        )
+        self.assertIn('db;dur=', response['Server-Timing'])
+        # Location memberships and the existence check
+        self.assertIn('2 queries', response['Server-Timing'])
+        self.assertIn('view;dur=', response['Server-Timing'])
+
+    def test_header_is_ignored_for_other_users(self):
+        self.client.force_authenticate(
+            user=User.objects.create_user(username='member', password='x')
+        )
+        response = self.client.get(
+            reverse('ingredient-list'), HTTP_X_PROFILE_SQL='1'
+        )
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(hot_queries.top(10), [])
+
+    @override_settings(SQL_PROFILING={'ENABLED': True, 'SECRET': 'letmein'})
+    def test_secret_header_profiles_any_request(self):
+        self.client.force_authenticate(
+            user=User.objects.create_user(username='member', password='x')
+        )
+        response = self.client.get(
+            reverse('ingredient-list'), HTTP_X_PROFILE_SQL='letmein'
+        )
+        self.assertIn('db;dur=', response['Server-Timing'])
+        response = self.client.get(
+            reverse('ingredient-list'), HTTP_X_PROFILE_SQL='guess'
+        )
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SQL_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+    def test_report_lists_hot_query_shapes(self):
+        for _ in range(3):
+            self.client.get(reverse('get-purchases'))
+        response = self.client.get(reverse('sql-profile-report'))
+        self.assertEqual(response.status_code, 200)
+        # Cached lookups (memberships) run in the first request only
+        listing = next(
+            entry
+            for entry in response.data
+            if '"inventory_purchase"' in entry['fingerprint']
+        )
+        self.assertEqual(listing['requests'], 3)
+
+    def test_report_limit_must_be_positive(self):
+        url = reverse('sql-profile-report')
+        for limit in ('0', '-1', 'ten'):
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('limit', response.data)
+        response = self.client.get(url, {'limit': '1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_report_requires_admin(self):
+        self.client.force_authenticate(
+            user=User.objects.create_user(username='staff', password='x')
+        )
+        response = self.client.get(reverse('sql-profile-report'))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['replica0', 'replica1']})
+class ReplicaRouterTestCase(APITestCase):
+    def setUp(self):
+        replica_health.clear()
+        self.router = ReplicaRouter()
+
+    @mock.patch('sl_backend.db_router.replica_lag', return_value=0.0)
+    def test_reads_go_to_replicas_only_when_routed(self, replica_lag):
+        self.assertIsNone(self.router.db_for_read(Ingredient))
+        with replica_reads():
+            self.assertIn(
+                self.router.db_for_read(Ingredient), ['replica0', 'replica1']
+            )
+            # Authentication stays on the primary
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertEqual(self.router.db_for_write(Ingredient), 'default')
+        self.assertFalse(self.router.allow_migrate('replica0', 'inventory'))
+
+    def test_lagging_replicas_are_skipped(self):
+        lags = {'replica0': 30.0, 'replica1': 0.5}
+        with mock.patch(
+            'sl_backend.db_router.replica_lag', side_effect=lags.get
+        ) as replica_lag, replica_reads():
+            for _ in range(5):
+                self.assertEqual(
+                    self.router.db_for_read(Ingredient), 'replica1'
+                )
+        # Checked once per replica, not once per read
+        self.assertEqual(replica_lag.call_count, 2)
+
+    @mock.patch(
+        'sl_backend.db_router.replica_lag', side_effect=OperationalError
+    )
+    def test_falls_back_to_primary(self, replica_lag):
+        with self.assertLogs('sl_backend.db_router', 'ERROR'), (
+            replica_reads()
+        ):
+            self.assertIsNone(self.router.db_for_read(Ingredient))
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['replica0']})
+class ReplicaRoutingMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        # User ids are reused by later tests; drop the users' pins
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='staff', password='x')
+        self.client.force_authenticate(user=self.user)
+        self.routed = []
+
+        # Record whether each inventory read was routed; the test database
+        # has no replica to actually read from
+        def record(model, **hints):
+            if model._meta.app_label == 'inventory':
+                self.routed.append(_replica_allowed())
+
+        patcher = mock.patch.object(
+            ReplicaRouter, 'db_for_read', side_effect=record
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_listing_reads_from_replica(self):
+        self.client.get(reverse('get-purchases'))
+        self.assertTrue(self.routed)
+        self.assertTrue(all(self.routed))
+
+    def test_cached_and_write_views_use_primary(self):
+        self.client.get(reverse('menu-items-list'))
+        response = self.client.post(
+            reverse('store-menu-item'), {'name': 'Soup', 'price': '4.00'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(any(self.routed))
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        response = self.client.post(
+            reverse('store-menu-item'), {'name': 'Soup', 'price': '4.00'}
+        )
+        self.assertEqual(response.cookies['db_pin']['max-age'], 5)
+
+        # The test client sends the cookie back
+        self.client.get(reverse('get-purchases'))
+        self.assertTrue(self.routed)
+        self.assertFalse(any(self.routed))
+
+    def test_writes_pin_the_user_without_cookies(self):
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.post(
+            reverse('store-menu-item'), {'name': 'Soup', 'price': '4.00'}
+        )
+
+        # A token client keeping no cookies
+        self.client.cookies.clear()
+        self.client.get(reverse('get-purchases'))
+        self.assertTrue(self.routed)
+        self.assertFalse(any(self.routed))
+
+        # Other users still read from the replica
+        self.routed.clear()
+        other = User.objects.create_user(username='other', password='x')
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other).key
+        )
+        self.client.get(reverse('get-purchases'))
+        self.assertTrue(self.routed)
+        self.assertTrue(all(self.routed))
+
+
+class DatabaseSettingsTestCase(APITestCase):
+    def test_postgresql_profile(self):
+        database = database_settings(
+            {
+                'DATABASE_ENGINE': 'postgresql',
+                'DATABASE_NAME': 'inventory',
+                'DATABASE_HOST': 'db.internal',
+                'DATABASE_PGBOUNCER': '1',
+            }
+        )
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+
+        replicas = replica_databases(database, ['replica.internal:6432'])
+        self.assertEqual(replicas['replica0']['HOST'], 'replica.internal')
+        self.assertEqual(replicas['replica0']['PORT'], '6432')
+        self.assertEqual(replicas['replica0']['NAME'], 'inventory')
+
+    def test_shared_cache_is_required(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_settings({})
+        self.assertEqual(
+            cache_settings({'CACHE_URL': 'redis://cache.internal:6379/1'})[
+                'BACKEND'
+            ],
+            'django.core.cache.backends.redis.RedisCache',
+        )
+        self.assertEqual(
+            cache_settings({'CACHE_URL': 'memcached://a:11211,b:11211'})[
+                'LOCATION'
+            ],
+            ['a:11211', 'b:11211'],
+        )
+        self.assertEqual(
+            cache_settings({'CACHE_URL': 'db://cache_table'})['LOCATION'],
+            'cache_table',
+        )
+        # The test settings use a per-process cache
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)],
+            ['sl_backend.E001'],
+        )
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4096})
+    def test_sqlite_pragmas_run_on_new_connections(self):
+        wrapper = connections.create_connection('default')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4096)
@@ -16,9 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .profiling import SQLProfileReportApiView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(
+        'api/debug/sql-profile/',
+        SQLProfileReportApiView.as_view(),
+        name='sql-profile-report',
+    ),
     path('', include('user_management.urls')),
     path('', include('inventory.urls')),
 ]
@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+# Defaults for settings.TOKEN_AUTH_CACHE
+TOKEN_AUTH_CACHE_DEFAULTS = {
+    'MAX_SIZE': 10000,  # tokens kept per process
+    'TTL': 300,  # seconds before a cached token is checked again
+}
+
+
+def _cache_setting(name):
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(
+        name, TOKEN_AUTH_CACHE_DEFAULTS[name]
+    )
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU of token key -> (user, token) with a TTL.
+
+    The cache is per process; the TTL bounds how long another process can
+    keep accepting a token after it was deleted or its user deactivated.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user, token = entry
+            if expires < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return user, token
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (
+                time.monotonic() + _cache_setting('TTL'),
+                user,
+                token,
+            )
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > _cache_setting('MAX_SIZE'):
+                self._discard(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].pk
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that keeps token lookups in a per-process LRU, so
+    requests with a recently seen token run no authentication query.
+
+    Entries are dropped when the token is deleted or its user is saved
+    (e.g. deactivated), and expire after ``TOKEN_AUTH_CACHE['TTL']``.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            # Raises AuthenticationFailed for unknown keys and inactive users
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = cached
+        # Every request gets its own user instance
+        return copy(user), token
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose work factor comes from
+    ``settings.PASSWORD_PBKDF2_ITERATIONS``.
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so it verifies every
+    existing hash; when the setting changes, Django's ``check_password``
+    sees a different iteration count and rehashes the password on the
+    user's next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(
+            settings,
+            'PASSWORD_PBKDF2_ITERATIONS',
+            PBKDF2PasswordHasher.iterations,
+        )
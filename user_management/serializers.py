@@ -28,5 +28,8 @@ class UserWithTokenSerializer(serializers.ModelSerializer):
         ]
 
     def get_token(self, obj):
-        token, created = Token.objects.get_or_create(user=obj)
+        # The login view passes the token it already issued
+        token = self.context.get('token')
+        if token is None:
+            token, created = Token.objects.get_or_create(user=obj)
         return token.key
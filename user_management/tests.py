@@ -2,6 +2,9 @@ from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from .authentication import token_cache
 
 
 class LoginTestCase(APITestCase):
@@ -38,3 +41,84 @@ class LoginTestCase(APITestCase):
         response = self.client.post(self.login_url, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['message'], 'Request is invalid.')
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginQueriesTestCase(APITestCase):
+    def setUp(self):
+        self.login_url = reverse('user-login')
+        self.user = get_user_model().objects.create_user(
+            username='rushuser', password='testpass123'
+        )
+        self.data = {'username': 'rushuser', 'password': 'testpass123'}
+
+    def test_login_with_existing_token(self):
+        token = Token.objects.create(user=self.user)
+        # user and token are fetched together
+        with self.assertNumQueries(1):
+            response = self.client.post(self.login_url, self.data)
+        self.assertEqual(response.data['data']['token'], token.key)
+
+    def test_login_issues_token_once(self):
+        with self.assertNumQueries(5):
+            response = self.client.post(self.login_url, self.data)
+        self.assertEqual(
+            response.data['data']['token'],
+            Token.objects.get(user=self.user).key,
+        )
+
+    def test_password_rehashed_on_login(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = self.client.post(self.login_url, self.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('testpass123'))
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='cacheduser', password='testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('sales-rollup')
+
+    def test_warm_cache_runs_no_auth_queries(self):
+        self.client.get(self.url)
+        # Only the view's own query remains
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'MAX_SIZE': 1, 'TTL': 300})
+    def test_cache_is_bounded(self):
+        other = get_user_model().objects.create_user(
+            username='otheruser', password='testpass123'
+        )
+        other_token = Token.objects.create(user=other)
+        self.client.get(self.url)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + other_token.key)
+        self.client.get(self.url)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other_token.key))
+
+    @override_settings(TOKEN_AUTH_CACHE={'MAX_SIZE': 10, 'TTL': -1})
+    def test_expired_entries_are_reloaded(self):
+        self.client.get(self.url)
+        self.assertIsNone(token_cache.get(self.token.key))
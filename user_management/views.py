@@ -40,7 +40,10 @@ class UserLoginView(APIView):
         # find user by email
         request_username = request_serializer.validated_data['username']
         try:
-            user = UserModel.objects.get(username=request_username.lower())
+            # fetch the user's token in the same query
+            user = UserModel.objects.select_related('auth_token').get(
+                username=request_username.lower()
+            )
         except UserModel.DoesNotExist:
             logger.info(
                 'login attempt with non-existing username: %s',
@@ -76,12 +79,16 @@ class UserLoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        # create new token or get existing one for user (will be related to
-        # the user instance)
-        Token.objects.get_or_create(user=user)
+        # reuse the token fetched with the user or create a new one
+        try:
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token, created = Token.objects.get_or_create(user=user)
 
         # respond with user data and token
-        response_serializer = UserWithTokenSerializer(user)
+        response_serializer = UserWithTokenSerializer(
+            user, context={'token': token}
+        )
         return Response(
             {
                 'success': True,